@@ -17,9 +17,24 @@ from rich.layout import Layout
 from rich.text import Text
 from rich import box
 import sys
+from pathlib import Path
+
+# Share the bytes-level log reader with the Streamlit dashboard
+sys.path.insert(0, str(Path(__file__).resolve().parent.parent / "swarm-pulse"))
+from health import HealthAggregator
+from log_reader import FileBlock, read_tail
+from retention import TieredSeries
 
 console = Console()
 
+# Lines without one of these cannot update any metric in parse_logs
+LOG_KEYWORDS = (b'epoch=', b'amount=', b'Difficulty adjusted', b'diversity_score=')
+
+LOG_TIMESTAMP = re.compile(r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]')
+EPOCH = datetime(1970, 1, 1)
+
+STATUS_EMOJI = {'healthy': "🟢", 'warning': "🟡", 'critical': "🔴", 'unknown': "⚪"}
+
 class CodeZeroMonitor:
     def __init__(self, log_file=None, container_name=None):
         self.log_file = log_file
@@ -29,7 +44,7 @@ class CodeZeroMonitor:
         # Determine monitoring mode
         if log_file:
             self.mode = "file"
-            self.log_position = 0
+            self.log_position = None
         elif container_name:
             self.mode = "docker"
             self.container_name = container_name
@@ -43,16 +58,23 @@ class CodeZeroMonitor:
                 self.log_file = self.find_log_file()
                 if self.log_file:
                     self.mode = "file"
-                    self.log_position = 0
+                    self.log_position = None
         
+        # Recent values for the sparklines
         self.metrics = {
             'loss': deque(maxlen=20),
             'rewards': deque(maxlen=20),
-            'difficulty': 0,
-            'diversity': deque(maxlen=10),
-            'last_update': None,
-            'total_rewards': 0.0,
-            'epochs': 0
+            'last_update': None
+        }
+        
+        # Running totals and averages, shared with the dashboard
+        self.health = HealthAggregator()
+        
+        # Minute/hour/day aggregates, so trends outlive the deques above
+        # at bounded memory
+        self.history = {
+            'loss': TieredSeries(),
+            'rewards': TieredSeries()
         }
     
     def find_log_file(self):
@@ -99,21 +121,28 @@ class CodeZeroMonitor:
         if not self.log_file:
             return []
         
+        # The file is read, not mapped: a copytruncate rotation would make
+        # reading a map of it crash the process
         try:
-            with open(self.log_file, 'r') as f:
-                # Seek to last position
-                f.seek(self.log_position)
-                new_lines = f.readlines()
-                self.log_position = f.tell()
-                
-                # If first read, get last N lines
-                if not new_lines and self.log_position == 0:
-                    f.seek(0)
-                    all_lines = f.readlines()
-                    new_lines = all_lines[-lines:] if len(all_lines) > lines else all_lines
-                    self.log_position = f.tell()
-                
-                return [line.strip() for line in new_lines]
+            if self.log_position is None:
+                # First read: only the last N complete metric lines, found by
+                # reading backward from the end
+                log, spans = read_tail(self.log_file, lines, LOG_KEYWORDS, complete_only=True)
+                self.log_position = log.base + log.buffer.rfind(b'\n') + 1
+                return [log.decode(start, end) for start, end in spans]
+            
+            log = FileBlock(self.log_file, self.log_position)
+            # Truncated or replaced file: start over
+            if self.log_position > log.size:
+                self.log_position = 0
+                log = FileBlock(self.log_file)
+            
+            # Only complete lines that mention a metric are decoded
+            spans = log.iter_lines(keywords=LOG_KEYWORDS, complete_only=True)
+            new_lines = [log.decode(start, end) for start, end in spans]
+            self.log_position = log.base + log.position
+            
+            return new_lines
         except Exception as e:
             return []
     
@@ -127,51 +156,48 @@ class CodeZeroMonitor:
         for line in logs:
             # Clean line
             clean_line = self.strip_ansi(line)
+            timestamp = self.line_timestamp(clean_line)
             
             # Policy update
             match = re.search(r'epoch=(\d+).*loss=([\d.]+)', clean_line)
             if match:
-                self.metrics['epochs'] = int(match.group(1))
                 self.metrics['loss'].append(float(match.group(2)))
                 self.metrics['last_update'] = datetime.now()
+                self.history['loss'].add(timestamp, float(match.group(2)))
+                self.health.add_policy_update(timestamp, int(match.group(1)), float(match.group(2)))
             
             # Reward
             match = re.search(r'amount=([\d.]+)', clean_line)
             if match:
                 reward = float(match.group(1))
                 self.metrics['rewards'].append(reward)
-                self.metrics['total_rewards'] += reward
+                self.history['rewards'].add(timestamp, reward)
+                rank = re.search(r'rank=(\d+)/(\d+)', clean_line)
+                if rank:
+                    self.health.add_reward(reward, int(rank.group(1)), int(rank.group(2)))
+                else:
+                    self.health.add_reward(reward)
             
             # Difficulty
             match = re.search(r'Difficulty adjusted: \d+ → (\d+)', clean_line)
             if match:
-                self.metrics['difficulty'] = int(match.group(1))
+                self.health.add_difficulty_change(int(match.group(1)))
             
             # Diversity
             match = re.search(r'diversity_score=([\d.]+)', clean_line)
             if match:
-                self.metrics['diversity'].append(float(match.group(1)))
+                self.health.add_rollout(float(match.group(1)))
+    
+    def line_timestamp(self, line):
+        """Epoch seconds of the line's log timestamp (now if it has none)"""
+        match = LOG_TIMESTAMP.search(line)
+        moment = datetime.fromisoformat(match.group(1)) if match else datetime.now()
+        return int((moment - EPOCH).total_seconds())
     
     def get_health_status(self):
-        """Calculate health status"""
-        if not self.metrics['loss']:
-            return "unknown", "⚪"
-        
-        avg_loss = sum(self.metrics['loss']) / len(self.metrics['loss'])
-        avg_diversity = sum(self.metrics['diversity']) / len(self.metrics['diversity']) if self.metrics['diversity'] else 0
-        
-        issues = 0
-        if avg_loss > 0.1:
-            issues += 1
-        if avg_diversity < 0.5:
-            issues += 1
-        
-        if issues == 0:
-            return "healthy", "🟢"
-        elif issues == 1:
-            return "warning", "🟡"
-        else:
-            return "critical", "🔴"
+        """Health status and its emoji, from the running metrics"""
+        status = self.health.health_status()
+        return status, STATUS_EMOJI[status]
     
     def create_dashboard(self):
         """Create terminal dashboard"""
@@ -192,15 +218,15 @@ class CodeZeroMonitor:
         
         # Current metrics
         current_loss = self.metrics['loss'][-1] if self.metrics['loss'] else 0
-        avg_loss = sum(self.metrics['loss']) / len(self.metrics['loss']) if self.metrics['loss'] else 0
-        avg_diversity = sum(self.metrics['diversity']) / len(self.metrics['diversity']) if self.metrics['diversity'] else 0
+        avg_loss = self.health.avg_loss or 0
+        avg_diversity = self.health.avg_diversity or 0
         
         metrics_table.add_row("📊 Current Loss", f"{current_loss:.4f}")
-        metrics_table.add_row("📉 Avg Loss (20)", f"{avg_loss:.4f}")
-        metrics_table.add_row("💰 Total Rewards", f"{self.metrics['total_rewards']:.4f} GENSYN")
-        metrics_table.add_row("🎯 Difficulty", f"Level {self.metrics['difficulty']}")
+        metrics_table.add_row(f"📉 Avg Loss ({self.health.loss.values.maxlen})", f"{avg_loss:.4f}")
+        metrics_table.add_row("💰 Total Rewards", f"{self.health.reward_total:.4f} GENSYN")
+        metrics_table.add_row("🎯 Difficulty", f"Level {self.health.difficulty or 0}")
         metrics_table.add_row("🎨 Avg Diversity", f"{avg_diversity:.2f}")
-        metrics_table.add_row("⚡ Epochs", f"{self.metrics['epochs']}")
+        metrics_table.add_row("⚡ Epochs", f"{self.health.last_epoch or 0}")
         
         # Loss trend
         loss_chart = self.create_sparkline(list(self.metrics['loss']), "Loss Trend")
@@ -208,6 +234,12 @@ class CodeZeroMonitor:
         # Rewards trend
         reward_chart = self.create_sparkline(list(self.metrics['rewards']), "Recent Rewards")
         
+        # Long-term trends (last 24 hours with data)
+        hourly_loss = [bucket.mean for _, bucket in self.history['loss'].rollup(3600)[-24:]]
+        hourly_rewards = [bucket.sum for _, bucket in self.history['rewards'].rollup(3600)[-24:]]
+        hourly_loss_chart = self.create_sparkline(hourly_loss, "Hourly Avg Loss")
+        hourly_reward_chart = self.create_sparkline(hourly_rewards, "Hourly Rewards")
+        
         # Footer
         last_update = self.metrics['last_update'].strftime("%H:%M:%S") if self.metrics['last_update'] else "Never"
         footer = Panel(
@@ -221,6 +253,8 @@ class CodeZeroMonitor:
             Layout(metrics_table, size=10),
             Layout(loss_chart, size=5),
             Layout(reward_chart, size=5),
+            Layout(hourly_loss_chart, size=5),
+            Layout(hourly_reward_chart, size=5),
             Layout(footer, size=3)
         )
         
@@ -3,19 +3,23 @@ Swarm Pulse - CodeZero Log Visualizer
 Real-time monitoring dashboard for CodeZero node runners
 """
 
+import os
 import streamlit as st
 import pandas as pd
 from pathlib import Path
-import time
 from datetime import datetime, timedelta
 
-from log_parser import LogParser
+from ingest_service import IngestService
+from log_sources import expand_sources
+from parse_cache import ParseCache
+from render_cache import VersionedCache
 from log_watcher import LogWatcher, tail_file
 from visualizations import (
     create_difficulty_chart,
     create_loss_chart,
     create_reward_chart,
     create_diversity_chart,
+    create_history_chart,
     calculate_health_metrics
 )
 
@@ -45,17 +49,249 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
+# Time range choices (None = everything loaded)
+TIME_RANGES = {
+    "All": None,
+    "Last hour": timedelta(hours=1),
+    "Last 6 hours": timedelta(hours=6),
+    "Last 24 hours": timedelta(hours=24),
+    "Custom": None,
+}
+
+# Chart choices; only the selected one is built
+CHARTS = ["📈 Difficulty", "📉 Learning", "💰 Rewards", "🎨 Diversity", "📜 History"]
+
+# Parsed events are cached next to the app, so restarts only parse new lines
+CACHE_DIR = Path(__file__).parent / ".cache"
+
+
+@st.cache_resource(show_spinner="Loading log file...")
+def get_ingest_service(log_path: str, retention_hours: float = 0) -> IngestService:
+    """
+    Return the background ingester for a log source
+    
+    Shared by all sessions of this server process, so the log is parsed
+    once no matter how many dashboards are open.
+    """
+    service = IngestService(log_path, cache=ParseCache(CACHE_DIR),
+                            retention_hours=retention_hours)
+    service.start()
+    return service
+
+
+@st.cache_resource
+def get_render_cache() -> VersionedCache:
+    """Figures and metrics reused while their event tables are unchanged"""
+    return VersionedCache(max_entries=64)
+
+
+def render_metrics(metrics):
+    """Health status banner and metric cards"""
+    # Health status banner
+    status_emoji = {
+        'healthy': '🟢',
+        'warning': '🟡',
+        'critical': '🔴',
+        'unknown': '⚪'
+    }
+    
+    status_text = {
+        'healthy': 'Healthy - Node is performing well!',
+        'warning': 'Warning - Some metrics need attention',
+        'critical': 'Critical - Multiple issues detected',
+        'unknown': 'Unknown - Insufficient data'
+    }
+    
+    health_status = metrics['health_status']
+    st.markdown(f"### {status_emoji[health_status]} {status_text[health_status]}")
+    
+    # Metrics cards
+    col1, col2, col3, col4, col5 = st.columns(5)
+    
+    with col1:
+        st.metric(
+            "Avg Loss",
+            f"{metrics['avg_loss']:.4f}" if metrics['avg_loss'] else "N/A",
+            delta="Lower is better",
+            delta_color="inverse"
+        )
+    
+    with col2:
+        st.metric(
+            "Total Rewards",
+            f"{metrics['total_rewards']:.4f}" if metrics['total_rewards'] else "0.0000"
+        )
+    
+    with col3:
+        st.metric(
+            "Avg Rank",
+            f"{metrics['avg_rank_percentile']:.1f}%" if metrics['avg_rank_percentile'] else "N/A",
+            delta="Top percentile"
+        )
+    
+    with col4:
+        st.metric(
+            "Avg Diversity",
+            f"{metrics['avg_diversity']:.2f}" if metrics['avg_diversity'] else "N/A",
+            delta="> 0.6 is healthy"
+        )
+    
+    with col5:
+        st.metric(
+            "Updates/Hour",
+            f"{metrics['updates_per_hour']:.1f}" if metrics['updates_per_hour'] else "N/A"
+        )
+
+
+def render_percentiles(stats, retention_hours=0):
+    """Median and 95th percentile of rewards and diversity over rolling windows"""
+    rows = []
+    for metric, label in (('reward', 'Reward'), ('diversity', 'Diversity')):
+        if metric not in stats:
+            continue
+        for window, values in stats[metric]['windows'].items():
+            rows.append({
+                'Metric': label,
+                'Window': window,
+                'Events': values['count'],
+                'p50': values['p50'],
+                'p95': values['p95']
+            })
+    if not rows:
+        return
+    
+    windows = ' / '.join(dict.fromkeys(row['Window'] for row in rows))
+    with st.expander(f"📊 Percentiles (last {windows} of logged events)"):
+        st.dataframe(pd.DataFrame(rows), hide_index=True, use_container_width=True)
+        if retention_hours:
+            st.caption(f"Windows are capped at the {retention_hours:g}h retention horizon; "
+                       "older events are only kept as aggregates")
+
+
+def cached(view, name, tables, versions, build):
+    """
+    Reuse what build() returned while the given event tables are unchanged
+    
+    Args:
+        view: (log source, time window) the data was taken from
+        name: What is built
+        tables: Event types the result is computed from
+        versions: Version of each event table in the snapshot
+        build: Computes the result
+    """
+    version = tuple(versions.get(table, 0) for table in tables)
+    return get_render_cache().get(view + (name,), version, build)
+
+
+def difficulty_stats(df, history):
+    if df.empty:
+        return None
+    current_diff = df['to_level'].iat[-1]
+    changes = len(df)
+    if 'difficulty_changes.to_level' in history:
+        changes += int(history['difficulty_changes.to_level']['count'].sum())
+    return f"""
+    **Current Difficulty:** Level {current_diff}  
+    **Total Adjustments:** {changes}
+    """
+
+
+def learning_stats(df, history):
+    if df.empty:
+        return None
+    current_loss = df['loss'].iat[-1]
+    total_epochs = df['epoch'].iat[-1]
+    return f"""
+    **Current Loss:** {current_loss:.4f}  
+    **Total Epochs:** {total_epochs}
+    """
+
+
+def reward_stats(df, history):
+    if df.empty:
+        return None
+    total_rewards = df['amount'].sum()
+    if 'rewards.amount' in history:
+        total_rewards += history['rewards.amount']['sum'].sum()
+    avg_rank = df['rank'].mean()
+    return f"""
+    **Total Earned:** {total_rewards:.4f}  
+    **Average Rank:** #{avg_rank:.1f}
+    """
+
+
+def diversity_stats(df, history):
+    if df.empty:
+        return None
+    avg_div = df['diversity_score'].mean()
+    total_rollouts = len(df)
+    if 'rollouts.diversity_score' in history:
+        total_rollouts += int(history['rollouts.diversity_score']['count'].sum())
+    return f"""
+    **Average Diversity:** {avg_div:.2f}  
+    **Total Rollouts:** {total_rollouts}
+    """
+
+
+# Chart choice -> (event type, figure builder, stats builder)
+EVENT_CHARTS = {
+    "📈 Difficulty": ('difficulty_changes', create_difficulty_chart, difficulty_stats),
+    "📉 Learning": ('policy_updates', create_loss_chart, learning_stats),
+    "💰 Rewards": ('rewards', create_reward_chart, reward_stats),
+    "🎨 Diversity": ('rollouts', create_diversity_chart, diversity_stats),
+}
+
+
+def render_chart(chart, data, history, view, versions):
+    """The selected chart and the stats below it"""
+    if chart in EVENT_CHARTS:
+        table, create_chart, create_stats = EVENT_CHARTS[chart]
+        df = data[table]
+        st.plotly_chart(
+            cached(view, chart, (table,), versions, lambda: create_chart(df)),
+            use_container_width=True
+        )
+        
+        # Stats
+        stats = cached(view, chart + " stats", (table,), versions,
+                       lambda: create_stats(df, history))
+        if stats:
+            st.markdown(stats)
+    
+    elif chart == "📜 History":
+        retention_hours = st.session_state.service.retention_hours
+        if retention_hours:
+            st.caption(
+                f"Events older than {retention_hours:g}h are kept as per-minute, "
+                "per-hour and per-day aggregates"
+            )
+        else:
+            st.caption("Set retention_hours in config.ini to keep long-running sessions at flat memory")
+        
+        st.plotly_chart(
+            cached(view, "history loss", ('policy_updates',), versions,
+                   lambda: create_history_chart(history.get('policy_updates.loss'), "Long-term Loss", "Loss")),
+            use_container_width=True
+        )
+        st.plotly_chart(
+            cached(view, "history rewards", ('rewards',), versions,
+                   lambda: create_history_chart(history.get('rewards.amount'), "Long-term Rewards", "Rewards", stat='sum')),
+            use_container_width=True
+        )
+
+
 # Initialize session state
-if 'parser' not in st.session_state:
-    st.session_state.parser = LogParser()
-if 'data' not in st.session_state:
-    st.session_state.data = None
+if 'service' not in st.session_state:
+    # Shared ingester of a live log, or this session's own for an upload
+    st.session_state.service = None
+if 'retention_hours' not in st.session_state:
+    st.session_state.retention_hours = 0
 if 'monitoring' not in st.session_state:
     st.session_state.monitoring = False
 if 'log_file_path' not in st.session_state:
     st.session_state.log_file_path = None
-if 'last_update' not in st.session_state:
-    st.session_state.last_update = None
+if 'refresh_interval' not in st.session_state:
+    st.session_state.refresh_interval = 2
 
 # Load config file if exists
 if 'config_loaded' not in st.session_state:
@@ -66,14 +302,18 @@ if 'config_loaded' not in st.session_state:
         config = configparser.ConfigParser()
         config.read(config_path)
         
+        # Full-resolution window; older events are kept as aggregates
+        if config.has_option('DEFAULT', 'retention_hours'):
+            st.session_state.retention_hours = config.getfloat('DEFAULT', 'retention_hours')
+        
         # Auto-load log file path
         if config.has_option('DEFAULT', 'log_file_path'):
             log_path = config.get('DEFAULT', 'log_file_path').strip()
-            if log_path and Path(log_path).exists():
+            if log_path and expand_sources(log_path):
                 st.session_state.log_file_path = log_path
-                st.session_state.parser.parse_file(log_path)
-                st.session_state.data = st.session_state.parser.get_data_dict()
-                st.session_state.last_update = datetime.now()
+                st.session_state.service = get_ingest_service(
+                    log_path, st.session_state.retention_hours
+                )
                 
                 # Auto-start monitoring if configured
                 if config.has_option('DEFAULT', 'auto_start'):
@@ -111,9 +351,9 @@ with st.sidebar:
         if sample_path.exists():
             if st.button("📋 Use Sample Data"):
                 st.session_state.log_file_path = str(sample_path)
-                st.session_state.parser.parse_file(str(sample_path))
-                st.session_state.data = st.session_state.parser.get_data_dict()
-                st.session_state.last_update = datetime.now()
+                st.session_state.service = get_ingest_service(
+                    str(sample_path), st.session_state.retention_hours
+                )
                 st.rerun()
         
         if uploaded_file is not None:
@@ -122,9 +362,14 @@ with st.sidebar:
             temp_path.write_bytes(uploaded_file.getvalue())
             
             st.session_state.log_file_path = str(temp_path)
-            st.session_state.parser.parse_file(str(temp_path))
-            st.session_state.data = st.session_state.parser.get_data_dict()
-            st.session_state.last_update = datetime.now()
+            # Uploads belong to this session, so they are not shared
+            service = IngestService(
+                str(temp_path), cache=ParseCache(CACHE_DIR),
+                retention_hours=st.session_state.retention_hours,
+                workers=os.cpu_count() or 1
+            )
+            service.load()
+            st.session_state.service = service
             st.success("✅ File loaded successfully!")
     
     else:
@@ -132,20 +377,21 @@ with st.sidebar:
         log_path = st.text_input(
             "Log file path",
             placeholder="/path/to/codezero/node.log",
-            help="Enter the full path to your active log file"
+            help="Enter the full path to your active log file (or a glob); rotated files such as node.log.1 and node.log.2.gz are included"
         )
         
         col1, col2 = st.columns(2)
         
         with col1:
             if st.button("▶️ Start", type="primary", disabled=st.session_state.monitoring):
-                if log_path and Path(log_path).exists():
+                if log_path and expand_sources(log_path):
                     st.session_state.log_file_path = log_path
                     st.session_state.monitoring = True
-                    # Load historical data first
-                    st.session_state.parser.parse_file(log_path)
-                    st.session_state.data = st.session_state.parser.get_data_dict()
-                    st.session_state.last_update = datetime.now()
+                    # Loads historical data first, including rotated files,
+                    # unless another session is already following this log
+                    st.session_state.service = get_ingest_service(
+                        log_path, st.session_state.retention_hours
+                    )
                     st.success("🟢 Monitoring started!")
                     st.rerun()
                 else:
@@ -160,46 +406,32 @@ with st.sidebar:
         # Auto-refresh settings
         if st.session_state.monitoring:
             st.markdown("---")
-            refresh_interval = st.slider(
+            # The metric cards and chart refresh on this timer (see
+            # live_view); new entries are parsed by the shared background
+            # ingester, so a refresh only picks up its latest snapshot
+            st.slider(
                 "Auto-refresh interval (seconds)",
                 min_value=1,
                 max_value=10,
-                value=2,
+                key="refresh_interval",
                 help="How often to check for new log entries"
             )
-            
-            # Status indicator
-            if st.session_state.last_update:
-                time_ago = (datetime.now() - st.session_state.last_update).seconds
-                st.markdown(f"🟢 **LIVE** | Last update: {time_ago}s ago")
-            
-            # Auto-refresh logic
-            time.sleep(refresh_interval)
-            
-            # Re-parse file to get new entries
-            if st.session_state.log_file_path:
-                st.session_state.parser.parse_file(
-                    st.session_state.log_file_path
-                )
-                st.session_state.data = st.session_state.parser.get_data_dict()
-                st.session_state.last_update = datetime.now()
-                st.rerun()
     
     # Export data
-    if st.session_state.data:
+    if st.session_state.service is not None:
         st.markdown("---")
         st.subheader("💾 Export")
         
         if st.button("📥 Download CSV"):
             # Convert data to CSV
-            all_data = []
-            for key, items in st.session_state.data.items():
-                for item in items:
-                    item['type'] = key
-                    all_data.append(item)
+            all_data = [
+                frame.assign(type=key)
+                for key, frame in st.session_state.service.snapshot().frames.items()
+                if not frame.empty
+            ]
             
             if all_data:
-                df = pd.DataFrame(all_data)
+                df = pd.concat(all_data, ignore_index=True)
                 csv = df.to_csv(index=False)
                 st.download_button(
                     label="Download",
@@ -209,7 +441,7 @@ with st.sidebar:
                 )
 
 # Main content
-if st.session_state.data is None:
+if st.session_state.service is None:
     # Welcome screen
     st.info("👈 Upload a log file or start real-time monitoring to begin")
     
@@ -236,137 +468,93 @@ if st.session_state.data is None:
     """)
 
 else:
-    # Calculate health metrics
-    metrics = calculate_health_metrics(st.session_state.data)
-    
-    # Health status banner
-    status_emoji = {
-        'healthy': '🟢',
-        'warning': '🟡',
-        'critical': '🔴',
-        'unknown': '⚪'
-    }
-    
-    status_text = {
-        'healthy': 'Healthy - Node is performing well!',
-        'warning': 'Warning - Some metrics need attention',
-        'critical': 'Critical - Multiple issues detected',
-        'unknown': 'Unknown - Insufficient data'
-    }
-    
-    health_status = metrics['health_status']
-    st.markdown(f"### {status_emoji[health_status]} {status_text[health_status]}")
-    
-    # Metrics cards
-    col1, col2, col3, col4, col5 = st.columns(5)
-    
-    with col1:
-        st.metric(
-            "Avg Loss",
-            f"{metrics['avg_loss']:.4f}" if metrics['avg_loss'] else "N/A",
-            delta="Lower is better",
-            delta_color="inverse"
-        )
-    
-    with col2:
-        st.metric(
-            "Total Rewards",
-            f"{metrics['total_rewards']:.4f}" if metrics['total_rewards'] else "0.0000"
-        )
+    # Immutable state published by the ingester; it is not modified while
+    # this run reads it
+    snapshot = st.session_state.service.snapshot()
     
-    with col3:
-        st.metric(
-            "Avg Rank",
-            f"{metrics['avg_rank_percentile']:.1f}%" if metrics['avg_rank_percentile'] else "N/A",
-            delta="Top percentile"
-        )
-    
-    with col4:
-        st.metric(
-            "Avg Diversity",
-            f"{metrics['avg_diversity']:.2f}" if metrics['avg_diversity'] else "N/A",
-            delta="> 0.6 is healthy"
-        )
-    
-    with col5:
-        st.metric(
-            "Updates/Hour",
-            f"{metrics['updates_per_hour']:.1f}" if metrics['updates_per_hour'] else "N/A"
-        )
+    # Time range picker; windows are read straight from the log file
+    # through the parser's timestamp index, at full resolution
+    time_range = "All"
+    custom_window = None
+    bounds = snapshot.time_bounds
+    if bounds and st.session_state.log_file_path:
+        first_time, last_time = bounds
+        range_col, window_col = st.columns([1, 3])
+        with range_col:
+            time_range = st.selectbox("🕒 Time range", list(TIME_RANGES))
+        
+        if time_range == "Custom" and first_time < last_time:
+            with window_col:
+                custom_window = st.slider(
+                    "Window",
+                    min_value=first_time,
+                    max_value=last_time,
+                    value=(first_time, last_time),
+                    format="YYYY-MM-DD HH:mm"
+                )
     
-    st.markdown("---")
+    # Only the selected chart is built (tabs would build all of them)
+    chart = st.radio(
+        "Chart",
+        CHARTS,
+        horizontal=True,
+        label_visibility="collapsed"
+    )
     
-    # Charts
-    tab1, tab2, tab3, tab4 = st.tabs([
-        "📈 Difficulty", 
-        "📉 Learning", 
-        "💰 Rewards", 
-        "🎨 Diversity"
-    ])
+    # While monitoring, only this part reruns on the refresh timer; the
+    # rest of the page is left as it is
+    run_every = st.session_state.refresh_interval if st.session_state.monitoring else None
     
-    with tab1:
-        st.plotly_chart(
-            create_difficulty_chart(st.session_state.data['difficulty_changes']),
-            use_container_width=True
-        )
+    @st.fragment(run_every=run_every)
+    def live_view():
+        service = st.session_state.service
+        snapshot = service.snapshot()
+        data = snapshot.frames
+        versions = snapshot.table_versions
         
-        # Stats
-        if st.session_state.data['difficulty_changes']:
-            df = pd.DataFrame(st.session_state.data['difficulty_changes'])
-            current_diff = df.iloc[-1]['to_level']
-            changes = len(df)
-            st.markdown(f"""
-            **Current Difficulty:** Level {current_diff}  
-            **Total Adjustments:** {changes}
-            """)
-    
-    with tab2:
-        st.plotly_chart(
-            create_loss_chart(st.session_state.data['policy_updates']),
-            use_container_width=True
-        )
+        # Aggregates of events older than the retention window
+        history = snapshot.history
         
-        # Stats
-        if st.session_state.data['policy_updates']:
-            df = pd.DataFrame(st.session_state.data['policy_updates'])
-            current_loss = df.iloc[-1]['loss']
-            total_epochs = df.iloc[-1]['epoch']
-            st.markdown(f"""
-            **Current Loss:** {current_loss:.4f}  
-            **Total Epochs:** {total_epochs}
-            """)
-    
-    with tab3:
-        st.plotly_chart(
-            create_reward_chart(st.session_state.data['rewards']),
-            use_container_width=True
-        )
+        # Preset windows end at the newest event, so they move along
+        window = custom_window
+        if window is None and TIME_RANGES[time_range] and snapshot.time_bounds:
+            last_time = snapshot.time_bounds[1]
+            window = (last_time - TIME_RANGES[time_range], last_time)
+        if window is not None:
+            start, end = window
+            # Read again only when the log has new events
+            data = cached((service.log_path, window), "data", list(versions), versions,
+                          lambda: service.parse_range(start, end + timedelta(seconds=1)).frames())
+            history = {}
         
-        # Stats
-        if st.session_state.data['rewards']:
-            df = pd.DataFrame(st.session_state.data['rewards'])
-            total_rewards = df['amount'].sum()
-            avg_rank = df['rank'].mean()
-            st.markdown(f"""
-            **Total Earned:** {total_rewards:.4f}  
-            **Average Rank:** #{avg_rank:.1f}
-            """)
-    
-    with tab4:
-        st.plotly_chart(
-            create_diversity_chart(st.session_state.data['rollouts']),
-            use_container_width=True
-        )
+        # Cached results are keyed by where the data came from
+        view = (service.log_path, window)
         
-        # Stats
-        if st.session_state.data['rollouts']:
-            df = pd.DataFrame(st.session_state.data['rollouts'])
-            avg_div = df['diversity_score'].mean()
-            total_rollouts = len(df)
-            st.markdown(f"""
-            **Average Diversity:** {avg_div:.2f}  
-            **Total Rollouts:** {total_rollouts}
-            """)
+        if st.session_state.monitoring:
+            time_ago = (datetime.now() - snapshot.updated_at).seconds
+            if not service.is_running:
+                st.caption(f"🔴 **STALE** | Ingestion stopped | Last update: {time_ago}s ago")
+            elif snapshot.error:
+                st.caption(f"🟠 **STALE** | Last update: {time_ago}s ago")
+            else:
+                st.caption(f"🟢 **LIVE** | Last update: {time_ago}s ago")
+            if snapshot.error:
+                st.warning(f"Could not refresh the log, retrying: {snapshot.error}")
+        
+        # Kept up to date by the ingester for the whole log; a window's are
+        # computed from its events
+        if window is None:
+            metrics = snapshot.metrics
+        else:
+            metrics = cached(view, "metrics", ('policy_updates', 'rewards', 'rollouts'), versions,
+                             lambda: calculate_health_metrics(data, history))
+        render_metrics(metrics)
+        if window is None:
+            render_percentiles(snapshot.stats, service.retention_hours)
+        st.markdown("---")
+        render_chart(chart, data, history, view, versions)
+    
+    live_view()
 
 # Footer
 st.markdown("---")
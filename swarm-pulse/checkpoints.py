@@ -0,0 +1,105 @@
+"""
+Durable Watcher Checkpoints
+
+Records how far a watcher has read a log file, so that after a restart it
+resumes exactly where it stopped instead of jumping to the end (losing
+what was written meanwhile) or re-reading the whole file. A checkpoint
+holds the file's device and inode, the offset just after the last line
+handled, and a hash of the file's first bytes to recognize it (or its
+rotated copy) later. Checkpoints are small JSON files, replaced
+atomically.
+"""
+
+import hashlib
+import json
+import os
+import time
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+
+@dataclass
+class Checkpoint:
+    path: str
+    device: int
+    inode: int
+    offset: int
+    # sha1 of the first head_length bytes of the file
+    head: str
+    head_length: int
+
+    def matches_head(self, head: bytes) -> bool:
+        """Check whether a file starting with head is the checkpointed one"""
+        if len(head) < self.head_length:
+            return False
+        return hashlib.sha1(head[:self.head_length]).hexdigest() == self.head
+
+
+class CheckpointFile:
+    """One watcher's checkpoint on disk"""
+
+    # Bump when the layout of the state file changes
+    FORMAT_VERSION = 1
+
+    def __init__(self, path: str, interval: float = 5.0):
+        """
+        Initialize checkpoint file
+
+        Args:
+            path: Where the checkpoint is kept
+            interval: Least number of seconds between writes, unless forced
+        """
+        self.path = Path(path)
+        self.interval = interval
+        self._saved: Optional[Checkpoint] = None
+        self._saved_at = 0.0
+
+    def load(self) -> Optional[Checkpoint]:
+        """Return the stored checkpoint, or None if there is no readable one"""
+        try:
+            with open(self.path) as f:
+                state = json.load(f)
+            if state.pop('version', None) != self.FORMAT_VERSION:
+                return None
+            checkpoint = Checkpoint(**state)
+        except (OSError, ValueError, TypeError):
+            return None
+        self._saved = checkpoint
+        return checkpoint
+
+    def save(self, filepath: str, file_id: Tuple[int, int], offset: int, head: bytes,
+             force: bool = False) -> None:
+        """
+        Record the read position in a file
+
+        Args:
+            filepath: Path the file is watched under
+            file_id: (device, inode) of the file
+            offset: Offset just after the last line handled
+            head: First bytes of the file
+            force: Write even if the interval has not passed
+        """
+        if not force and time.monotonic() - self._saved_at < self.interval:
+            return
+        checkpoint = Checkpoint(
+            path=str(filepath),
+            device=file_id[0],
+            inode=file_id[1],
+            offset=offset,
+            head=hashlib.sha1(head).hexdigest(),
+            head_length=len(head)
+        )
+        self._saved_at = time.monotonic()
+        if checkpoint == self._saved:
+            return
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self.path.with_name(self.path.name + '.tmp')
+        # Write then rename, so a crash never leaves a half-written checkpoint
+        with open(temp_path, 'w') as f:
+            json.dump({'version': self.FORMAT_VERSION, **asdict(checkpoint)}, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, self.path)
+        self._saved = checkpoint
@@ -0,0 +1,99 @@
+"""
+Downsampling of Long Time Series for Charts
+
+A chart a couple of thousand pixels wide cannot show more points than
+that, yet sending every event of a long-running node makes the figure
+tens of megabytes. These functions pick the subset of points to plot:
+
+- lttb: Largest-Triangle-Three-Buckets, which keeps the visual shape of a
+  line (peaks, dips and trends) with the given number of points
+- min_max: the lowest and highest point of each bucket, for bars and
+  noisy series where every spike must stay visible
+
+Both return indices into the original arrays, so that other columns
+(hover data, a second trace) can be taken at the same rows.
+"""
+
+import numpy as np
+
+
+def lttb(x: np.ndarray, y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Select points that preserve the shape of a line
+
+    The first and last points are always kept. The rest is split into
+    points - 2 buckets; from each, the point forming the largest triangle
+    with the point kept from the previous bucket and the average of the
+    next bucket is kept.
+
+    Args:
+        x: Ascending x values (numbers, or datetime64)
+        y: Y values, without NaN
+        points: Number of points to keep
+
+    Returns:
+        Ascending indices of the kept points (all of them if there are
+        no more than points)
+    """
+    size = len(x)
+    if points >= size or points < 3:
+        return np.arange(size)
+    x = _as_float(x)
+    y = np.asarray(y, dtype=float)
+
+    # Bucket i spans [edges[i], edges[i + 1]); the first and last point
+    # are buckets of their own
+    edges = np.linspace(1, size - 1, points - 1).astype(np.int64)
+    kept = np.empty(points, dtype=np.int64)
+    kept[0] = 0
+    kept[-1] = size - 1
+    previous = 0
+    for bucket in range(points - 2):
+        start, end = edges[bucket], edges[bucket + 1]
+        if bucket + 2 < len(edges):
+            next_start, next_end = end, edges[bucket + 2]
+        else:
+            next_start, next_end = size - 1, size
+        average_x = x[next_start:next_end].mean()
+        average_y = y[next_start:next_end].mean()
+
+        # Twice the triangle area; the factor does not change the argmax
+        area = np.abs(
+            (x[previous] - average_x) * (y[start:end] - y[previous])
+            - (x[previous] - x[start:end]) * (average_y - y[previous])
+        )
+        previous = start + int(np.argmax(area))
+        kept[bucket + 1] = previous
+    return kept
+
+
+def min_max(y: np.ndarray, points: int) -> np.ndarray:
+    """
+    Select the lowest and highest point of equal-sized buckets
+
+    Args:
+        y: Y values, without NaN
+        points: Most points to keep (two per bucket)
+
+    Returns:
+        Ascending indices of the kept points (all of them if there are
+        no more than points)
+    """
+    size = len(y)
+    if points >= size or points < 2:
+        return np.arange(size)
+    y = np.asarray(y, dtype=float)
+    edges = np.linspace(0, size, points // 2 + 1).astype(np.int64)
+    kept = np.empty(2 * (len(edges) - 1), dtype=np.int64)
+    for bucket, (start, end) in enumerate(zip(edges[:-1], edges[1:])):
+        values = y[start:end]
+        kept[2 * bucket] = start + int(np.argmin(values))
+        kept[2 * bucket + 1] = start + int(np.argmax(values))
+    return np.unique(kept)
+
+
+def _as_float(values: np.ndarray) -> np.ndarray:
+    values = np.asarray(values)
+    if np.issubdtype(values.dtype, np.datetime64):
+        values = values.astype('datetime64[ns]').astype(np.int64)
+    return values.astype(float)
@@ -0,0 +1,477 @@
+"""
+Columnar Event Store for Parsed CodeZero Logs
+
+Holds each event type as a set of typed NumPy columns instead of a list of
+dataclass instances:
+- Timestamps as int64 epoch seconds (log wall-clock time, no timezone)
+- Numeric fields as int32/int64/float64 arrays
+- Problem ids interned once per store and kept as int32 codes
+
+Columns grow by doubling, so appends are amortized O(1). Rows below the
+current length are never written again, which makes the views returned by
+column() and frame() stable snapshots that can be handed to pandas/NumPy
+without copying. compact() moves the remaining rows to new buffers instead
+of shifting them, so it keeps earlier snapshots intact as well.
+"""
+
+import itertools
+import json
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Any
+
+import numpy as np
+import pandas as pd
+
+from retention import TIERS, Bucket, TieredSeries
+
+
+EPOCH = datetime(1970, 1, 1)
+ONE_SECOND = timedelta(seconds=1)
+
+# Sentinel for missing values in integer columns (floats use NaN)
+MISSING_INT = -1
+
+# Source of EventTable.version: every change of any table gets a new
+# number, so versions never repeat across stores (e.g. after a re-parse)
+_VERSIONS = itertools.count(1)
+
+# Column layout per event type, in dataclass field order
+SCHEMAS = {
+    'policy_updates': (
+        ('timestamp', 'int64'),
+        ('epoch', 'int64'),
+        ('loss', 'float64'),
+        ('gradient_norm', 'float64'),
+    ),
+    'rewards': (
+        ('timestamp', 'int64'),
+        ('amount', 'float64'),
+        ('rank', 'int32'),
+        ('total_solvers', 'int32'),
+        ('problem_id', 'int32'),
+    ),
+    'difficulty_changes': (
+        ('timestamp', 'int64'),
+        ('from_level', 'int32'),
+        ('to_level', 'int32'),
+        ('swarm_success_rate', 'float64'),
+    ),
+    'rollouts': (
+        ('timestamp', 'int64'),
+        ('problem_id', 'int32'),
+        ('steps', 'int32'),
+        ('diversity_score', 'float64'),
+    ),
+}
+
+# Integer columns where MISSING_INT stands for None
+NULLABLE_INT_COLUMNS = {'steps'}
+
+# Columns kept as minute/hour/day aggregates once their rows are compacted
+# away; the first column of each table also gives the event count.
+# rank_percentile is derived from rank and total_solvers (see
+# EventStore._aggregate_values), so its lifetime mean survives compaction
+AGGREGATED_COLUMNS = {
+    'policy_updates': ('loss', 'gradient_norm', 'epoch'),
+    'rewards': ('amount', 'rank', 'rank_percentile'),
+    'difficulty_changes': ('to_level', 'swarm_success_rate'),
+    'rollouts': ('diversity_score', 'steps'),
+}
+
+
+def to_epoch_seconds(timestamp: datetime) -> int:
+    """Convert a naive log timestamp to epoch seconds"""
+    return (timestamp - EPOCH) // ONE_SECOND
+
+
+def from_epoch_seconds(seconds: int) -> datetime:
+    """Convert epoch seconds back to a naive log timestamp"""
+    return EPOCH + timedelta(seconds=seconds)
+
+
+class EventTable:
+    """Growable columnar table for one event type"""
+
+    def __init__(self, name: str, store: 'EventStore', capacity: int = 1024):
+        """
+        Initialize empty table
+
+        Args:
+            name: Event type name (key of SCHEMAS)
+            store: Owning store, used to resolve problem id codes
+            capacity: Initial number of rows to allocate
+        """
+        self.name = name
+        self.schema = SCHEMAS[name]
+        self.store = store
+        # Changes on every write (see _VERSIONS); 0 while empty
+        self.version = 0
+        # Rows removed from the front by drop(), so that row i of the table
+        # is the (dropped + i)-th event ever appended
+        self.dropped = 0
+        self._size = 0
+        self._capacity = capacity
+        self._buffers = [np.empty(capacity, dtype=dtype) for _, dtype in self.schema]
+        self._index = {column: i for i, (column, _) in enumerate(self.schema)}
+
+    def __len__(self) -> int:
+        return self._size
+
+    def append(self, *values) -> None:
+        """Append one row, given in schema order with encoded values"""
+        size = self._size
+        if size == self._capacity:
+            self._reserve(size + 1)
+        for buffer, value in zip(self._buffers, values):
+            buffer[size] = value
+        self._size = size + 1
+        self.version = next(_VERSIONS)
+
+    def extend(self, columns: Dict[str, np.ndarray]) -> None:
+        """
+        Append many rows at once
+
+        Args:
+            columns: Encoded array per schema column, all the same length
+        """
+        count = len(columns[self.schema[0][0]])
+        if count == 0:
+            return
+        size = self._size
+        self._reserve(size + count)
+        for (column, _), buffer in zip(self.schema, self._buffers):
+            buffer[size:size + count] = columns[column]
+        self._size = size + count
+        self.version = next(_VERSIONS)
+
+    def set(self, row: int, column: str, value) -> None:
+        """
+        Overwrite one value in place
+
+        Only for tables that have not been shared yet (e.g. while merging
+        chunk results), since it breaks the append-only guarantee.
+        """
+        self._buffers[self._index[column]][row] = value
+        self.version = next(_VERSIONS)
+
+    def recode(self, column: str, codes: np.ndarray) -> None:
+        """
+        Map every value of an integer column through codes
+
+        The column gets a new buffer, so existing views keep the old
+        values. A value of -1 picks the last entry of codes.
+        """
+        i = self._index[column]
+        buffer = self._buffers[i]
+        recoded = np.empty(self._capacity, dtype=buffer.dtype)
+        recoded[:self._size] = codes[buffer[:self._size]]
+        self._buffers[i] = recoded
+        self.version = next(_VERSIONS)
+
+    def drop(self, count: int) -> None:
+        """Remove the first count rows"""
+        size = self._size - count
+        capacity = max(size, 1024)
+        buffers = []
+        for buffer in self._buffers:
+            kept = np.empty(capacity, dtype=buffer.dtype)
+            kept[:size] = buffer[count:self._size]
+            buffers.append(kept)
+        # New buffers, so existing views keep showing the dropped rows
+        self._buffers = buffers
+        self._capacity = capacity
+        self._size = size
+        self.dropped += count
+        self.version = next(_VERSIONS)
+
+    def _reserve(self, needed: int) -> None:
+        """Grow buffers (by doubling) so that they can hold needed rows"""
+        if needed <= self._capacity:
+            return
+        capacity = max(self._capacity * 2, needed)
+        buffers = []
+        for buffer in self._buffers:
+            grown = np.empty(capacity, dtype=buffer.dtype)
+            grown[:self._size] = buffer[:self._size]
+            buffers.append(grown)
+        # Swap in new buffers; views of the old ones stay valid
+        self._buffers = buffers
+        self._capacity = capacity
+
+    def __getstate__(self):
+        # Only pickle used rows (tables travel back from worker processes)
+        state = self.__dict__.copy()
+        state['_buffers'] = [buffer[:self._size].copy() for buffer in self._buffers]
+        state['_capacity'] = self._size
+        return state
+
+    def column(self, name: str) -> np.ndarray:
+        """Return a read-only, zero-copy view of one encoded column"""
+        view = self._buffers[self._index[name]][:self._size]
+        view.flags.writeable = False
+        return view
+
+    def frame(self) -> pd.DataFrame:
+        """
+        Build a DataFrame over the current rows without copying columns
+
+        Timestamps become datetime64[s], problem ids a Categorical and
+        nullable integer columns pandas' Int64.
+        """
+        columns = {}
+        for name, _ in self.schema:
+            values = self.column(name)
+            if name == 'timestamp':
+                values = values.view('datetime64[s]')
+            elif name == 'problem_id':
+                values = pd.Categorical.from_codes(
+                    values, categories=self.store.problem_id_index()
+                )
+            elif name in NULLABLE_INT_COLUMNS:
+                values = pd.arrays.IntegerArray(values, values == MISSING_INT)
+            columns[name] = values
+        return pd.DataFrame(columns, copy=False)
+
+    def records(self) -> List[Dict[str, Any]]:
+        """Decode rows into dictionaries of plain Python values"""
+        names = [name for name, _ in self.schema]
+        decoded = []
+        for name in names:
+            values = self.column(name).tolist()
+            if name == 'timestamp':
+                values = [from_epoch_seconds(v) for v in values]
+            elif name == 'problem_id':
+                values = [self.store.problem_id(v) for v in values]
+            elif name in NULLABLE_INT_COLUMNS:
+                values = [None if v == MISSING_INT else v for v in values]
+            elif self.column(name).dtype.kind == 'f':
+                values = [None if v != v else v for v in values]
+            decoded.append(values)
+        return [dict(zip(names, row)) for row in zip(*decoded)]
+
+
+class EventStore:
+    """Columnar tables for all CodeZero event types"""
+
+    def __init__(self):
+        self.tables = {name: EventTable(name, self) for name in SCHEMAS}
+        self._problem_ids: List[str] = []
+        self._problem_codes: Dict[str, int] = {}
+        self._problem_index: Optional[pd.Index] = None
+        # Aggregates of compacted rows, keyed by 'table.column'
+        self.history: Dict[str, TieredSeries] = {}
+
+    def __getitem__(self, name: str) -> EventTable:
+        return self.tables[name]
+
+    def __iter__(self):
+        return iter(self.tables)
+
+    def items(self):
+        return self.tables.items()
+
+    def intern_problem_id(self, problem_id: Optional[str]) -> int:
+        """Return the code for problem_id, assigning a new one if unseen"""
+        if problem_id is None:
+            return MISSING_INT
+        code = self._problem_codes.get(problem_id)
+        if code is None:
+            code = len(self._problem_ids)
+            self._problem_ids.append(problem_id)
+            self._problem_codes[problem_id] = code
+        return code
+
+    def problem_id(self, code: int) -> Optional[str]:
+        """Return the problem id for a code"""
+        return None if code == MISSING_INT else self._problem_ids[code]
+
+    def problem_id_index(self) -> pd.Index:
+        """Return interned problem ids as a pandas Index (cached until new ids arrive)"""
+        if self._problem_index is None or len(self._problem_index) != len(self._problem_ids):
+            self._problem_index = pd.Index(self._problem_ids, dtype=object)
+        return self._problem_index
+
+    def extend(self, other: 'EventStore') -> None:
+        """Append all events of another store, re-coding its problem ids"""
+        codes = np.array(
+            [self.intern_problem_id(pid) for pid in other._problem_ids] + [MISSING_INT],
+            dtype='int32'
+        )
+        for name, table in other.tables.items():
+            columns = {column: table.column(column) for column, _ in table.schema}
+            if 'problem_id' in columns:
+                # Index -1 (missing) picks the trailing MISSING_INT entry
+                columns['problem_id'] = codes[columns['problem_id']]
+            self.tables[name].extend(columns)
+
+    def between(self, start: Optional[int] = None, end: Optional[int] = None) -> 'EventStore':
+        """
+        Return a new store with the events in [start, end)
+
+        Args:
+            start: Epoch seconds (default: no lower bound)
+            end: Epoch seconds, exclusive (default: no upper bound)
+        """
+        subset = EventStore()
+        for problem_id in self._problem_ids:
+            subset.intern_problem_id(problem_id)
+        for name, table in self.tables.items():
+            timestamps = table.column('timestamp')
+            selected = np.ones(len(table), dtype=bool)
+            if start is not None:
+                selected &= timestamps >= start
+            if end is not None:
+                selected &= timestamps < end
+            subset.tables[name].extend({
+                column: table.column(column)[selected] for column, _ in table.schema
+            })
+        return subset
+
+    def compact(self, cutoff: int) -> None:
+        """
+        Fold events older than cutoff into self.history and drop them
+
+        A table is only rewritten once at least a quarter of its rows have
+        expired, so steady appends compact in amortized O(1). Rows are
+        expected in roughly chronological order; the expired prefix ends
+        at the first event at or after cutoff. Problem ids that only the
+        dropped rows used are released as well.
+
+        Args:
+            cutoff: Epoch seconds; older events lose full resolution
+        """
+        compacted = False
+        for table in self.tables.values():
+            recent = table.column('timestamp') >= cutoff
+            expired = int(np.argmax(recent)) if recent.any() else len(table)
+            if expired == 0 or expired * 4 < len(table):
+                continue
+            self._aggregate(table, expired)
+            table.drop(expired)
+            compacted = True
+        if compacted:
+            self._release_problem_ids()
+
+    def _release_problem_ids(self) -> None:
+        """Forget problem ids no row refers to, renumbering the rest"""
+        tables = [table for table in self.tables.values() if 'problem_id' in table._index]
+        # The extra last slot absorbs MISSING_INT (index -1)
+        used = np.zeros(len(self._problem_ids) + 1, dtype=bool)
+        for table in tables:
+            used[table.column('problem_id')] = True
+        kept = np.flatnonzero(used[:-1])
+        if len(kept) == len(self._problem_ids):
+            return
+        codes = np.full(len(self._problem_ids) + 1, MISSING_INT, dtype='int32')
+        codes[kept] = np.arange(len(kept), dtype='int32')
+        for table in tables:
+            table.recode('problem_id', codes)
+        # New list and index, so frames taken earlier keep their categories
+        self._problem_ids = [self._problem_ids[code] for code in kept.tolist()]
+        self._problem_codes = {problem_id: code for code, problem_id in enumerate(self._problem_ids)}
+        self._problem_index = None
+
+    def _aggregate(self, table: EventTable, count: int) -> None:
+        """Add the first count rows of a table to the per-minute history"""
+        _, width = TIERS[0]
+        timestamps = table.column('timestamp')[:count]
+        for column in AGGREGATED_COLUMNS[table.name]:
+            values = self._aggregate_values(table, column, count)
+            if column in NULLABLE_INT_COLUMNS:
+                present = values != MISSING_INT
+            else:
+                present = values == values
+            values = values[present].astype(np.float64)
+            if not len(values):
+                continue
+            minutes, groups = np.unique(timestamps[present] // width, return_inverse=True)
+            counts = np.bincount(groups)
+            sums = np.bincount(groups, weights=values)
+            mins = np.full(len(minutes), np.inf)
+            np.minimum.at(mins, groups, values)
+            maxs = np.full(len(minutes), -np.inf)
+            np.maximum.at(maxs, groups, values)
+            last_rows = np.zeros(len(minutes), dtype=np.int64)
+            np.maximum.at(last_rows, groups, np.arange(len(values)))
+
+            series = self.history.setdefault(f'{table.name}.{column}', TieredSeries())
+            for minute, *summary in zip(minutes.tolist(), counts.tolist(), sums.tolist(),
+                                        mins.tolist(), maxs.tolist(), values[last_rows].tolist()):
+                series.add_bucket(minute * width, Bucket(*summary))
+
+    @staticmethod
+    def _aggregate_values(table: EventTable, column: str, count: int) -> np.ndarray:
+        """Values of column in the first count rows (NaN where missing)"""
+        if column == 'rank_percentile':
+            ranks = table.column('rank')[:count].astype(np.float64)
+            solvers = table.column('total_solvers')[:count].astype(np.float64)
+            solvers[solvers <= 0] = np.nan
+            # As in health.HealthAggregator.add_reward
+            return (1 - (ranks - 1) / solvers) * 100
+        return table.column(column)[:count]
+
+    def history_total(self, key: str) -> Bucket:
+        """Summary of all compacted values of 'table.column'"""
+        series = self.history.get(key)
+        return series.total() if series is not None else Bucket()
+
+    def history_frames(self) -> Dict[str, pd.DataFrame]:
+        """
+        Return the aggregates of compacted rows per 'table.column'
+
+        Each frame has one row per bucket, oldest first, with columns
+        timestamp (bucket start), tier, count, sum, min, max, mean and last.
+        """
+        frames = {}
+        for key, series in self.history.items():
+            rows = [
+                (start, tier, bucket.count, bucket.sum, bucket.min, bucket.max, bucket.mean, bucket.last)
+                for tier, start, bucket in series.buckets()
+            ]
+            frame = pd.DataFrame(
+                rows, columns=['timestamp', 'tier', 'count', 'sum', 'min', 'max', 'mean', 'last']
+            )
+            frame['timestamp'] = frame['timestamp'].to_numpy(dtype=np.int64).view('datetime64[s]')
+            frames[key] = frame
+        return frames
+
+    def to_arrays(self) -> Dict[str, np.ndarray]:
+        """
+        Export all columns as flat arrays (e.g. for np.savez)
+
+        Keys are 'table.column', plus 'problem_ids' for the interned ids
+        in code order and 'history' for the compacted aggregates (JSON).
+        """
+        arrays = {
+            f'{name}.{column}': table.column(column)
+            for name, table in self.tables.items()
+            for column, _ in table.schema
+        }
+        arrays['problem_ids'] = np.array(self._problem_ids, dtype=str)
+        arrays['history'] = np.array(json.dumps(
+            {key: series.to_state() for key, series in self.history.items()}
+        ))
+        return arrays
+
+    @classmethod
+    def from_arrays(cls, arrays: Dict[str, np.ndarray]) -> 'EventStore':
+        """Rebuild a store from the output of to_arrays()"""
+        store = cls()
+        for problem_id in arrays['problem_ids'].tolist():
+            store.intern_problem_id(problem_id)
+        for name, table in store.tables.items():
+            table.extend({column: arrays[f'{name}.{column}'] for column, _ in table.schema})
+        if 'history' in arrays:
+            store.history = {
+                key: TieredSeries.from_state(state)
+                for key, state in json.loads(str(arrays['history'])).items()
+            }
+        return store
+
+    def frames(self) -> Dict[str, pd.DataFrame]:
+        """Return a zero-copy DataFrame per event type"""
+        return {name: table.frame() for name, table in self.tables.items()}
+
+    def records(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Return plain dictionaries per event type"""
+        return {name: table.records() for name, table in self.tables.items()}
@@ -0,0 +1,235 @@
+"""
+File Change Notifications
+
+Lets a watcher sleep until a log file changes instead of polling it. On
+Linux, inotify is used through ctypes: the file is watched for writes,
+renames and deletion, and its directory for a file of the same name
+being created or moved in, so a rotated log wakes the watcher as well.
+Elsewhere, or when inotify cannot be set up (e.g. the watch limit is
+reached), waiting falls back to sleeping for the poll interval. A waiter
+can also report other files matching a name pattern appearing in the
+directory, and be pointed at another file in it (see DirectoryWatcher).
+
+inotify is reached through libc with ctypes rather than a binding
+package, so following a log needs nothing extra installed.
+"""
+
+import ctypes
+import ctypes.util
+import fnmatch
+import os
+import select
+import struct
+import sys
+import time
+from typing import Optional
+
+
+# inotify event masks (see inotify(7))
+IN_MODIFY = 0x00000002
+IN_ATTRIB = 0x00000004
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_DELETE_SELF = 0x00000400
+IN_MOVE_SELF = 0x00000800
+IN_IGNORED = 0x00008000
+
+FILE_EVENTS = IN_MODIFY | IN_ATTRIB | IN_MOVE_SELF | IN_DELETE_SELF
+DIRECTORY_EVENTS = IN_CREATE | IN_MOVED_TO
+
+# struct inotify_event header: wd, mask, cookie, len (then len bytes of name)
+EVENT_HEADER = struct.Struct('iIII')
+
+
+class PollingWaiter:
+    """Fallback that waits by sleeping"""
+
+    # Descriptor that becomes readable on a change (see InotifyWaiter);
+    # polling has none, so event loops fall back to a timer
+    fd = -1
+
+    # Set when a file matching the name pattern appeared in the directory;
+    # polling cannot tell, so it stays None and callers rescan periodically
+    directory_changed = None
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for the file to change
+
+        Args:
+            timeout: Seconds to wait at most
+
+        Returns:
+            Whether a change was seen (always False: polling cannot tell)
+        """
+        time.sleep(timeout)
+        return False
+
+    def close(self) -> None:
+        pass
+
+    def follow(self, filepath: str) -> None:
+        """Watch another file in the same directory instead"""
+
+    def __enter__(self) -> 'PollingWaiter':
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+
+
+class InotifyWaiter(PollingWaiter):
+    """Wait for changes to one file with Linux inotify"""
+
+    def __init__(self, filepath: str, name_pattern: Optional[str] = None):
+        """
+        Watch a file and its directory
+
+        Args:
+            filepath: Path to the file
+            name_pattern: Also report files matching this glob (e.g.
+                "*.log") being created or moved into the directory
+
+        Raises:
+            OSError: If inotify is unavailable or the watches cannot be added
+        """
+        self.filepath = os.fsencode(filepath)
+        self.name = os.path.basename(self.filepath)
+        self.name_pattern = os.fsencode(name_pattern) if name_pattern is not None else None
+        self.directory_changed = False
+        self._libc = _libc()
+        self.fd = self._libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        if self.fd < 0:
+            raise _errno_error('inotify_init1')
+        self._file_wd = -1
+        try:
+            directory = os.path.dirname(self.filepath) or b'.'
+            self._directory_wd = self._add_watch(directory, DIRECTORY_EVENTS)
+            self._watch_file()
+        except OSError:
+            os.close(self.fd)
+            raise
+
+    def wait(self, timeout: float) -> bool:
+        """
+        Wait for the file to change
+
+        Events already queued (e.g. a write made since the last read)
+        return at once, so no change between reads is missed.
+
+        Args:
+            timeout: Seconds to wait at most
+
+        Returns:
+            Whether the file (or its name in the directory) changed
+        """
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return False
+
+        changed = False
+        renamed = False
+        for wd, mask, name in self._read_events():
+            if wd == self._directory_wd:
+                if name == self.name:
+                    changed = renamed = True
+                elif self.name_pattern is not None and fnmatch.fnmatch(name, self.name_pattern):
+                    changed = self.directory_changed = True
+            elif wd == self._file_wd:
+                changed = True
+                if mask & (IN_MOVE_SELF | IN_DELETE_SELF | IN_IGNORED):
+                    renamed = True
+
+        # A new file now has the watched name: follow it
+        if renamed:
+            self._watch_file()
+        return changed
+
+    def close(self) -> None:
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
+
+    def follow(self, filepath: str) -> None:
+        """Watch another file in the same directory instead"""
+        self.filepath = os.fsencode(filepath)
+        self.name = os.path.basename(self.filepath)
+        self._watch_file()
+
+    def _watch_file(self) -> None:
+        """Point the file watch at whatever the path currently names"""
+        if self._file_wd >= 0:
+            # Fails harmlessly if the kernel already dropped the watch
+            self._libc.inotify_rm_watch(self.fd, self._file_wd)
+            self._file_wd = -1
+        try:
+            self._file_wd = self._add_watch(self.filepath, FILE_EVENTS)
+        except FileNotFoundError:
+            # Between rotation steps; the directory watch reports the new file
+            pass
+
+    def _add_watch(self, path: bytes, mask: int) -> int:
+        wd = self._libc.inotify_add_watch(self.fd, path, mask)
+        if wd < 0:
+            raise _errno_error('inotify_add_watch', path)
+        return wd
+
+    def _read_events(self):
+        """Drain queued events as (watch descriptor, mask, name) tuples"""
+        while True:
+            try:
+                buffer = os.read(self.fd, 64 * 1024)
+            except BlockingIOError:
+                return
+            position = 0
+            while position < len(buffer):
+                wd, mask, _, length = EVENT_HEADER.unpack_from(buffer, position)
+                position += EVENT_HEADER.size
+                name = buffer[position:position + length].rstrip(b'\0')
+                position += length
+                yield wd, mask, name
+
+
+def change_waiter(filepath: str, use_inotify: bool = True,
+                  name_pattern: Optional[str] = None) -> PollingWaiter:
+    """
+    Return the best available way to wait for changes to a file
+
+    Args:
+        filepath: Path to the file
+        use_inotify: Set to False to always poll
+        name_pattern: Also wake when files matching this glob appear in
+            the file's directory
+
+    Returns:
+        An InotifyWaiter where possible, otherwise a PollingWaiter
+    """
+    if use_inotify and sys.platform.startswith('linux'):
+        try:
+            return InotifyWaiter(filepath, name_pattern)
+        except (OSError, AttributeError):
+            # No libc inotify, too many watches, or the directory is gone
+            pass
+    return PollingWaiter()
+
+
+_LIBC = None
+
+
+def _libc() -> ctypes.CDLL:
+    """Load libc once, with the inotify functions' signatures declared"""
+    global _LIBC
+    if _LIBC is None:
+        libc = ctypes.CDLL(ctypes.util.find_library('c') or 'libc.so.6', use_errno=True)
+        libc.inotify_init1.argtypes = [ctypes.c_int]
+        libc.inotify_add_watch.argtypes = [ctypes.c_int, ctypes.c_char_p, ctypes.c_uint32]
+        libc.inotify_rm_watch.argtypes = [ctypes.c_int, ctypes.c_int]
+        _LIBC = libc
+    return _LIBC
+
+
+def _errno_error(call: str, path: Optional[bytes] = None) -> OSError:
+    error = ctypes.get_errno()
+    if path is None:
+        return OSError(error, f"{call}: {os.strerror(error)}")
+    return OSError(error, f"{call}: {os.strerror(error)}", os.fsdecode(path))
@@ -0,0 +1,216 @@
+"""
+Incremental Node Health Metrics
+
+Keeps the figures behind the health status (average loss of the last
+epochs, total rewards, average rank percentile and diversity, policy
+updates per hour) as running sums and counts that are updated once per
+event, so reading them costs the same whether the node has been up for
+minutes or months. The dashboard (see ingest_service) and the CLI feed
+the same aggregator and share its thresholds.
+
+swarm-pulse-cli/monitor.py imports this module directly and does not
+install NumPy or pandas, so columns are accepted as any iterable.
+"""
+
+import math
+from collections import deque
+from typing import Any, Dict, Iterable, Optional
+
+
+# A node has an issue when its average loss is above, or its average rank
+# percentile or diversity below, these
+MAX_LOSS = 0.1
+MIN_RANK_PERCENTILE = 40
+MIN_DIVERSITY = 0.5
+
+
+class WindowMean:
+    """Mean of the last size values, updated in O(1) per value"""
+
+    def __init__(self, size: int):
+        self.values: deque = deque(maxlen=size)
+        self._sum = 0.0
+        self._evicted = 0
+
+    def __len__(self) -> int:
+        return len(self.values)
+
+    def add(self, value: float) -> None:
+        if len(self.values) == self.values.maxlen:
+            self._sum -= self.values[0]
+            self._evicted += 1
+        self.values.append(value)
+        self._sum += value
+        # Re-add from scratch now and then, so rounding errors do not pile up
+        if self._evicted >= self.values.maxlen:
+            self._sum = math.fsum(self.values)
+            self._evicted = 0
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self._sum / len(self.values) if self.values else None
+
+
+class HealthAggregator:
+    """Running health metrics of one node, fed event by event"""
+
+    def __init__(self, loss_window: int = 10):
+        """
+        Initialize empty aggregator
+
+        Args:
+            loss_window: Number of latest policy updates avg_loss covers
+        """
+        self.loss = WindowMean(loss_window)
+        self.update_count = 0
+        self.first_update: Optional[int] = None
+        self.last_update: Optional[int] = None
+        self.last_epoch: Optional[int] = None
+        self.reward_count = 0
+        self.reward_total = 0.0
+        self.rank_count = 0
+        self.rank_percentile_total = 0.0
+        self.diversity_count = 0
+        self.diversity_total = 0.0
+        self.difficulty: Optional[int] = None
+
+    def add_policy_update(self, timestamp: int, epoch: int, loss: float) -> None:
+        """
+        Add one policy update
+
+        Args:
+            timestamp: Epoch seconds of the log line
+            epoch: Training epoch
+            loss: Loss reported for it
+        """
+        self.loss.add(loss)
+        self.update_count += 1
+        if self.first_update is None:
+            self.first_update = timestamp
+        self.last_update = timestamp
+        self.last_epoch = epoch
+
+    def add_reward(self, amount: float, rank: Optional[int] = None,
+                   total_solvers: Optional[int] = None) -> None:
+        """
+        Add one reward
+
+        Args:
+            amount: Reward amount
+            rank: Rank among solvers (1 is best), if known
+            total_solvers: Number of solvers ranked, if known
+        """
+        self.reward_count += 1
+        self.reward_total += amount
+        if rank is not None and total_solvers:
+            self.rank_count += 1
+            self.rank_percentile_total += (1 - (rank - 1) / total_solvers) * 100
+
+    def add_rollout(self, diversity_score: Optional[float]) -> None:
+        """Add one rollout (rollouts without a score are not counted)"""
+        if diversity_score is None or math.isnan(diversity_score):
+            return
+        self.diversity_count += 1
+        self.diversity_total += diversity_score
+
+    def add_difficulty_change(self, to_level: int) -> None:
+        self.difficulty = to_level
+
+    def add_policy_updates(self, timestamps: Iterable[int], epochs: Iterable[int],
+                           losses: Iterable[float]) -> None:
+        """Add policy updates given as columns"""
+        for timestamp, epoch, loss in zip(timestamps, epochs, losses):
+            self.add_policy_update(int(timestamp), int(epoch), float(loss))
+
+    def add_rewards(self, amounts: Iterable[float], ranks: Iterable[int],
+                    total_solvers: Iterable[int]) -> None:
+        """Add rewards given as columns"""
+        for amount, rank, solvers in zip(amounts, ranks, total_solvers):
+            self.add_reward(float(amount), int(rank), int(solvers))
+
+    def add_rollouts(self, diversity_scores: Iterable[float]) -> None:
+        """Add rollouts given as a column of diversity scores"""
+        for score in diversity_scores:
+            self.add_rollout(float(score))
+
+    def add_history(self, column: str, count: int, total: float,
+                    first_timestamp: Optional[int] = None) -> None:
+        """
+        Add events only known as aggregates (see LogParser.get_history)
+
+        They count towards totals, averages and updates per hour, but not
+        towards the loss window, which aggregates cannot provide. Add them
+        before any individual event.
+
+        Args:
+            column: Aggregated column, e.g. 'rewards.amount'
+            count: Number of events
+            total: Sum of the column's values
+            first_timestamp: Epoch seconds of the first of them
+        """
+        if column == 'policy_updates.loss':
+            self.update_count += int(count)
+            if first_timestamp is not None:
+                if self.first_update is None or first_timestamp < self.first_update:
+                    self.first_update = int(first_timestamp)
+        elif column == 'rewards.amount':
+            self.reward_count += int(count)
+            self.reward_total += float(total)
+        elif column == 'rewards.rank_percentile':
+            self.rank_count += int(count)
+            self.rank_percentile_total += float(total)
+        elif column == 'rollouts.diversity_score':
+            self.diversity_count += int(count)
+            self.diversity_total += float(total)
+
+    @property
+    def avg_loss(self) -> Optional[float]:
+        return self.loss.mean
+
+    @property
+    def avg_rank_percentile(self) -> Optional[float]:
+        return self.rank_percentile_total / self.rank_count if self.rank_count else None
+
+    @property
+    def avg_diversity(self) -> Optional[float]:
+        return self.diversity_total / self.diversity_count if self.diversity_count else None
+
+    @property
+    def updates_per_hour(self) -> float:
+        if self.update_count < 2 or self.last_update is None:
+            return 0.0
+        hours = (self.last_update - self.first_update) / 3600
+        return self.update_count / hours if hours > 0 else 0.0
+
+    def health_status(self) -> str:
+        """'healthy', 'warning' or 'critical' by number of issues, or 'unknown' without data"""
+        avg_loss = self.avg_loss
+        avg_rank_percentile = self.avg_rank_percentile
+        avg_diversity = self.avg_diversity
+        if avg_loss is None and avg_rank_percentile is None and avg_diversity is None:
+            return 'unknown'
+
+        issues = 0
+        if avg_loss is not None and avg_loss > MAX_LOSS:
+            issues += 1
+        if avg_rank_percentile is not None and avg_rank_percentile < MIN_RANK_PERCENTILE:
+            issues += 1
+        if avg_diversity is not None and avg_diversity < MIN_DIVERSITY:
+            issues += 1
+
+        if issues == 0:
+            return 'healthy'
+        elif issues == 1:
+            return 'warning'
+        return 'critical'
+
+    def metrics(self) -> Dict[str, Any]:
+        """Return the metrics in the form of visualizations.calculate_health_metrics"""
+        return {
+            'avg_loss': self.avg_loss,
+            'total_rewards': self.reward_total,
+            'avg_rank_percentile': self.avg_rank_percentile,
+            'avg_diversity': self.avg_diversity,
+            'updates_per_hour': self.updates_per_hour,
+            'health_status': self.health_status()
+        }
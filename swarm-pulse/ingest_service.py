@@ -0,0 +1,252 @@
+"""
+Shared Background Ingestion
+
+Parses a log source once per process instead of once per dashboard
+session. An IngestService owns the LogParser for one source and keeps it
+up to date from a background thread, which wakes when the file changes
+(inotify where available, see file_events) but refreshes at most once per
+interval. Each state with new events is published as an immutable
+Snapshot: the event frames are zero-copy views of rows that are never
+written again (see event_store), so sessions can read a snapshot while
+the next one is being parsed. Snapshot versions only grow, which lets a
+session tell whether anything changed since it last looked.
+
+Health metrics are kept by a HealthAggregator, and rolling percentiles by
+StreamingStats, which are only fed the events appended since the previous
+snapshot, so publishing costs the same however long the log is.
+"""
+
+import logging
+import threading
+import time
+from dataclasses import dataclass, field, replace
+from datetime import datetime
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, Optional, Tuple
+
+import pandas as pd
+
+from event_store import EventStore
+from file_events import PollingWaiter, change_waiter
+from health import HealthAggregator
+from log_parser import LogParser
+from log_sources import has_rotated_members, is_glob
+from parse_cache import ParseCache
+from streaming_stats import StreamingStats, retained_windows
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass(frozen=True)
+class Snapshot:
+    # Increases by one for every published state
+    version: int
+    frames: Mapping[str, pd.DataFrame]
+    history: Mapping[str, pd.DataFrame]
+    time_bounds: Optional[Tuple[datetime, datetime]]
+    updated_at: datetime
+    # Version of each event table the frames were taken at
+    table_versions: Mapping[str, int] = field(default_factory=dict)
+    # Health metrics of all events so far (see health.HealthAggregator)
+    metrics: Mapping[str, Any] = field(default_factory=dict)
+    # EWMA and windowed percentiles per metric (see StreamingStats.summary)
+    stats: Mapping[str, Any] = field(default_factory=dict)
+    # Why the last refresh failed; the rest is then from the one before
+    error: Optional[str] = None
+
+
+class IngestService:
+    """One parser for one log source, shared by every reader"""
+
+    def __init__(self, log_path: str, cache: Optional[ParseCache] = None,
+                 retention_hours: float = 0, interval: float = 1.0,
+                 use_inotify: bool = True, workers: int = 1):
+        """
+        Initialize ingestion (nothing is read until load() or start())
+
+        Args:
+            log_path: Log file, glob, or live log with rotated siblings
+            cache: Optional on-disk cache of parsed events
+            retention_hours: As for LogParser
+            interval: Least number of seconds between refreshes
+            use_inotify: Wake on file change notifications where available
+            workers: Processes for the initial parse of a large file
+        """
+        self.log_path = str(log_path)
+        self.interval = interval
+        self.use_inotify = use_inotify
+        self.workers = workers
+        self.parser = LogParser(cache=cache, retention_hours=retention_hours)
+        # Last refresh error, cleared by the next successful one
+        self.error: Optional[str] = None
+        self._lock = threading.Lock()
+        self._snapshot: Optional[Snapshot] = None
+        self._published: Tuple[Optional[EventStore], Tuple[int, ...]] = (None, ())
+        # Store the health aggregator and stats were fed from, and the number
+        # of rows of each table they have seen (counting rows dropped since)
+        self._health = HealthAggregator()
+        # Older events are compacted before the stats see them
+        self._stats_windows = retained_windows(retention_hours)
+        self._stats = StreamingStats(self._stats_windows)
+        self._health_store: Optional[EventStore] = None
+        self._health_rows: Dict[str, int] = {}
+        self._loaded = False
+        self._stopping = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def retention_hours(self) -> float:
+        return self.parser.retention_hours
+
+    def snapshot(self) -> Snapshot:
+        """Return the latest published state (loading the log first if needed)"""
+        if self._snapshot is None:
+            self.load()
+        return self._snapshot
+
+    def load(self) -> Snapshot:
+        """Parse the whole source once, if not done yet, and publish it"""
+        with self._lock:
+            if not self._loaded:
+                # A glob or rotated siblings are read as one log
+                if has_rotated_members(self.log_path):
+                    self.parser.parse_sources(self.log_path, self.workers)
+                else:
+                    self.parser.parse_file(self.log_path, self.workers)
+                self._loaded = True
+                self._publish()
+        return self._snapshot
+
+    def refresh(self) -> Snapshot:
+        """Parse what was appended since the last refresh, publishing it if new"""
+        if not self._loaded:
+            return self.load()
+        with self._lock:
+            try:
+                self.parser.update_file(self.log_path)
+                self._publish()
+            except Exception as e:
+                # E.g. between rotation steps, or a line the parser trips
+                # over; update_file adds nothing then, and the next refresh
+                # tries again
+                self._set_error(e)
+            else:
+                self._set_error(None)
+        return self._snapshot
+
+    def parse_range(self, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> EventStore:
+        """Parse the events logged in [start, end) (see LogParser.parse_range)"""
+        with self._lock:
+            return self.parser.parse_range(self.log_path, start, end)
+
+    def start(self) -> None:
+        """Load the log, then keep it up to date in a background thread"""
+        self.load()
+        if self._thread is not None and self._thread.is_alive():
+            return
+        self._stopping.clear()
+        self._thread = threading.Thread(target=self._run, daemon=True)
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop the background thread"""
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def _run(self) -> None:
+        # The parser follows the live member of a glob on its own, so only a
+        # plain path can be watched directly
+        if is_glob(self.log_path):
+            waiter = PollingWaiter()
+        else:
+            waiter = change_waiter(self.log_path, self.use_inotify)
+        with waiter:
+            while not self._stopping.is_set():
+                started = time.monotonic()
+                self.refresh()
+                # At most one refresh per interval, then sleep until the file
+                # changes (polling has slept enough already)
+                if self._stopping.wait(max(0.0, started + self.interval - time.monotonic())):
+                    break
+                if waiter.fd >= 0:
+                    waiter.wait(self.interval)
+
+    def _set_error(self, error: Optional[Exception]) -> None:
+        """Record the outcome of a refresh on the service and its snapshot"""
+        message = None if error is None else f"{type(error).__name__}: {error}"
+        if message is not None and message != self.error:
+            # Once per distinct error rather than on every retry
+            logger.error("Refreshing %s failed: %s", self.log_path, message, exc_info=error)
+        self.error = message
+        if self._snapshot is not None and self._snapshot.error != message:
+            self._snapshot = replace(self._snapshot, error=message)
+
+    def _publish(self) -> None:
+        """Publish the parser's state as a new snapshot if it has changed"""
+        store = self.parser.data
+        versions = tuple(table.version for table in store.tables.values())
+        if self._published == (store, versions):
+            return
+        self._update_health(store)
+        previous = self._snapshot.version if self._snapshot is not None else 0
+        self._snapshot = Snapshot(
+            version=previous + 1,
+            frames=MappingProxyType(self.parser.get_frames()),
+            history=MappingProxyType(self.parser.get_history()),
+            time_bounds=self.parser.time_bounds(),
+            updated_at=datetime.now(),
+            table_versions=MappingProxyType(
+                {name: table.version for name, table in store.tables.items()}
+            ),
+            metrics=MappingProxyType(self._health.metrics()),
+            stats=MappingProxyType(self._stats.summary())
+        )
+        self._published = (store, versions)
+
+    def _update_health(self, store: EventStore) -> None:
+        """Feed the rows appended since the last snapshot to the health metrics and stats"""
+        # Start over for a new store (e.g. after a rotation), or if rows were
+        # compacted into history before they were seen (the stats' windows
+        # only cover rows that are still individual events then)
+        if store is not self._health_store or any(
+            self._health_rows[name] < table.dropped for name, table in store.tables.items()
+        ):
+            self._health = HealthAggregator()
+            self._stats = StreamingStats(self._stats_windows)
+            self._health_store = store
+            self._health_rows = {name: table.dropped for name, table in store.tables.items()}
+            for column, series in store.history.items():
+                buckets = series.buckets()
+                if buckets:
+                    total = series.total()
+                    self._health.add_history(column, total.count, total.sum, buckets[0][1])
+
+        new = {}
+        for name, table in store.tables.items():
+            start = self._health_rows[name] - table.dropped
+            new[name] = {column: table.column(column)[start:] for column, _ in table.schema}
+            self._health_rows[name] = table.dropped + len(table)
+
+        self._health.add_policy_updates(new['policy_updates']['timestamp'],
+                                        new['policy_updates']['epoch'],
+                                        new['policy_updates']['loss'])
+        self._health.add_rewards(new['rewards']['amount'], new['rewards']['rank'],
+                                 new['rewards']['total_solvers'])
+        self._health.add_rollouts(new['rollouts']['diversity_score'])
+        if len(new['difficulty_changes']['to_level']):
+            self._health.add_difficulty_change(int(new['difficulty_changes']['to_level'][-1]))
+
+        updates, rewards, rollouts = new['policy_updates'], new['rewards'], new['rollouts']
+        self._stats.add_policy_updates(updates['timestamp'], updates['loss'])
+        self._stats.add_rewards(rewards['timestamp'], rewards['amount'], rewards['rank'],
+                                rewards['total_solvers'])
+        self._stats.add_rollouts(rollouts['timestamp'], rollouts['diversity_score'],
+                                 rollouts['steps'])
@@ -8,10 +8,27 @@ Extracts structured data from CodeZero log files including:
 - Rollout generation (diversity scores)
 """
 
+import os
 import re
 from datetime import datetime
-from typing import Dict, List, Any
-from dataclasses import dataclass, asdict
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple, Union
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from event_store import EventStore, MISSING_INT, to_epoch_seconds, from_epoch_seconds
+from log_reader import LineBuffer, file_blocks, line_start_after, read_blocks, read_tail
+from log_sources import (is_compressed, is_glob, open_source, overlapping_members,
+                         source_members, source_paths)
+from parse_cache import ParseCache
+from time_index import TimeIndex
+
+
+# Gradient norms in logs are never negative, so this marks a policy update
+# whose gradient is still unknown when parsing a chunk of a file
+CARRY_GRADIENT = -1.0
 
 
 @dataclass
@@ -47,10 +64,13 @@ class Rollout:
     diversity_score: float = None
 
 
+Event = Union[PolicyUpdate, Reward, DifficultyChange, Rollout]
+
+
 class LogParser:
     """Parse CodeZero node logs and extract structured data"""
     
-    # Regex patterns for log parsing
+    # Regex patterns for log parsing (legacy engine, one search per pattern)
     PATTERNS = {
         'policy_update': re.compile(
             r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\].*Policy update.*epoch=(\d+).*loss=([\d.]+)'
@@ -78,32 +98,697 @@ class LogParser:
         ),
     }
     
-    def __init__(self):
-        self.data = {
-            'policy_updates': [],
-            'rewards': [],
-            'difficulty_changes': [],
-            'rollouts': []
-        }
+    # Keyword-dispatched patterns (default engine). Each event type has a
+    # single pattern with its optional fields folded in, and is only tried
+    # when its keyword occurs in the line. Order matches the legacy chain.
+    EVENT_PATTERNS = (
+        ('Policy update', 'policy_update', re.compile(
+            r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\].*Policy update.*epoch=(\d+).*loss=([\d.]+)'
+        )),
+        ('Gradient applied', 'gradient', re.compile(
+            r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\].*Gradient applied.*avg_norm=([\d.]+)'
+        )),
+        ('Reward received', 'reward', re.compile(
+            r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\].*Reward received.*amount=([\d.]+)'
+            r'(?:.*problem_id=(0x[a-f0-9]+))?.*rank=(\d+)/(\d+)'
+        )),
+        ('Difficulty adjusted', 'difficulty', re.compile(
+            r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\].*Difficulty adjusted: (\d+) → (\d+)'
+            r'(?:.*swarm_success_rate=([\d.]+))?'
+        )),
+        ('Rollout generated', 'rollout', re.compile(
+            r'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\].*Rollout generated.*problem_id=(0x[a-f0-9]+)'
+            r'(?:.*steps=(\d+))?.*diversity_score=([\d.]+)'
+        )),
+    )
+    
+    # The same patterns applied line by line to a newline-joined batch:
+    # ^.*? retries each start position left to right, like search()
+    LINE_PATTERNS = {
+        kind: re.compile(r'(?m)^(?:.*?' + pattern.pattern + r')?.*$')
+        for _, kind, pattern in EVENT_PATTERNS
+    }
+    
+    # EVENT_PATTERNS for undecoded lines
+    RAW_EVENT_PATTERNS = tuple(
+        (keyword.encode(), kind, re.compile(pattern.pattern.encode('utf-8')))
+        for keyword, kind, pattern in EVENT_PATTERNS
+    )
+    
+    # Lines without one of these cannot hold an event
+    RAW_KEYWORDS = tuple(keyword for keyword, _, _ in RAW_EVENT_PATTERNS)
+    
+    ENGINES = ('keyword', 'regex', 'vectorized')
+    
+    # EventStore table (and event type name for iter_events) per pattern kind
+    EVENT_TABLES = {
+        'policy_update': 'policy_updates',
+        'reward': 'rewards',
+        'difficulty': 'difficulty_changes',
+        'rollout': 'rollouts',
+    }
+    
+    # Bytes at the start of a file used to recognise it on resume
+    HEAD_BYTES = 256
+    
+    # Smallest byte range worth handing to a worker process
+    PARALLEL_MIN_CHUNK = 4 * 1024 * 1024
+    
+    # Bytes of log text handled per batch by the vectorized engine
+    VECTOR_BLOCK_BYTES = 32 * 1024 * 1024
+    
+    # Most bytes read from a file at a time by the other engines
+    READ_BLOCK_BYTES = 1024 * 1024
+    
+    # Newly parsed bytes after which update_file refreshes the cache entry
+    CACHE_SAVE_BYTES = 8 * 1024 * 1024
+    
+    def __init__(self, engine: str = 'keyword', cache: Optional[ParseCache] = None,
+                 retention_hours: float = 0):
+        """
+        Initialize parser
+        
+        Args:
+            engine: 'keyword' (single pass, default), 'regex' (legacy
+                pattern chain, kept for comparison) or 'vectorized' (pandas
+                batch parsing for whole files; single lines use 'keyword')
+            cache: Optional on-disk cache; parse_file then starts from the
+                cached events and only parses the rest of the file
+            retention_hours: Keep events at full resolution for this many
+                hours before the newest one; older events are folded into
+                per-minute/hour/day aggregates in data.history (0 keeps all)
+        """
+        if engine not in self.ENGINES:
+            raise ValueError(f"Unknown parse engine: {engine}")
+        self.engine = engine
+        self.cache = cache
+        self.retention_hours = retention_hours
+        self._cached_offset = None
+        self.data = EventStore()
         self._last_gradient_norm = None
+        self._last_ts_text = None
+        self._last_ts = None
+        
+        # Incremental read state (see update_file)
+        self._source = None
+        self._file_id = None
+        self._offset = 0
+        self._head = b''
+        
+        # Timestamp -> byte offset samples of the current file (see parse_range)
+        self.index = TimeIndex(self.RAW_KEYWORDS)
+        
+        # Glob or rotation family being followed (see parse_sources)
+        self._sources = None
+        self._sources_start = None
+        self._source_paths = frozenset()
+    
+    def parse_file(self, filepath: str, workers: int = 1) -> EventStore:
+        """
+        Parse entire log file and return structured data
+        
+        A trailing line without a newline (one still being written) is left
+        for update_file, which resumes from the end of the last whole line.
+        
+        Args:
+            filepath: Path to log file
+            workers: Number of processes; above 1, large files are split into
+                newline-aligned chunks that are parsed in parallel
+        
+        Returns:
+            Structured data
+        """
+        self._sources = None
+        try:
+            return self._parse_file(filepath, workers)
+        except Exception:
+            # Start over next time rather than resume a partial parse
+            self._source = None
+            raise
     
-    def parse_file(self, filepath: str) -> Dict[str, List[Any]]:
-        """Parse entire log file and return structured data"""
-        self.data = {
-            'policy_updates': [],
-            'rewards': [],
-            'difficulty_changes': [],
-            'rollouts': []
-        }
+    def _parse_file(self, filepath: str, workers: int = 1,
+                    gradient_norm: Optional[float] = None,
+                    complete_only: bool = True) -> EventStore:
+        """
+        parse_file, starting from a given pending gradient norm
+        
+        Args:
+            complete_only: Stop after the last whole line; False for files
+                that are no longer written to (e.g. rotated members)
+        """
+        self.index = TimeIndex(self.RAW_KEYWORDS)
+        if self.cache is not None and self._restore_cached(filepath):
+            self._parse_blocks(filepath, self._offset, complete_only=complete_only)
+            self._apply_retention()
+            self._save_cached()
+            return self.data
+        
+        self.data = EventStore()
+        self._last_gradient_norm = gradient_norm
+        self._offset = 0
         
-        with open(filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            for line in f:
-                self.parse_line(line.strip())
+        self._remember_file(filepath)
+        ranges = self._chunk_ranges(filepath, workers, complete_only) if workers > 1 else []
+        if len(ranges) > 1:
+            self._parse_parallel(filepath, ranges, workers)
+        else:
+            self._parse_blocks(filepath, complete_only=complete_only)
         
+        self._apply_retention()
+        if self.cache is not None:
+            self._cached_offset = None
+            self._save_cached()
         return self.data
     
+    def parse_sources(self, pattern: str, workers: int = 1) -> EventStore:
+        """
+        Parse a rotated or globbed set of log files as one continuous log
+        
+        Members are read oldest first (see log_sources.expand_sources) and
+        compressed ones are decompressed as streams. Each member is parsed
+        on its own and, with a cache, cached under its own identity, so
+        archives are only ever parsed once and a rotated file (same inode,
+        new name) is not parsed again either. The newest uncompressed
+        member is what update_file(pattern) follows afterwards, until a
+        new file matching a glob appears (e.g. a fresh log after a node
+        restart).
+        
+        Args:
+            pattern: A glob, or the path of the live log with rotated
+                siblings such as node.log.1 and node.log.2.gz
+            workers: Processes for large uncompressed members
+        
+        Returns:
+            Structured data
+        """
+        self.data = EventStore()
+        self._last_gradient_norm = None
+        self._sources = str(pattern)
+        self._source = None
+        self._file_id = None
+        self._offset = 0
+        self.index = TimeIndex(self.RAW_KEYWORDS)
+        
+        members = source_members(pattern)
+        self._source_paths = frozenset(path for path, _ in members)
+        self._sources_start = next((first for _, first in members if first is not None), None)
+        member_cache = self.cache.child('members') if self.cache is not None else None
+        member = None
+        for number, (path, _) in enumerate(members, 1):
+            member = LogParser(self.engine, member_cache)
+            # Only the newest member can still be written to
+            member._parse_member(path, workers, complete_only=number == len(members))
+            self._merge_chunk(member.data, member._last_gradient_norm)
+        
+        if member is not None and not is_compressed(member._source):
+            self._source = member._source
+            self._file_id = member._file_id
+            self._head = member._head
+            self._offset = member._offset
+            self.index = member.index
+        
+        self._apply_retention()
+        return self.data
+    
+    def _parse_member(self, path: str, workers: int = 1, complete_only: bool = False) -> None:
+        """
+        Parse one member of a log source on its own
+        
+        Like a chunk of a parallel parse, policy updates still waiting for
+        a gradient from an earlier member get CARRY_GRADIENT.
+        """
+        if not is_compressed(path):
+            self._parse_file(path, workers, CARRY_GRADIENT, complete_only)
+            return
+        
+        if self.cache is not None and self._restore_cached(path):
+            return
+        self._parse_stream(path)
+        
+        # Archives never change, so the compressed size marks them as done
+        stat = os.stat(path)
+        self._source = str(path)
+        self._file_id = (stat.st_dev, stat.st_ino)
+        self._offset = stat.st_size
+        if self.cache is not None:
+            self._save_cached()
+    
+    def _parse_stream(self, path: str) -> None:
+        """Parse a whole compressed file block by block, as a later part of a log"""
+        self._last_gradient_norm = CARRY_GRADIENT
+        with open_source(path) as stream:
+            for block in read_blocks(stream):
+                self._parse_buffer(LineBuffer(block))
+    
+    def _apply_retention(self) -> None:
+        """Compact events older than the retention window (in log time)"""
+        if not self.retention_hours:
+            return
+        latest = self._latest_timestamp()
+        if latest is not None:
+            self.data.compact(latest - int(self.retention_hours * 3600))
+    
+    def _latest_timestamp(self) -> Optional[int]:
+        """Epoch seconds of the newest parsed event"""
+        latest = [
+            int(table.column('timestamp')[-1]) for table in self.data.tables.values() if len(table)
+        ]
+        return max(latest) if latest else None
+    
+    def _restore_cached(self, filepath: str) -> bool:
+        """Load the cached parse of filepath into this parser, if still valid"""
+        cached = self.cache.load(filepath)
+        if cached is None:
+            return False
+        self.data = cached.store
+        self._offset = cached.offset
+        self._last_gradient_norm = cached.pending_gradient
+        self._source = str(filepath)
+        self._file_id = cached.file_id
+        self._head = cached.head[:self.HEAD_BYTES]
+        self._cached_offset = cached.offset
+        return True
+    
+    def _save_cached(self) -> None:
+        """Write the current parse to the cache unless it is already there"""
+        # A multi-file parse is cached per member instead
+        if self._offset == self._cached_offset or self._sources is not None:
+            return
+        try:
+            self.cache.save(self._source, self.data, self._offset, self._last_gradient_norm)
+        except OSError:
+            # A read-only or full disk only costs a re-parse next time
+            return
+        self._cached_offset = self._offset
+    
+    def _chunk_ranges(self, filepath: str, workers: int,
+                      complete_only: bool = False) -> List[Tuple[int, int]]:
+        """Split a file into newline-aligned (start, end) byte ranges"""
+        size = os.stat(filepath).st_size
+        if complete_only:
+            # Leave a trailing partial line for update_file
+            block, spans = read_tail(filepath, 1, complete_only=True)
+            size = block.base + spans[-1][1] + 1 if spans else 0
+        count = min(workers, size // self.PARALLEL_MIN_CHUNK)
+        ranges = []
+        start = 0
+        with open(filepath, 'rb') as f:
+            for i in range(1, count):
+                end = min(line_start_after(f, size * i // count), size)
+                if end > start:
+                    ranges.append((start, end))
+                    start = end
+        if start < size:
+            ranges.append((start, size))
+        return ranges
+    
+    def _parse_parallel(self, filepath: str, ranges: List[Tuple[int, int]], workers: int) -> None:
+        """Parse byte ranges in a process pool and merge the results in order"""
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = pool.map(
+                _parse_chunk,
+                [filepath] * len(ranges),
+                [start for start, _ in ranges],
+                [end for _, end in ranges],
+                [self.engine] * len(ranges)
+            )
+            for chunk, pending, index in results:
+                self._merge_chunk(chunk, pending)
+                self.index.merge(index)
+        self._offset = ranges[-1][1]
+    
+    def _merge_chunk(self, chunk: EventStore, pending: Optional[float]) -> None:
+        """Append events parsed from a later part of the log (see _parse_chunk)"""
+        # A chunk's first policy update may pair with a gradient that was
+        # logged at the end of an earlier chunk
+        gradient_norms = chunk['policy_updates'].column('gradient_norm')
+        unpaired = np.flatnonzero(gradient_norms == CARRY_GRADIENT)
+        if len(unpaired):
+            chunk['policy_updates'].set(unpaired[0], 'gradient_norm', self._last_gradient_norm)
+        if pending != CARRY_GRADIENT:
+            self._last_gradient_norm = pending
+        self.data.extend(chunk)
+    
+    def update_file(self, filepath: str) -> EventStore:
+        """
+        Parse only the lines appended to filepath since the last call
+        
+        Falls back to a full parse when the file is new to this parser, or
+        was truncated or replaced since it was last read. A trailing line
+        without a newline is left for the next call. If reading the new
+        lines fails, none of them are added, so the call can be retried.
+        
+        Args:
+            filepath: Path to log file, or the pattern given to parse_sources
+        
+        Returns:
+            Structured data including the new events
+        """
+        if self._sources is not None and str(filepath) == self._sources:
+            # Follow the live member; after a rotation, or when a new file
+            # matches the glob, re-resolve the family (already parsed
+            # members come from the cache)
+            if (self._source is None or not self._can_resume(self._source)
+                    or (is_glob(self._sources)
+                        and not self._source_paths.issuperset(source_paths(self._sources)))):
+                self.parse_sources(self._sources)
+                return self.data
+            filepath = self._source
+        elif not self._can_resume(filepath):
+            self.parse_file(filepath)
+            return self.data
+        
+        # Parsed on their own like a chunk of a parallel parse, and merged
+        # only once all of them are read
+        part = LogParser(self.engine)
+        part._last_gradient_norm = CARRY_GRADIENT
+        part._offset = self._offset
+        part.index.next_sample = self.index.next_sample
+        part._parse_blocks(filepath, self._offset, complete_only=True)
+        self._merge_chunk(part.data, part._last_gradient_norm)
+        self.index.merge(part.index)
+        self._offset = part._offset
+        
+        self._apply_retention()
+        if self.cache is not None and self._offset - (self._cached_offset or 0) >= self.CACHE_SAVE_BYTES:
+            self._save_cached()
+        return self.data
+    
+    def parse_range(self, filepath: str, start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> EventStore:
+        """
+        Parse only the events logged in [start, end)
+        
+        The byte range is located with the timestamp index built while
+        parsing filepath (or, for another file, by binary search over it),
+        so a window of a large log is read without scanning the rest.
+        For a glob or the pattern given to parse_sources, only members
+        whose time span overlaps the window are read; compressed ones are
+        read whole. self.data is left untouched.
+        
+        Args:
+            filepath: Path to log file, or a multi-file source pattern
+            start: Window start (default: beginning of the log)
+            end: Window end, exclusive (default: end of the log)
+        
+        Returns:
+            A new store holding the window's events
+        """
+        start_seconds = to_epoch_seconds(start) if start is not None else None
+        end_seconds = to_epoch_seconds(end) if end is not None else None
+        if is_glob(filepath) or str(filepath) == self._sources:
+            paths = overlapping_members(filepath, start_seconds, end_seconds)
+        else:
+            paths = [str(filepath)]
+        
+        window = LogParser(self.engine)
+        for path in paths:
+            part = LogParser(self.engine)
+            index = self.index if self._can_resume(path) else TimeIndex(self.RAW_KEYWORDS)
+            part._parse_window(path, index, start_seconds, end_seconds)
+            window._merge_chunk(part.data, part._last_gradient_norm)
+        
+        # The byte range is padded to whole lines and index strides
+        return window.data.between(start_seconds, end_seconds)
+    
+    def _parse_window(self, path: str, index: TimeIndex, start_seconds: Optional[int],
+                      end_seconds: Optional[int]) -> None:
+        """Parse the part of one file that can hold events in [start, end)"""
+        if is_compressed(path):
+            self._parse_stream(path)
+            return
+        
+        self._last_gradient_norm = CARRY_GRADIENT
+        low = index.seek(path, start_seconds)[0] if start_seconds is not None else 0
+        high = index.seek(path, end_seconds)[1] if end_seconds is not None else None
+        if high is None or high > low:
+            self._parse_blocks(path, low, high)
+    
+    def time_bounds(self) -> Optional[Tuple[datetime, datetime]]:
+        """Timestamps of the first line and the newest event of the current file or source"""
+        latest = self._latest_timestamp()
+        if self._sources is not None:
+            first = self._sources_start
+        else:
+            first = self.index.timestamps[0] if len(self.index) else None
+        if latest is None or first is None:
+            return None
+        return from_epoch_seconds(first), from_epoch_seconds(latest)
+    
+    def _can_resume(self, filepath: str) -> bool:
+        """Check that filepath is the same, unshrunk file read last time"""
+        if self._source != str(filepath):
+            return False
+        try:
+            stat = os.stat(filepath)
+        except OSError:
+            return False
+        if (stat.st_dev, stat.st_ino) != self._file_id or stat.st_size < self._offset:
+            return False
+        # Catch copytruncate followed by regrowth past our offset
+        with open(filepath, 'rb') as f:
+            return f.read(len(self._head)) == self._head
+    
+    def _remember_file(self, filepath: str) -> None:
+        """Record identity of the file for later resumption"""
+        with open(filepath, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            self._head = f.read(self.HEAD_BYTES)
+        self._source = str(filepath)
+        self._file_id = (stat.st_dev, stat.st_ino)
+    
+    def _parse_blocks(self, filepath: str, start: int = 0, end: Optional[int] = None,
+                      complete_only: bool = False) -> None:
+        """
+        Parse a byte range of a file block by block, advancing self._offset
+        
+        The file is read rather than mapped, since a copytruncate rotation
+        of the live log would make reading a map crash the process.
+        """
+        size = self.VECTOR_BLOCK_BYTES if self.engine == 'vectorized' else self.READ_BLOCK_BYTES
+        for block in file_blocks(filepath, start, end, size, complete_only):
+            self._parse_buffer(block)
+            self.index.extend(block, self._offset)
+    
+    def _parse_buffer(self, log: LineBuffer, start: int = 0, end: int = None) -> None:
+        """Parse a byte range of a block of lines, advancing self._offset"""
+        if self.engine == 'vectorized':
+            self._parse_vectorized(log, start, end)
+        elif self.engine == 'regex':
+            for line in log.iter_text(start, end):
+                self.parse_line_regex(line)
+            self._offset = log.base + log.position
+        else:
+            # Lines without an event keyword are mostly never decoded
+            for line in log.iter_text(start, end, self.RAW_KEYWORDS):
+                self.parse_line(line)
+            self._offset = log.base + log.position
+    
+    def _parse_vectorized(self, log: LineBuffer, start: int = 0, end: int = None) -> None:
+        """Parse a byte range of a block of lines in batches"""
+        end = len(log) if end is None else end
+        position = start
+        while position < end:
+            block_end = min(position + self.VECTOR_BLOCK_BYTES, end)
+            if block_end < end:
+                # Cut after the last whole line, unless the block has none
+                block_end = log.buffer.rfind(b'\n', position, block_end) + 1 or block_end
+            self.parse_block_vectorized(log.buffer[position:block_end])
+            position = block_end
+        self._offset = log.base + end
+    
+    def parse_block_vectorized(self, block: bytes) -> None:
+        """
+        Parse a block of raw log lines at once
+        
+        Line boundaries are found with NumPy and each event keyword is
+        located with one scan of the whole block, so lines without events
+        are never decoded. Fields are pulled out of all candidate lines with
+        one regex pass per event type, then converted column-wise with
+        NumPy/pandas (one bulk datetime conversion instead of one per line).
+        Produces the same events as calling parse_line on each line.
+        
+        Args:
+            block: Whole log lines in file order
+        """
+        newlines = np.flatnonzero(np.frombuffer(block, dtype=np.uint8) == 0x0A)
+        starts = np.concatenate([[0], newlines + 1])
+        ends = np.concatenate([newlines, [len(block)]])
+        claimed = np.zeros(len(starts), dtype=bool)
+        matches = {}
+        for keyword, kind, pattern in self.EVENT_PATTERNS:
+            hits = _find_all(block, keyword.encode())
+            # Line number of each hit = newlines before it
+            line_ids = np.unique(np.searchsorted(newlines, hits))
+            line_ids = line_ids[~claimed[line_ids]]
+            candidates = '\n'.join([
+                block[starts[i]:ends[i]].decode('utf-8', errors='ignore').strip()
+                for i in line_ids
+            ])
+            # One row per candidate line; all groups are '' where the line
+            # (or an optional field) does not match
+            rows = self.LINE_PATTERNS[kind].findall(candidates) if len(line_ids) else []
+            fields = np.array(rows[:len(line_ids)], dtype=str).reshape(len(line_ids), pattern.groups)
+            matched = fields[:, 0] != ''
+            claimed[line_ids[matched]] = True
+            matches[kind] = (line_ids[matched], fields[matched])
+        
+        lines, policy = matches['policy_update']
+        gradient_lines, gradient = matches['gradient']
+        gradient_norms = self._pair_gradients(lines, gradient_lines, gradient[:, 1].astype(float))
+        self.data['policy_updates'].extend({
+            'timestamp': _epoch_seconds(policy[:, 0]),
+            'epoch': policy[:, 1].astype(np.int64),
+            'loss': policy[:, 2].astype(float),
+            'gradient_norm': gradient_norms,
+        })
+        
+        _, reward = matches['reward']
+        self.data['rewards'].extend({
+            'timestamp': _epoch_seconds(reward[:, 0]),
+            'amount': reward[:, 1].astype(float),
+            'rank': reward[:, 3].astype(np.int64),
+            'total_solvers': reward[:, 4].astype(np.int64),
+            'problem_id': self._intern_column(reward[:, 2]),
+        })
+        
+        _, difficulty = matches['difficulty']
+        self.data['difficulty_changes'].extend({
+            'timestamp': _epoch_seconds(difficulty[:, 0]),
+            'from_level': difficulty[:, 1].astype(np.int64),
+            'to_level': difficulty[:, 2].astype(np.int64),
+            'swarm_success_rate': _optional(difficulty[:, 3], 'nan').astype(float),
+        })
+        
+        _, rollout = matches['rollout']
+        self.data['rollouts'].extend({
+            'timestamp': _epoch_seconds(rollout[:, 0]),
+            'problem_id': self._intern_column(rollout[:, 1]),
+            'steps': _optional(rollout[:, 2], str(MISSING_INT)).astype(np.int64),
+            'diversity_score': rollout[:, 3].astype(float),
+        })
+    
+    def _pair_gradients(self, policy_lines: np.ndarray, gradient_lines: np.ndarray,
+                        gradient_values: np.ndarray) -> np.ndarray:
+        """
+        Give each policy update the gradient logged since the previous update
+        
+        Mirrors _last_gradient_norm in parse_line: the newest gradient wins and
+        a policy update clears it. State carries over between batches.
+        """
+        positions = np.concatenate([policy_lines, gradient_lines])
+        is_gradient = np.concatenate([
+            np.zeros(len(policy_lines), dtype=bool), np.ones(len(gradient_lines), dtype=bool)
+        ])
+        values = np.concatenate([np.full(len(policy_lines), np.nan), gradient_values])
+        order = np.argsort(positions, kind='stable')
+        is_gradient = is_gradient[order]
+        values = values[order]
+        
+        carried = np.nan if self._last_gradient_norm is None else self._last_gradient_norm
+        previous_is_gradient = np.concatenate([[carried == carried], is_gradient[:-1]])
+        previous_values = np.concatenate([[carried], values[:-1]])
+        is_policy = ~is_gradient
+        norms = np.where(previous_is_gradient[is_policy], previous_values[is_policy], np.nan)
+        
+        if len(is_gradient):
+            self._last_gradient_norm = float(values[-1]) if is_gradient[-1] else None
+        return norms
+    
+    def _intern_column(self, problem_ids: np.ndarray) -> np.ndarray:
+        """Map a column of problem ids ('' for missing) to interned codes"""
+        codes, uniques = pd.factorize(problem_ids)
+        lookup = np.array(
+            [self.data.intern_problem_id(pid or None) for pid in uniques] + [MISSING_INT],
+            dtype='int32'
+        )
+        return lookup[codes]
+    
     def parse_line(self, line: str) -> None:
         """Parse a single log line and update data"""
+        if self.engine == 'regex':
+            self.parse_line_regex(line)
+            return
+        
+        for keyword, kind, pattern in self.EVENT_PATTERNS:
+            if keyword in line:
+                match = pattern.search(line)
+                # No match falls through to the next event type, like the legacy chain
+                if match is not None:
+                    self._record(kind, match, str)
+                    return
+    
+    def _record(self, kind: str, match, text) -> None:
+        """Store the event captured by an EVENT_PATTERNS match"""
+        if kind == 'policy_update':
+            self._add_policy_update(
+                self._timestamp(match.group(1)),
+                int(match.group(2)),
+                float(match.group(3))
+            )
+        elif kind == 'gradient':
+            self._last_gradient_norm = float(match.group(2))
+        elif kind == 'reward':
+            problem_id = match.group(3)
+            self._add_reward(
+                self._timestamp(match.group(1)),
+                float(match.group(2)),
+                int(match.group(4)),
+                int(match.group(5)),
+                text(problem_id) if problem_id is not None else None
+            )
+        elif kind == 'difficulty':
+            rate = match.group(4)
+            self._add_difficulty_change(
+                self._timestamp(match.group(1)),
+                int(match.group(2)),
+                int(match.group(3)),
+                float(rate) if rate is not None else None
+            )
+        else:
+            steps = match.group(3)
+            self._add_rollout(
+                self._timestamp(match.group(1)),
+                text(match.group(2)),
+                int(steps) if steps is not None else None,
+                float(match.group(4))
+            )
+    
+    def _timestamp(self, text) -> int:
+        """Convert a log timestamp (str or bytes) to epoch seconds, reusing the last result"""
+        if text != self._last_ts_text:
+            self._last_ts = to_epoch_seconds(datetime.fromisoformat(
+                text if isinstance(text, str) else text.decode('ascii')
+            ))
+            self._last_ts_text = text
+        return self._last_ts
+    
+    def _add_policy_update(self, timestamp: int, epoch: int, loss: float) -> None:
+        self.data['policy_updates'].append(timestamp, epoch, loss, self._last_gradient_norm)
+        self._last_gradient_norm = None
+    
+    def _add_reward(self, timestamp: int, amount: float, rank: int,
+                    total_solvers: int, problem_id: str = None) -> None:
+        self.data['rewards'].append(
+            timestamp, amount, rank, total_solvers,
+            self.data.intern_problem_id(problem_id)
+        )
+    
+    def _add_difficulty_change(self, timestamp: int, from_level: int, to_level: int,
+                               swarm_success_rate: float = None) -> None:
+        self.data['difficulty_changes'].append(timestamp, from_level, to_level, swarm_success_rate)
+    
+    def _add_rollout(self, timestamp: int, problem_id: str, steps: int = None,
+                     diversity_score: float = None) -> None:
+        self.data['rollouts'].append(
+            timestamp,
+            self.data.intern_problem_id(problem_id),
+            MISSING_INT if steps is None else steps,
+            diversity_score
+        )
+    
+    def parse_line_regex(self, line: str) -> None:
+        """Parse a single log line with the legacy pattern chain"""
         # Try policy update
         match = self.PATTERNS['policy_update'].search(line)
         if match:
@@ -111,13 +796,7 @@ class LogParser:
             epoch = int(match.group(2))
             loss = float(match.group(3))
             
-            self.data['policy_updates'].append(PolicyUpdate(
-                timestamp=timestamp,
-                epoch=epoch,
-                loss=loss,
-                gradient_norm=self._last_gradient_norm
-            ))
-            self._last_gradient_norm = None
+            self._add_policy_update(to_epoch_seconds(timestamp), epoch, loss)
             return
         
         # Try gradient (for next policy update)
@@ -135,13 +814,7 @@ class LogParser:
             rank = int(match.group(4))
             total = int(match.group(5))
             
-            self.data['rewards'].append(Reward(
-                timestamp=timestamp,
-                amount=amount,
-                rank=rank,
-                total_solvers=total,
-                problem_id=problem_id
-            ))
+            self._add_reward(to_epoch_seconds(timestamp), amount, rank, total, problem_id)
             return
         
         # Try reward without problem_id
@@ -152,12 +825,7 @@ class LogParser:
             rank = int(match.group(3))
             total = int(match.group(4))
             
-            self.data['rewards'].append(Reward(
-                timestamp=timestamp,
-                amount=amount,
-                rank=rank,
-                total_solvers=total
-            ))
+            self._add_reward(to_epoch_seconds(timestamp), amount, rank, total)
             return
         
         # Try difficulty with success rate
@@ -168,12 +836,7 @@ class LogParser:
             to_level = int(match.group(3))
             success_rate = float(match.group(4))
             
-            self.data['difficulty_changes'].append(DifficultyChange(
-                timestamp=timestamp,
-                from_level=from_level,
-                to_level=to_level,
-                swarm_success_rate=success_rate
-            ))
+            self._add_difficulty_change(to_epoch_seconds(timestamp), from_level, to_level, success_rate)
             return
         
         # Try difficulty without success rate
@@ -183,11 +846,7 @@ class LogParser:
             from_level = int(match.group(2))
             to_level = int(match.group(3))
             
-            self.data['difficulty_changes'].append(DifficultyChange(
-                timestamp=timestamp,
-                from_level=from_level,
-                to_level=to_level
-            ))
+            self._add_difficulty_change(to_epoch_seconds(timestamp), from_level, to_level)
             return
         
         # Try rollout with steps
@@ -198,12 +857,7 @@ class LogParser:
             steps = int(match.group(3))
             diversity = float(match.group(4))
             
-            self.data['rollouts'].append(Rollout(
-                timestamp=timestamp,
-                problem_id=problem_id,
-                steps=steps,
-                diversity_score=diversity
-            ))
+            self._add_rollout(to_epoch_seconds(timestamp), problem_id, steps, diversity)
             return
         
         # Try rollout without steps
@@ -213,18 +867,201 @@ class LogParser:
             problem_id = match.group(2)
             diversity = float(match.group(3))
             
-            self.data['rollouts'].append(Rollout(
-                timestamp=timestamp,
-                problem_id=problem_id,
-                diversity_score=diversity
-            ))
+            self._add_rollout(to_epoch_seconds(timestamp), problem_id, diversity_score=diversity)
             return
     
+    def iter_events(self, source, types: Optional[Iterable[str]] = None,
+                    start: Optional[datetime] = None,
+                    end: Optional[datetime] = None) -> Iterator[Event]:
+        """
+        Yield events one at a time, without storing them in self.data
+        
+        Memory use does not grow with the log, so callers can aggregate,
+        export or alert on arbitrarily long logs in their own pipeline.
+        Gradient pairing follows parse_line, but with its own state.
+        
+        Args:
+            source: Path to a log file, an open binary (or text) stream, or
+                any iterable of lines such as LogWatcher.watch()
+            types: Event type names to yield (keys of get_frames(), e.g.
+                'rewards'); default all
+            start: Only yield events at or after this time
+            end: Only yield events before this time
+        
+        Yields:
+            PolicyUpdate, Reward, DifficultyChange or Rollout instances
+        """
+        wanted, keywords = self._event_keywords(types)
+        
+        gradient_norm = None
+        for line in _source_lines(source, keywords):
+            if isinstance(line, bytes):
+                patterns, text = self.RAW_EVENT_PATTERNS, _ascii
+            else:
+                patterns, text = self.EVENT_PATTERNS, str
+            for keyword, kind, pattern in patterns:
+                if keyword not in line:
+                    continue
+                match = pattern.search(line)
+                if match is None:
+                    continue
+                if kind == 'gradient':
+                    gradient_norm = float(match.group(2))
+                    break
+                event = self._event(kind, match, text, gradient_norm)
+                if kind == 'policy_update':
+                    gradient_norm = None
+                if (self.EVENT_TABLES[kind] in wanted
+                        and (start is None or event.timestamp >= start)
+                        and (end is None or event.timestamp < end)):
+                    yield event
+                break
+    
+    def tail_events(self, filepath: str, count: int,
+                    types: Optional[Iterable[str]] = None) -> List[Event]:
+        """
+        Return the last events of a log file, like 'tail -n' for events
+        
+        The file is read backward from its end (see log_reader.read_tail),
+        so the cost depends on count rather than on the file size.
+        self.data is left untouched.
+        
+        Args:
+            filepath: Path to log file
+            count: Number of events
+            types: Event type names to include (as for iter_events)
+        
+        Returns:
+            Up to count events, oldest first
+        """
+        _, keywords = self._event_keywords(types)
+        if count <= 0:
+            return []
+        
+        lines = count
+        while True:
+            block, spans = read_tail(filepath, lines, keywords)
+            buffer = block.buffer
+            events = list(self.iter_events((buffer[start:end] for start, end in spans), types))
+            if len(spans) < lines:
+                # Reached the start of the file
+                return events[-count:]
+            if len(events) >= count:
+                # The first policy update scanned may pair with a
+                # gradient logged before the scanned range
+                first_update = next(
+                    (i for i, event in enumerate(events) if isinstance(event, PolicyUpdate)), None
+                )
+                if first_update is None or first_update < len(events) - count:
+                    return events[-count:]
+            lines *= 2
+    
+    def _event_keywords(self, types: Optional[Iterable[str]]) -> Tuple[set, List[bytes]]:
+        """Validate event type names and return them with their line keywords"""
+        wanted = set(self.EVENT_TABLES.values()) if types is None else set(types)
+        unknown = wanted - set(self.EVENT_TABLES.values())
+        if unknown:
+            raise ValueError(f"Unknown event types: {sorted(unknown)}")
+        
+        # Lines without a keyword of a wanted type (or of gradients, when
+        # policy updates are wanted) are skipped without being matched
+        keywords = [
+            keyword for keyword, kind, _ in self.RAW_EVENT_PATTERNS
+            if self.EVENT_TABLES.get(kind, 'policy_updates') in wanted
+        ]
+        return wanted, keywords
+    
+    def _event(self, kind: str, match, text, gradient_norm: Optional[float]) -> Event:
+        """Build the event dataclass for an EVENT_PATTERNS match"""
+        timestamp = datetime.fromisoformat(text(match.group(1)))
+        if kind == 'policy_update':
+            return PolicyUpdate(timestamp, int(match.group(2)), float(match.group(3)), gradient_norm)
+        if kind == 'reward':
+            problem_id = match.group(3)
+            return Reward(
+                timestamp,
+                float(match.group(2)),
+                int(match.group(4)),
+                int(match.group(5)),
+                text(problem_id) if problem_id is not None else None
+            )
+        if kind == 'difficulty':
+            rate = match.group(4)
+            return DifficultyChange(
+                timestamp,
+                int(match.group(2)),
+                int(match.group(3)),
+                float(rate) if rate is not None else None
+            )
+        steps = match.group(3)
+        return Rollout(
+            timestamp,
+            text(match.group(2)),
+            int(steps) if steps is not None else None,
+            float(match.group(4))
+        )
+    
+    def get_frames(self) -> Dict[str, pd.DataFrame]:
+        """Return a zero-copy DataFrame per event type for charts and stats"""
+        return self.data.frames()
+    
+    def get_history(self) -> Dict[str, pd.DataFrame]:
+        """Return aggregates of events compacted by the retention window"""
+        return self.data.history_frames()
+    
     def get_data_dict(self) -> Dict[str, List[Dict]]:
-        """Convert dataclasses to dictionaries for easier JSON serialization"""
-        return {
-            'policy_updates': [asdict(p) for p in self.data['policy_updates']],
-            'rewards': [asdict(r) for r in self.data['rewards']],
-            'difficulty_changes': [asdict(d) for d in self.data['difficulty_changes']],
-            'rollouts': [asdict(r) for r in self.data['rollouts']]
-        }
+        """Decode events into dictionaries for easier JSON serialization"""
+        return self.data.records()
+
+
+def _ascii(value: bytes) -> str:
+    return value.decode('ascii')
+
+
+def _source_lines(source, keywords: List[bytes]) -> Iterator[Union[str, bytes]]:
+    """Yield the lines of a path, stream or line iterable for iter_events"""
+    if isinstance(source, (str, os.PathLike)):
+        # Mostly keyword lines, decoded one block at a time
+        for block in file_blocks(os.fspath(source)):
+            yield from block.iter_text(keywords=keywords)
+    else:
+        # Streams iterate line by line; lines may be bytes or str
+        yield from source
+
+
+def _find_all(data: bytes, needle: bytes) -> np.ndarray:
+    """Return the start offset of every occurrence of needle in data"""
+    offsets = []
+    position = data.find(needle)
+    while position != -1:
+        offsets.append(position)
+        position = data.find(needle, position + 1)
+    return np.array(offsets, dtype=np.int64)
+
+
+def _epoch_seconds(timestamps: np.ndarray) -> np.ndarray:
+    """Convert an array of log timestamp strings to epoch seconds in one call"""
+    parsed = pd.to_datetime(timestamps, format='%Y-%m-%d %H:%M:%S')
+    return parsed.to_numpy().astype('datetime64[s]').astype(np.int64)
+
+
+def _optional(values: np.ndarray, missing: str) -> np.ndarray:
+    """Substitute missing for empty strings in an extracted field"""
+    return np.where(values == '', missing, values)
+
+
+def _parse_chunk(filepath: str, start: int, end: int, engine: str):
+    """
+    Parse one byte range of a log file (runs in a worker process)
+    
+    Returns:
+        The chunk's events, its pending gradient norm and its timestamp
+        index. A policy update that still has to pair with a gradient from
+        an earlier chunk has CARRY_GRADIENT as gradient_norm; a pending
+        value of CARRY_GRADIENT means the chunk neither applied nor
+        consumed a gradient.
+    """
+    parser = LogParser(engine)
+    parser._last_gradient_norm = CARRY_GRADIENT
+    parser._parse_blocks(filepath, start, end)
+    return parser.data, parser._last_gradient_norm, parser.index
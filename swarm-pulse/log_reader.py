@@ -0,0 +1,330 @@
+"""
+Bytes-Level Log Reader
+
+Shared bytes-level access to log files for the parser, the watcher and the
+CLI. Files are read in bounded blocks of whole lines instead of through a
+text decoder, and lines are returned as byte offsets so callers only slice
+and decode what they actually use. Invalid UTF-8 in container logs is left
+in place until a caller decodes a line.
+
+Files are read, never memory-mapped: the live log may be truncated while
+it is read (copytruncate rotation), and touching mapped pages past the new
+end of a file raises SIGBUS, which kills the process. A block read with
+plain reads just comes back shorter.
+"""
+
+import os
+from typing import BinaryIO, Iterator, List, Optional, Sequence, Tuple
+
+
+class LineBuffer:
+    """Line access to log bytes held in memory"""
+
+    # Most bytes searched for keywords or decoded at a time
+    SCAN_BYTES = 1024 * 1024
+
+    # Bytes at the start of a window used to estimate how many of its
+    # lines hold a keyword (see iter_text)
+    SAMPLE_BYTES = 64 * 1024
+
+    # Windows where more than one line in DENSE_LINES holds a keyword are
+    # decoded whole: splitting every line out is then cheaper than
+    # locating the keyword lines one by one
+    DENSE_LINES = 3
+
+    # Bytes scanned at a time when reading lines backward from the end
+    TAIL_BLOCK_BYTES = 64 * 1024
+
+    def __init__(self, buffer: bytes, base: int = 0):
+        """
+        Wrap a block of log lines
+
+        Args:
+            buffer: Log bytes (e.g. a block of a decompressed stream)
+            base: File offset of buffer[0]; offsets of spans are relative to it
+        """
+        self.buffer = buffer
+        self.position = 0
+        self.base = base
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+    def iter_lines(self, start: int = 0, end: Optional[int] = None,
+                   keywords: Optional[Sequence[bytes]] = None,
+                   complete_only: bool = False) -> Iterator[Tuple[int, int]]:
+        """
+        Yield (start, end) byte spans of lines, without the newline
+
+        Args:
+            start: Offset of the first line
+            end: Offset to stop at (default: end of buffer)
+            keywords: If given, only yield lines containing one of them;
+                each keyword is located with plain substring searches, in
+                windows growing up to SCAN_BYTES, and other lines are
+                skipped without being split out
+            complete_only: Stop before a trailing line without a newline
+
+        self.position is kept at the offset just after the last line
+        consumed, so it is where a later read should resume.
+        """
+        buffer = self.buffer
+        end = len(buffer) if end is None else end
+        if complete_only:
+            end = max(start, buffer.rfind(b'\n', start, end) + 1)
+        self.position = start
+
+        if keywords is None:
+            while self.position < end:
+                line_start = self.position
+                newline = buffer.find(b'\n', line_start, end)
+                line_end = end if newline == -1 else newline
+                self.position = end if newline == -1 else newline + 1
+                yield line_start, line_end
+            return
+
+        # Small windows first, so finding only the first line stays cheap
+        size = self.TAIL_BLOCK_BYTES
+        while self.position < end:
+            window_end = self._window_end(self.position, end, size)
+            for line_start in _keyword_lines(buffer, self.position, window_end, keywords):
+                newline = buffer.find(b'\n', line_start, window_end)
+                line_end = window_end if newline == -1 else newline
+                self.position = window_end if newline == -1 else newline + 1
+                yield line_start, line_end
+            self.position = window_end
+            size = min(size * 2, self.SCAN_BYTES)
+
+    def iter_text(self, start: int = 0, end: Optional[int] = None,
+                  keywords: Optional[Sequence[bytes]] = None) -> Iterator[str]:
+        """
+        Yield decoded, stripped lines
+
+        Args:
+            start: Offset of the first line
+            end: Offset to stop at (default: end of buffer)
+            keywords: If given, lines without any of them may be left out.
+                Windows where keyword lines are sparse only have those
+                lines decoded; denser ones are decoded whole (see
+                DENSE_LINES), so callers must still check each line.
+
+        self.position is left at end.
+        """
+        buffer = self.buffer
+        end = len(buffer) if end is None else end
+        self.position = start
+        while self.position < end:
+            window_start = self.position
+            window_end = self._window_end(window_start, end, self.SCAN_BYTES)
+            if keywords is None or self._dense(window_start, window_end, keywords):
+                lines = buffer[window_start:window_end].decode('utf-8', errors='ignore').split('\n')
+                if not lines[-1]:
+                    # Nothing follows the last newline
+                    lines.pop()
+                for line in lines:
+                    yield line.strip()
+            else:
+                for line_start in _keyword_lines(buffer, window_start, window_end, keywords):
+                    newline = buffer.find(b'\n', line_start, window_end)
+                    yield self.decode(line_start, window_end if newline == -1 else newline)
+            self.position = window_end
+
+    def _window_end(self, start: int, end: int, size: int) -> int:
+        """End of a window of about size bytes, cut after a newline"""
+        # Keywords never span lines, so neither do windows
+        window_end = min(end, start + size)
+        if window_end < end:
+            window_end = self.buffer.find(b'\n', window_end - 1, end) + 1 or end
+        return window_end
+
+    def _dense(self, start: int, end: int, keywords: Sequence[bytes]) -> bool:
+        """Estimate from its first SAMPLE_BYTES whether a window is dense in keyword lines"""
+        sample_end = self._window_end(start, end, self.SAMPLE_BYTES)
+        lines = self.buffer.count(b'\n', start, sample_end) + 1
+        hits = sum(self.buffer.count(keyword, start, sample_end) for keyword in keywords)
+        return hits * self.DENSE_LINES > lines
+
+    def tail_spans(self, count: int, keywords: Optional[Sequence[bytes]] = None,
+                   end: Optional[int] = None, start: int = 0) -> List[Tuple[int, int]]:
+        """
+        Return (start, end) spans of the last lines before end, like 'tail -n'
+
+        The buffer is scanned backward in blocks of TAIL_BLOCK_BYTES until
+        enough lines are found, so the cost grows with count (and with
+        the distance between matching lines), not with the buffer size.
+
+        Args:
+            count: Number of lines
+            keywords: If given, only count lines containing one of them
+            end: Offset to stop at (default: end of buffer)
+            start: Offset of the first line that may be returned
+        """
+        buffer = self.buffer
+        high = len(buffer) if end is None else end
+        blocks: List[List[Tuple[int, int]]] = []
+        found = 0
+        while high > start and found < count:
+            low = max(start, high - self.TAIL_BLOCK_BYTES)
+            if low > start:
+                # Widen the block back to the start of the line it cuts
+                low = buffer.rfind(b'\n', start, low) + 1 or start
+            spans = list(self.iter_lines(low, high, keywords))
+            blocks.append(spans)
+            found += len(spans)
+            high = low
+
+        spans = [span for block in reversed(blocks) for span in block]
+        return spans[-count:] if count > 0 else []
+
+    def decode(self, start: int, end: int) -> str:
+        """Decode and strip one line span"""
+        return self.buffer[start:end].decode('utf-8', errors='ignore').strip()
+
+
+class FileBlock(LineBuffer):
+    """Byte range of a file read into memory, safe against truncation"""
+
+    def __init__(self, filepath: str, start: int = 0, end: Optional[int] = None):
+        """
+        Read [start, end) of a file; a truncated file just yields fewer bytes
+
+        Args:
+            filepath: Path to file
+            start: File offset to read from (base of the block)
+            end: File offset to stop at (default: end of file)
+        """
+        with open(filepath, 'rb') as f:
+            # Size of the file when it was read
+            self.size = os.fstat(f.fileno()).st_size
+            end = self.size if end is None else min(end, self.size)
+            start = min(start, end)
+            f.seek(start)
+            buffer = f.read(end - start)
+        super().__init__(buffer, start)
+
+
+def read_tail(filepath: str, count: int, keywords: Optional[Sequence[bytes]] = None,
+              complete_only: bool = False) -> Tuple[FileBlock, List[Tuple[int, int]]]:
+    """
+    Read the last lines of a file, like 'tail -n'
+
+    Blocks from the end of the file, growing fourfold each time, are read
+    until they hold count lines, so the cost depends on count rather than
+    on the file size.
+
+    Args:
+        filepath: Path to file
+        count: Number of lines
+        keywords: If given, only count lines containing one of them
+        complete_only: Leave out a trailing line without a newline
+
+    Returns:
+        The block read and the (start, end) spans of up to count lines in
+        it, relative to block.base
+    """
+    size = os.stat(filepath).st_size
+    read = LineBuffer.TAIL_BLOCK_BYTES
+    while True:
+        block = FileBlock(filepath, max(0, size - read), size)
+        buffer = block.buffer
+        end = buffer.rfind(b'\n') + 1 if complete_only else len(buffer)
+        # The first line of a block that starts mid-file may be cut
+        start = buffer.find(b'\n', 0, end) + 1 if block.base > 0 else 0
+        spans = block.tail_spans(count, keywords, end, start) if start or not block.base else []
+        if len(spans) >= count or block.base == 0 or len(buffer) < size - block.base:
+            return block, spans
+        read *= 4
+
+
+def read_blocks(stream: BinaryIO, size: int = 8 * 1024 * 1024,
+                limit: Optional[int] = None) -> Iterator[bytes]:
+    """
+    Read a binary stream in blocks that end on a line boundary
+
+    Args:
+        stream: Open binary stream (e.g. a decompressing reader)
+        size: Approximate block size in bytes
+        limit: Most bytes to read (default: until the end of the stream)
+
+    Yields:
+        Blocks of whole lines; the last one may lack a trailing newline
+    """
+    carry = b''
+    while limit is None or limit > 0:
+        chunk = stream.read(size if limit is None else min(size, limit))
+        if not chunk:
+            break
+        if limit is not None:
+            limit -= len(chunk)
+        block = carry + chunk
+        cut = block.rfind(b'\n') + 1
+        if cut == 0:
+            carry = block
+            continue
+        carry = block[cut:]
+        yield block[:cut]
+    if carry:
+        yield carry
+
+
+def file_blocks(filepath: str, start: int = 0, end: Optional[int] = None,
+                size: int = 1024 * 1024, complete_only: bool = False) -> Iterator[LineBuffer]:
+    """
+    Read a byte range of a file in blocks that end on a line boundary
+
+    At most about size bytes (or one line, if longer) are held at a time,
+    and a file truncated meanwhile just ends early.
+
+    Args:
+        filepath: Path to file
+        start: Offset of the first line
+        end: Offset to stop at (default: end of file when it is opened)
+        size: Approximate block size in bytes
+        complete_only: Leave out a trailing line without a newline
+
+    Yields:
+        Blocks with base set to their file offset
+    """
+    with open(filepath, 'rb') as f:
+        end = os.fstat(f.fileno()).st_size if end is None else end
+        f.seek(start)
+        position = start
+        for block in read_blocks(f, size, max(0, end - start)):
+            if complete_only and not block.endswith(b'\n'):
+                break
+            yield LineBuffer(block, position)
+            position += len(block)
+
+
+def line_start_after(f: BinaryIO, position: int) -> int:
+    """
+    Offset of the first line starting at or after position
+
+    Args:
+        f: File opened in binary mode
+        position: File offset
+
+    Returns:
+        The offset, or the file size if no line starts there
+    """
+    if position <= 0:
+        return 0
+    f.seek(position - 1)
+    f.readline()
+    return f.tell()
+
+
+def _keyword_lines(buffer: bytes, start: int, end: int,
+                   keywords: Sequence[bytes]) -> List[int]:
+    """Start offsets, in order, of the lines in [start, end) holding a keyword"""
+    starts = set()
+    for keyword in keywords:
+        hit = buffer.find(keyword, start, end)
+        while hit != -1:
+            starts.add(buffer.rfind(b'\n', start, hit) + 1 or start)
+            # Further hits on the same line add nothing
+            newline = buffer.find(b'\n', hit, end)
+            if newline == -1:
+                break
+            hit = buffer.find(keyword, newline + 1, end)
+    return sorted(starts)
@@ -0,0 +1,142 @@
+"""
+Rotated and Compressed Log Sources
+
+Resolves a log path or glob to every file holding part of its history,
+e.g. node.log.2.gz, node.log.1 and node.log, ordered by the first
+timestamp in each. Compressed members (.gz, and .zst when the optional
+zstandard package is installed) are opened as decompressing streams, so
+archives are never inflated to disk.
+"""
+
+import glob
+import gzip
+import os
+import re
+from typing import BinaryIO, List, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+from time_index import TIMESTAMP_PATTERN, timestamp_seconds
+
+
+COMPRESSED_SUFFIXES = ('.gz', '.zst')
+
+# What logrotate & co. append to a rotated file name:
+# .1, .2.gz, -20251122, -20251122.zst, ...
+ROTATED_SUFFIX = re.compile(r'(?:[.-]\d+)*(?:\.gz|\.zst)?')
+
+# Bytes read from the start of a member to find its first timestamp
+HEAD_SCAN_BYTES = 1024 * 1024
+
+
+def is_glob(pattern: str) -> bool:
+    return any(char in str(pattern) for char in '*?[')
+
+
+def is_compressed(path: str) -> bool:
+    return str(path).endswith(COMPRESSED_SUFFIXES)
+
+
+def expand_sources(pattern: str) -> List[str]:
+    """
+    List the files of a log source, oldest first
+
+    Args:
+        pattern: A glob (e.g. "logs/node.log*") or the path of the live log,
+            in which case its rotated siblings are included
+
+    Returns:
+        Paths ordered by the first timestamp they contain (files without
+        one go last, by modification time)
+    """
+    return [path for path, _ in source_members(pattern)]
+
+
+def source_members(pattern: str) -> List[Tuple[str, Optional[int]]]:
+    """Like expand_sources, but with each member's first timestamp (or None)"""
+    members = [(path, first_timestamp(path)) for path in source_paths(pattern)]
+    return sorted(members, key=_order_key)
+
+
+def source_paths(pattern: str) -> List[str]:
+    """List the files of a log source in no particular order, without reading them"""
+    pattern = os.path.expanduser(str(pattern))
+    if is_glob(pattern):
+        paths = glob.glob(pattern)
+    else:
+        directory, name = os.path.split(pattern)
+        try:
+            names = os.listdir(directory or '.')
+        except OSError:
+            return []
+        paths = [
+            os.path.join(directory, candidate) for candidate in names
+            if candidate.startswith(name) and ROTATED_SUFFIX.fullmatch(candidate[len(name):])
+        ]
+    return [path for path in paths if os.path.isfile(path)]
+
+
+def overlapping_members(pattern: str, start: Optional[int] = None,
+                        end: Optional[int] = None) -> List[str]:
+    """
+    List the members of a log source that can hold lines in [start, end)
+
+    A member is taken to span from its first timestamp up to the next
+    member's; members without a timestamp are always included.
+
+    Args:
+        pattern: As for expand_sources
+        start: Window start in epoch seconds (default: unbounded)
+        end: Window end in epoch seconds, exclusive (default: unbounded)
+    """
+    members = source_members(pattern)
+    paths = []
+    for i, (path, first) in enumerate(members):
+        following = members[i + 1][1] if i + 1 < len(members) else None
+        if end is not None and first is not None and first >= end:
+            continue
+        if start is not None and following is not None and following < start:
+            continue
+        paths.append(path)
+    return paths
+
+
+def has_rotated_members(path: str) -> bool:
+    """Check whether a log path is a glob or has rotated siblings next to it"""
+    return is_glob(str(path)) or len(expand_sources(path)) > 1
+
+
+def open_source(path: str) -> BinaryIO:
+    """
+    Open a log file for binary reading, decompressing on the fly
+
+    Raises:
+        RuntimeError: For .zst files when zstandard is not installed
+    """
+    path = str(path)
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rb')
+    if path.endswith('.zst'):
+        if zstandard is None:
+            raise RuntimeError(f"Reading {path} requires the zstandard package (pip install zstandard)")
+        return zstandard.ZstdDecompressor().stream_reader(open(path, 'rb'), closefd=True)
+    return open(path, 'rb')
+
+
+def first_timestamp(path: str) -> Optional[int]:
+    """Epoch seconds of the first timestamp near the start of a file"""
+    try:
+        with open_source(path) as stream:
+            head = stream.read(HEAD_SCAN_BYTES)
+    except (OSError, EOFError, RuntimeError):
+        return None
+    match = TIMESTAMP_PATTERN.search(head)
+    return timestamp_seconds(match.group(1)) if match else None
+
+
+def _order_key(member: Tuple[str, Optional[int]]):
+    path, seconds = member
+    return (seconds is None, seconds or 0, os.path.getmtime(path))
@@ -2,30 +2,271 @@
 Real-time Log File Watcher
 
 Monitors log files for new entries and streams them in real-time.
-Similar to 'tail -f' functionality.
+Similar to 'tail -f' functionality. Between reads the watcher sleeps until
+the file changes (inotify on Linux, see file_events), falling back to
+polling every poll_interval seconds.
+
+Log rotation is detected by file identity: when the path names a new
+file (rename + create, or delete + recreate), whatever is left in the old
+file is read to the end before the new one is followed from its start.
+With copytruncate, the lines written after the last read but before the
+truncation are recovered from the rotated copy.
+
+LogWatcher follows one file with a blocking generator (AsyncLogWatcher
+runs it on a thread); AsyncioLogWatcher follows any number of files from
+a single asyncio event loop. Both read through LogTail.
+
+DirectoryWatcher is a LogWatcher for a pattern such as logs/*.log: it
+follows the newest matching file and, when a new one appears in the
+directory (e.g. the node restarted with a fresh timestamped log),
+finishes the old file and switches to the new one from its start.
+
+With a checkpoint file (see checkpoints), LogWatcher saves its position
+after each batch the consumer has handled and resumes from it after a
+restart, including when the log was rotated while it was down.
 """
 
+import asyncio
+import fnmatch
+import logging
+import os
 import time
 from pathlib import Path
-from typing import Generator, Callable, Optional
+from typing import (BinaryIO, Dict, Generator, Callable, Iterable, List, NamedTuple, Optional,
+                    Set, Tuple)
 import threading
+from collections import deque
+
+from checkpoints import Checkpoint, CheckpointFile
+from file_events import PollingWaiter, change_waiter
+from log_reader import read_tail
+from log_sources import expand_sources, is_compressed, is_glob, open_source
+
+
+logger = logging.getLogger(__name__)
+
+
+class ReadMark(NamedTuple):
+    """Where a reader stands in one file (what a checkpoint records)"""
+    path: str
+    file_id: Tuple[int, int]
+    head: bytes
+    offset: int
+
+
+class LogTail:
+    """Incremental reader of one log file that follows it across rotations"""
+    
+    # Bytes at the start of the file used to recognize it (and its copies)
+    HEAD_BYTES = 256
+    
+    # Bytes read from the file at a time
+    READ_BYTES = 64 * 1024
+    
+    def __init__(self, filepath: str, position: Optional[int] = None):
+        """
+        Open a log file
+        
+        Args:
+            filepath: Path to log file
+            position: Offset to start reading at (default: end of file)
+        """
+        self.filepath = Path(filepath)
+        self.file = open(self.filepath, 'rb')
+        if position is None:
+            self.file.seek(0, 2)
+        else:
+            self.file.seek(position)
+        # Offset just after the last line returned by read()
+        self.position = self.file.tell()
+        # Lines read from the file but not returned yet, and a partial line
+        self._pending: List[bytes] = []
+        self._partial = b''
+        self._head = os.pread(self.file.fileno(), self.HEAD_BYTES, 0)
+    
+    @property
+    def head(self) -> bytes:
+        """First bytes of the file being read (up to HEAD_BYTES)"""
+        return self._head
+    
+    def mark(self) -> ReadMark:
+        """Current file and position, just after the last line returned"""
+        stat = os.fstat(self.file.fileno())
+        return ReadMark(str(self.filepath), (stat.st_dev, stat.st_ino), self._head, self.position)
+    
+    def __enter__(self) -> 'LogTail':
+        return self
+    
+    def __exit__(self, *exc_info) -> None:
+        self.close()
+    
+    def close(self) -> None:
+        self.file.close()
+    
+    def read(self, max_lines: Optional[int] = None) -> List[str]:
+        """
+        Read the complete lines appended since the last read
+        
+        The file is read in blocks of READ_BYTES; a partial last line is
+        kept until its newline arrives.
+        
+        Args:
+            max_lines: Most lines to return; the rest stay buffered, and
+                position ends exactly after the last line returned
+        
+        Returns:
+            Decoded, stripped lines
+        """
+        lines: List[str] = []
+        while max_lines is None or len(lines) < max_lines:
+            if not self._pending:
+                block = self.file.read(self.READ_BYTES)
+                if not block:
+                    break
+                self._pending = (self._partial + block).split(b'\n')
+                self._partial = self._pending.pop()
+                continue
+            if max_lines is None:
+                taken, self._pending = self._pending, []
+            else:
+                taken = self._pending[:max_lines - len(lines)]
+                del self._pending[:len(taken)]
+            self.position += sum(map(len, taken)) + len(taken)
+            lines.extend(_decode(line) for line in taken)
+        
+        if len(self._head) < self.HEAD_BYTES:
+            self._head = os.pread(self.file.fileno(), self.HEAD_BYTES, 0)
+        return lines
+    
+    def check_rotation(self) -> Optional[List[str]]:
+        """
+        Switch to a new file if the log was rotated
+        
+        Call once read() has caught up. When the path names another file,
+        the rest of the old one is read to its end before the new one is
+        followed from its start. After copytruncate, the lines beyond our
+        position are recovered from the rotated copy.
+        
+        Returns:
+            Lines read from the old file or its copy, or None if the log
+            was not rotated
+        """
+        replacement = self._reopen_if_rotated()
+        if replacement is not None:
+            # Lines may have been written to the old file after our last
+            # read and before the rotation
+            lines = self._drain()
+            self.file.close()
+            self.file = replacement
+        elif self._was_truncated():
+            # Copytruncate: pick up what the copy got beyond our position
+            # (or at least the lines already buffered), then start the
+            # emptied file over
+            lines = None
+            if self._head:
+                head = self._head
+                lines = _rotated_rest(self.filepath, lambda copy: copy.startswith(head),
+                                      self.position, compressed=False)
+            if lines is None:
+                lines = [_decode(line) for line in self._pending]
+            self.file.seek(0)
+        else:
+            return None
+        
+        self._restart()
+        return lines
+    
+    def switch(self, filepath: str) -> List[str]:
+        """
+        Finish the current file and follow another one from its start
+        
+        Args:
+            filepath: Path to the file to read next
+        
+        Returns:
+            Lines left in the current file, including a last line without
+            a newline
+        """
+        replacement = open(filepath, 'rb')
+        lines = self._drain()
+        self.file.close()
+        self.file = replacement
+        self.filepath = Path(filepath)
+        self._restart()
+        return lines
+    
+    def _drain(self) -> List[str]:
+        """Read the current file to its end, partial last line included"""
+        lines = self.read()
+        rest = self._partial + self.file.read()
+        if rest:
+            if rest.endswith(b'\n'):
+                rest = rest[:-1]
+            lines.extend(_decode(line) for line in rest.split(b'\n'))
+        return lines
+    
+    def _restart(self) -> None:
+        """Start over at the beginning of the (new) file"""
+        self.position = 0
+        self._pending = []
+        self._partial = b''
+        self._head = os.pread(self.file.fileno(), self.HEAD_BYTES, 0)
+    
+    def _reopen_if_rotated(self) -> Optional[BinaryIO]:
+        """Open the file the path now names, if it is no longer the one being read"""
+        try:
+            stat = self.filepath.stat()
+            if os.path.samestat(stat, os.fstat(self.file.fileno())):
+                return None
+            return open(self.filepath, 'rb')
+        except FileNotFoundError:
+            # Moved or deleted, and not recreated yet: keep the old file
+            return None
+    
+    def _was_truncated(self) -> bool:
+        """Check whether the file was truncated (possibly regrown) under us"""
+        if os.fstat(self.file.fileno()).st_size < self.position:
+            return True
+        return os.pread(self.file.fileno(), len(self._head), 0) != self._head
 
 
 class LogWatcher:
     """Watch log files for new entries in real-time"""
     
-    def __init__(self, filepath: str, poll_interval: float = 1.0):
+    # Default batch limits for watch_batches: lines per batch, and seconds
+    # a line may wait for its batch to fill
+    BATCH_LINES = 10000
+    BATCH_LATENCY = 0.05
+    
+    def __init__(self, filepath: str, poll_interval: float = 1.0, use_inotify: bool = True,
+                 checkpoint_path: Optional[str] = None, checkpoint_interval: float = 5.0):
         """
         Initialize log watcher
         
         Args:
             filepath: Path to log file to watch
-            poll_interval: How often to check for new lines (seconds)
+            poll_interval: How often to check for new lines (seconds); with
+                inotify, the longest wait between checks of the stop flag
+            use_inotify: Wake on file change notifications where available
+            checkpoint_path: If given, the read position is saved there
+                and watching resumes from it after a restart
+            checkpoint_interval: Least number of seconds between checkpoint
+                writes (one is always written when watching ends)
         """
         self.filepath = Path(filepath)
         self.poll_interval = poll_interval
+        self.use_inotify = use_inotify
+        self.checkpoint = (
+            CheckpointFile(checkpoint_path, checkpoint_interval)
+            if checkpoint_path is not None else None
+        )
         self._stop_flag = False
+        # Offset after the last batch the consumer has handled, and where
+        # to resume from (None while the stored checkpoint still applies)
         self._file_position = 0
+        self._handled: Optional[ReadMark] = None
+        # Offset after the last batch handed out
+        self._batch_end = 0
     
     def watch(self) -> Generator[str, None, None]:
         """
@@ -34,29 +275,8 @@ class LogWatcher:
         Yields:
             New log lines as strings
         """
-        if not self.filepath.exists():
-            raise FileNotFoundError(f"Log file not found: {self.filepath}")
-        
-        with open(self.filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            # Start from end of file for real-time monitoring
-            f.seek(0, 2)
-            self._file_position = f.tell()
-            
-            while not self._stop_flag:
-                line = f.readline()
-                if line:
-                    self._file_position = f.tell()
-                    yield line.strip()
-                else:
-                    # No new data, wait before checking again
-                    time.sleep(self.poll_interval)
-                    
-                    # Check if file was truncated (log rotation)
-                    current_size = self.filepath.stat().st_size
-                    if current_size < self._file_position:
-                        # File was truncated, start from beginning
-                        f.seek(0)
-                        self._file_position = 0
+        for batch in self.watch_batches(max_latency=0):
+            yield from batch
     
     def watch_from_beginning(self) -> Generator[str, None, None]:
         """
@@ -65,32 +285,147 @@ class LogWatcher:
         Yields:
             All log lines (historical + new) as strings
         """
+        for batch in self.watch_batches(from_beginning=True, max_latency=0):
+            yield from batch
+    
+    def watch_batches(self, from_beginning: bool = False, max_lines: int = None,
+                      max_latency: float = None) -> Generator[List[str], None, None]:
+        """
+        Generator that yields new lines in batches
+        
+        The file is read in blocks of READ_BYTES and split into complete
+        lines; a partial last line is carried over until its newline
+        arrives. A batch is delivered when it is full, when its oldest line
+        has waited max_latency, or when the end of the file is reached and
+        nothing more arrives within max_latency.
+        
+        Args:
+            from_beginning: Read the whole file first (in batches), then follow
+            max_lines: Most lines per batch (default: BATCH_LINES)
+            max_latency: Longest a line is held back to fill a batch, in
+                seconds (default: BATCH_LATENCY); 0 delivers as soon as
+                the reader catches up
+        
+        Yields:
+            Non-empty lists of log lines as strings
+        """
         if not self.filepath.exists():
             raise FileNotFoundError(f"Log file not found: {self.filepath}")
+        max_lines = self.BATCH_LINES if max_lines is None else max_lines
+        max_latency = self.BATCH_LATENCY if max_latency is None else max_latency
         
-        with open(self.filepath, 'r', encoding='utf-8', errors='ignore') as f:
-            # Read all existing lines first
-            for line in f:
-                if self._stop_flag:
-                    return
-                yield line.strip()
-            
-            self._file_position = f.tell()
-            
-            # Now watch for new lines
+        # Start from end of file for real-time monitoring, unless resuming
+        position = 0 if from_beginning else None
+        recovered: List[str] = []
+        saved = self.checkpoint.load() if self.checkpoint is not None else None
+        if saved is not None and saved.path == str(self.filepath):
+            position, recovered = self._resume(saved)
+        
+        with LogTail(self.filepath, position) as tail:
+            # Lines recovered from a rotated copy are only handled once all
+            # of them are, until then the stored checkpoint still applies
+            self._handled = tail.mark() if not recovered else None
+            self._file_position = tail.position
+            try:
+                for batch, mark in self._batches(tail, recovered, max_lines, max_latency):
+                    self._batch_end = tail.position
+                    yield batch
+                    # Asked for more, so the batch has been handled; a
+                    # consumer that stops partway through one gets it again
+                    # after a restart
+                    if mark is not None:
+                        self._handled = mark
+                        self._file_position = mark.offset
+                        self._save_checkpoint()
+            finally:
+                self._save_checkpoint(force=True)
+    
+    def _resume(self, saved: Checkpoint) -> Tuple[int, List[str]]:
+        """
+        Work out where to continue from a checkpoint
+        
+        Returns:
+            (offset to read the current file from, lines left unread in
+            the previous file if the log was rotated meanwhile)
+        """
+        with open(self.filepath, 'rb') as f:
+            stat = os.fstat(f.fileno())
+            head = f.read(LogTail.HEAD_BYTES)
+        if ((stat.st_dev, stat.st_ino) == (saved.device, saved.inode)
+                and stat.st_size >= saved.offset and saved.matches_head(head)):
+            return saved.offset, []
+        
+        # Rotated or truncated while we were down: finish the old file from
+        # its rotated copy (if it can still be found), then read the new
+        # one from the start
+        recovered = None
+        if saved.head_length:
+            recovered = _rotated_rest(self.filepath, saved.matches_head, saved.offset)
+        return 0, recovered or []
+    
+    def _save_checkpoint(self, force: bool = False) -> None:
+        """Record the position after the last batch the consumer has handled"""
+        if self.checkpoint is None or self._handled is None:
+            return
+        mark = self._handled
+        try:
+            self.checkpoint.save(mark.path, mark.file_id, mark.offset, mark.head, force)
+        except OSError as e:
+            # Watching goes on; a restart would then resume from an older point
+            logger.warning("Could not save checkpoint: %s", e)
+    
+    def _batches(self, tail: 'LogTail', recovered: List[str], max_lines: int,
+                 max_latency: float) -> Generator[Tuple[List[str], Optional[ReadMark]], None, None]:
+        """
+        Yield batches of lines appended to the file until stopped, across rotations
+        
+        Each batch comes with the reader's mark just after it, which is
+        where to resume once the batch has been handled (None for a part of
+        the recovered lines, after which the previous mark still holds).
+        """
+        for start in range(0, len(recovered), max_lines):
+            done = start + max_lines >= len(recovered)
+            yield recovered[start:start + max_lines], tail.mark() if done else None
+        
+        batch: List[str] = []
+        deadline = None
+        # Set up before the first read, so changes made after it are queued
+        with self._change_waiter() as waiter:
             while not self._stop_flag:
-                line = f.readline()
-                if line:
-                    self._file_position = f.tell()
-                    yield line.strip()
-                else:
-                    time.sleep(self.poll_interval)
-                    
-                    # Check for log rotation
-                    current_size = self.filepath.stat().st_size
-                    if current_size < self._file_position:
-                        f.seek(0)
-                        self._file_position = 0
+                lines = tail.read(max_lines - len(batch))
+                if lines:
+                    batch.extend(lines)
+                    if deadline is None:
+                        deadline = time.monotonic() + max_latency
+                    if len(batch) >= max_lines or time.monotonic() >= deadline:
+                        yield batch, tail.mark()
+                        batch, deadline = [], None
+                    continue
+                
+                if batch:
+                    # Caught up: linger for more lines within the latency cap
+                    remaining = deadline - time.monotonic()
+                    if remaining > 0 and waiter.wait(remaining):
+                        continue
+                    yield batch, tail.mark()
+                    batch, deadline = [], None
+                    continue
+                
+                # No new data, wait until the file changes
+                waiter.wait(self.poll_interval)
+                
+                # Until lines left in the old file are handled, resuming
+                # from the mark before the rotation recovers them
+                recovered = self._check_files(tail, waiter)
+                if recovered:
+                    yield recovered, tail.mark()
+    
+    def _change_waiter(self) -> PollingWaiter:
+        return change_waiter(str(self.filepath), self.use_inotify)
+    
+    def _check_files(self, tail: 'LogTail', waiter: PollingWaiter) -> Optional[List[str]]:
+        """Follow the log to a new file if needed; lines left in the old one, or None"""
+        return tail.check_rotation()
     
     def stop(self):
         """Stop watching the file"""
@@ -100,26 +435,225 @@ class LogWatcher:
         """Reset the stop flag to allow restarting"""
         self._stop_flag = False
         self._file_position = 0
+        self._handled = None
+        self._batch_end = 0
+
+
+class DirectoryWatcher(LogWatcher):
+    """Follow the newest log file matching a pattern in one directory"""
+    
+    def __init__(self, pattern: str, poll_interval: float = 1.0, use_inotify: bool = True,
+                 checkpoint_path: Optional[str] = None, checkpoint_interval: float = 5.0):
+        """
+        Initialize directory watcher
+        
+        The directory is watched for files matching the pattern being
+        created or moved in (with inotify, or by listing it every
+        poll_interval). A file counts as new if it was not in the
+        directory when last looked at, under any name, so the rotated
+        copy of a file (e.g. node.log.1 for a pattern node.log*) is not
+        mistaken for a new log.
+        
+        Args:
+            pattern: Directory and file name glob, e.g. ~/rl-swarm/logs/*.log
+            poll_interval: How often to check for new lines and files (seconds)
+            use_inotify: Wake on file change notifications where available
+            checkpoint_path: As for LogWatcher; used if, on restart, the
+                newest file is still the checkpointed one
+            checkpoint_interval: As for LogWatcher
+        
+        Raises:
+            ValueError: If the directory part of the pattern is a glob
+        """
+        directory, self.name_pattern = os.path.split(os.path.expanduser(str(pattern)))
+        if is_glob(directory):
+            raise ValueError(f"Only the file name may contain wildcards: {pattern}")
+        self.directory = Path(directory or '.')
+        self.pattern = str(pattern)
+        # (device, inode) of the matching files seen by the last scan
+        self._known: Set[Tuple[int, int]] = set()
+        newest = self._scan()
+        super().__init__(newest or self.directory / self.name_pattern, poll_interval,
+                         use_inotify, checkpoint_path, checkpoint_interval)
+        self._scanned_at = time.monotonic()
+    
+    def watch_batches(self, from_beginning: bool = False, max_lines: int = None,
+                      max_latency: float = None) -> Generator[List[str], None, None]:
+        """
+        Generator that yields new lines in batches, across files
+        
+        Like LogWatcher.watch_batches for the newest matching file; when a
+        new file appears, the rest of the current one is delivered and the
+        new one is read from its start. self.filepath names the file
+        currently followed.
+        
+        Raises:
+            FileNotFoundError: If no file matches the pattern yet
+        """
+        newest = self._scan()
+        if newest is None:
+            raise FileNotFoundError(f"No log file matches {self.pattern}")
+        self.filepath = newest
+        self._scanned_at = time.monotonic()
+        yield from super().watch_batches(from_beginning, max_lines, max_latency)
+    
+    def _change_waiter(self) -> PollingWaiter:
+        return change_waiter(str(self.filepath), self.use_inotify, self.name_pattern)
+    
+    def _check_files(self, tail: 'LogTail', waiter: PollingWaiter) -> Optional[List[str]]:
+        recovered = tail.check_rotation()
+        
+        # inotify says when a matching file appeared; without it, list
+        # the directory once per poll interval
+        if waiter.directory_changed is None:
+            if time.monotonic() - self._scanned_at < self.poll_interval:
+                return recovered
+        elif waiter.directory_changed:
+            waiter.directory_changed = False
+        else:
+            return recovered
+        self._scanned_at = time.monotonic()
+        
+        newest = self._scan(tail)
+        if newest is None:
+            return recovered
+        lines = (recovered or []) + tail.switch(newest)
+        self.filepath = tail.filepath
+        waiter.follow(str(self.filepath))
+        return lines
+    
+    def _scan(self, tail: Optional['LogTail'] = None) -> Optional[Path]:
+        """
+        List the directory and pick the file to follow
+        
+        Args:
+            tail: The reader of the file currently followed, if any
+        
+        Returns:
+            Without tail, the most recently modified matching file; with
+            it, the newest of the files that appeared since the last scan
+            (other than the one being read), or None if there are none
+        """
+        try:
+            entries = [
+                entry for entry in os.scandir(self.directory)
+                if fnmatch.fnmatch(entry.name, self.name_pattern) and entry.is_file()
+                and not is_compressed(entry.name)
+            ]
+        except OSError:
+            return None
+        
+        known, self._known = self._known, set()
+        candidates = []
+        current = os.fstat(tail.file.fileno()) if tail is not None else None
+        for entry in entries:
+            stat = entry.stat()
+            file_id = (stat.st_dev, stat.st_ino)
+            self._known.add(file_id)
+            if tail is not None and (file_id in known or os.path.samestat(stat, current)):
+                continue
+            candidates.append((stat.st_mtime_ns, entry.name))
+        if not candidates:
+            return None
+        return self.directory / max(candidates)[1]
 
 
 class AsyncLogWatcher:
     """Asynchronous log watcher that runs in a separate thread"""
     
+    # What the reader does when the queue is full
+    OVERFLOW_POLICIES = ('block', 'drop_oldest', 'coalesce')
+    
     def __init__(self, filepath: str, callback: Callable[[str], None], 
-                 poll_interval: float = 1.0, from_beginning: bool = False):
+                 poll_interval: float = 1.0, from_beginning: bool = False,
+                 use_inotify: bool = True, batched: bool = False,
+                 max_lines: Optional[int] = None, max_latency: Optional[float] = None,
+                 queue_size: int = 1000, overflow: str = 'block', workers: int = 1,
+                 on_error: Optional[Callable[[Exception], None]] = None):
         """
         Initialize async log watcher
         
+        Lines are read on one thread and handed to the callback through a
+        bounded queue, so a slow callback does not stall reading. When the
+        queue is full, overflow decides what happens:
+        
+        - 'block': the reader waits for room (nothing is lost; the file
+          is read later and lag_bytes grows). An item still waiting when
+          stop() is called is left unread instead of queued past
+          queue_size
+        - 'drop_oldest': the oldest queued item is discarded and counted
+          in dropped
+        - 'coalesce': the new batch is appended to the newest queued one,
+          so no line is lost but callbacks get larger batches (batched only)
+        
         Args:
-            filepath: Path to log file
-            callback: Function to call with each new line
+            filepath: Path to log file, or a pattern such as logs/*.log to
+                follow the newest matching file (see DirectoryWatcher)
+            callback: Function to call with each new line, or with each
+                list of lines if batched
             poll_interval: How often to check for new lines (seconds)
             from_beginning: If True, read entire file first
+            use_inotify: Wake on file change notifications where available
+            batched: Deliver lists of lines (see LogWatcher.watch_batches)
+            max_lines: Most lines per batch
+            max_latency: Longest a line is held back to fill a batch (seconds)
+            queue_size: Most items (lines, or batches if batched) waiting
+                for the callback
+            overflow: One of OVERFLOW_POLICIES
+            workers: Threads calling the callback; above 1, items may be
+                handled out of order
+            on_error: Called with any exception raised by the callback,
+                after which the watcher keeps running, or by reading the
+                file, which stops it (default: log it)
         """
-        self.watcher = LogWatcher(filepath, poll_interval)
+        if overflow not in self.OVERFLOW_POLICIES:
+            raise ValueError(f"overflow must be one of {self.OVERFLOW_POLICIES}, not {overflow!r}")
+        if overflow == 'coalesce' and not batched:
+            raise ValueError("overflow='coalesce' requires batched=True")
+        
+        if is_glob(filepath):
+            self.watcher = DirectoryWatcher(filepath, poll_interval, use_inotify)
+        else:
+            self.watcher = LogWatcher(filepath, poll_interval, use_inotify)
         self.callback = callback
         self.from_beginning = from_beginning
+        self.batched = batched
+        self.max_lines = max_lines
+        self.max_latency = max_latency
+        self.queue_size = queue_size
+        self.overflow = overflow
+        self.workers = workers
+        self.on_error = on_error
+        
+        # Lines dropped on overflow, and exceptions reported (see on_error)
+        self.dropped = 0
+        self.errors = 0
+        
+        # (item, offset after it) pairs waiting for a worker
+        self._queue: deque = deque()
+        self._queued_lines = 0
+        self._lock = threading.Lock()
+        self._not_empty = threading.Condition(self._lock)
+        self._not_full = threading.Condition(self._lock)
+        self._handed_position = 0
+        # Set by stop(); also releases a reader waiting for room
+        self._stopping = threading.Event()
         self._thread: Optional[threading.Thread] = None
+        self._workers: List[threading.Thread] = []
+    
+    @property
+    def queued(self) -> int:
+        """Lines read but not yet handed to the callback"""
+        return self._queued_lines
+    
+    @property
+    def lag_bytes(self) -> int:
+        """Bytes of the file not yet handed to a worker"""
+        try:
+            size = self.watcher.filepath.stat().st_size
+        except OSError:
+            return 0
+        return max(0, size - self._handed_position)
     
     def start(self):
         """Start watching in a background thread"""
@@ -127,32 +661,290 @@ class AsyncLogWatcher:
             return  # Already running
         
         self.watcher.reset()
+        self._stopping.clear()
+        self._workers = [
+            threading.Thread(target=self._work_loop, daemon=True)
+            for _ in range(max(1, self.workers))
+        ]
+        for worker in self._workers:
+            worker.start()
         self._thread = threading.Thread(target=self._watch_loop, daemon=True)
         self._thread.start()
     
     def _watch_loop(self):
         """Main watch loop (runs in thread)"""
         try:
-            watch_gen = (self.watcher.watch_from_beginning() 
-                        if self.from_beginning 
-                        else self.watcher.watch())
+            if self.batched:
+                watch_gen = self.watcher.watch_batches(
+                    self.from_beginning, self.max_lines, self.max_latency
+                )
+            else:
+                watch_gen = (self.watcher.watch_from_beginning() 
+                            if self.from_beginning 
+                            else self.watcher.watch())
             
-            for line in watch_gen:
-                self.callback(line)
+            for item in watch_gen:
+                if not self._put(item, self.watcher._batch_end):
+                    # Not queued, so it must not count as read either
+                    # (see LogWatcher.watch_batches)
+                    watch_gen.close()
+                    break
         except Exception as e:
-            print(f"Error in watch loop: {e}")
+            self._report_error(e, "Error in watch loop")
+    
+    def _put(self, item, position: int) -> bool:
+        """
+        Queue an item for the workers, applying the overflow policy
+        
+        Returns:
+            False if stop() was called while waiting for room; the item is
+            then left out rather than queued past queue_size
+        """
+        size = len(item) if self.batched else 1
+        with self._lock:
+            if len(self._queue) >= self.queue_size:
+                if self.overflow == 'block':
+                    while len(self._queue) >= self.queue_size:
+                        if self._stopping.is_set():
+                            return False
+                        self._not_full.wait()
+                elif self.overflow == 'drop_oldest':
+                    dropped, _ = self._queue.popleft()
+                    dropped_size = len(dropped) if self.batched else 1
+                    self._queued_lines -= dropped_size
+                    self.dropped += dropped_size
+                elif self._queue:
+                    newest, _ = self._queue.pop()
+                    item = newest + item
+            
+            self._queue.append((item, position))
+            self._queued_lines += size
+            self._not_empty.notify()
+        return True
+    
+    def _work_loop(self):
+        """Hand queued items to the callback (runs in each worker thread)"""
+        while True:
+            with self._lock:
+                while not self._queue and not self._stopping.is_set():
+                    self._not_empty.wait()
+                if not self._queue:
+                    return
+                item, position = self._queue.popleft()
+                self._queued_lines -= len(item) if self.batched else 1
+                self._handed_position = position
+                self._not_full.notify()
+            
+            try:
+                self.callback(item)
+            except Exception as e:
+                self._report_error(e, "Error in callback")
+    
+    def _report_error(self, error: Exception, context: str) -> None:
+        """Count an exception and pass it to on_error, or log it without one"""
+        self.errors += 1
+        if self.on_error is not None:
+            self.on_error(error)
+        else:
+            logger.error("%s: %s", context, error, exc_info=error)
     
     def stop(self):
-        """Stop watching"""
+        """Stop watching; items already queued are still handled"""
         self.watcher.stop()
+        with self._lock:
+            self._stopping.set()
+            self._not_empty.notify_all()
+            self._not_full.notify_all()
         if self._thread:
             self._thread.join(timeout=2.0)
+        for worker in self._workers:
+            worker.join(timeout=2.0)
     
     def is_running(self) -> bool:
         """Check if watcher is currently running"""
         return self._thread is not None and self._thread.is_alive()
 
 
+class AsyncioLogWatcher:
+    """Follow many log files from one asyncio event loop"""
+    
+    def __init__(self, filepaths: Iterable[str], poll_interval: float = 1.0,
+                 from_beginning: bool = False, use_inotify: bool = True,
+                 max_lines: int = LogWatcher.BATCH_LINES):
+        """
+        Initialize watcher
+        
+        Usage:
+            async with AsyncioLogWatcher(paths) as watcher:
+                async for path, lines in watcher:
+                    ...
+        
+        Files are opened on the first iteration. Cancelling the task that
+        iterates stops watching; leaving the async with block (or calling
+        close()) releases the files and notification descriptors.
+        
+        Args:
+            filepaths: Log files to follow
+            poll_interval: Seconds between checks of files that cannot be
+                watched with inotify, and between rotation checks of the rest
+            from_beginning: If True, read every file from its start
+            use_inotify: Wake on file change notifications where available
+            max_lines: Most lines read from one file per batch, so a busy
+                file does not hold up the others
+        """
+        self.filepaths = [str(path) for path in filepaths]
+        self.poll_interval = poll_interval
+        self.from_beginning = from_beginning
+        self.use_inotify = use_inotify
+        self.max_lines = max_lines
+        self._tails: Dict[str, LogTail] = {}
+        self._waiters: Dict[str, PollingWaiter] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._readers: List[int] = []
+        # Files that may have new lines, in the order they woke up
+        self._ready: Dict[str, None] = {}
+        self._batches: deque = deque()
+        self._wake: Optional[asyncio.Event] = None
+        self._next_poll = 0.0
+        self._closed = False
+    
+    @property
+    def offsets(self) -> Dict[str, int]:
+        """Offset just after the last complete line read, per file"""
+        return {path: tail.position for path, tail in self._tails.items()}
+    
+    async def __aenter__(self) -> 'AsyncioLogWatcher':
+        return self
+    
+    async def __aexit__(self, *exc_info) -> None:
+        self.close()
+    
+    def __aiter__(self) -> 'AsyncioLogWatcher':
+        return self
+    
+    async def __anext__(self) -> Tuple[str, List[str]]:
+        """
+        Wait for the next batch of lines
+        
+        Returns:
+            (path, lines) for one file
+        """
+        if self._closed:
+            raise StopAsyncIteration
+        if self._wake is None:
+            self._open()
+        
+        loop = asyncio.get_running_loop()
+        while not self._batches:
+            if loop.time() >= self._next_poll:
+                self._ready.update(dict.fromkeys(self.filepaths))
+                self._next_poll = loop.time() + self.poll_interval
+            self._read_ready()
+            if self._batches:
+                break
+            
+            self._wake.clear()
+            try:
+                await asyncio.wait_for(self._wake.wait(), self._next_poll - loop.time())
+            except asyncio.TimeoutError:
+                pass
+            if self._closed:
+                raise StopAsyncIteration
+        return self._batches.popleft()
+    
+    def close(self) -> None:
+        """Stop watching and close all files"""
+        if self._closed:
+            return
+        self._closed = True
+        for fd in self._readers:
+            self._loop.remove_reader(fd)
+        self._readers.clear()
+        for waiter in self._waiters.values():
+            waiter.close()
+        for tail in self._tails.values():
+            tail.close()
+        if self._wake is not None:
+            self._wake.set()
+    
+    def _open(self) -> None:
+        """Open every file and register its change notifications with the loop"""
+        loop = self._loop = asyncio.get_running_loop()
+        self._wake = asyncio.Event()
+        try:
+            for path in self.filepaths:
+                # Set up before the first read, so changes made after it are queued
+                waiter = change_waiter(path, self.use_inotify)
+                self._waiters[path] = waiter
+                self._tails[path] = LogTail(path, 0 if self.from_beginning else None)
+                if waiter.fd >= 0:
+                    try:
+                        loop.add_reader(waiter.fd, self._on_change, path)
+                    except NotImplementedError:
+                        # Event loops without reader support only poll
+                        continue
+                    self._readers.append(waiter.fd)
+        except OSError:
+            self.close()
+            raise
+    
+    def _on_change(self, path: str) -> None:
+        """Reader callback: consume the notification and mark the file for reading"""
+        self._waiters[path].wait(0)
+        self._ready[path] = None
+        self._wake.set()
+    
+    def _read_ready(self) -> None:
+        """Queue the new lines of every file marked as ready"""
+        ready, self._ready = self._ready, {}
+        for path in ready:
+            tail = self._tails[path]
+            lines = tail.read(self.max_lines)
+            if len(lines) >= self.max_lines:
+                # Leave the rest for the next round, after the other files
+                self._ready[path] = None
+            else:
+                recovered = tail.check_rotation()
+                if recovered is not None:
+                    # The new file may already hold lines
+                    lines.extend(recovered)
+                    self._ready[path] = None
+            if lines:
+                self._batches.append((path, lines))
+
+
+def _decode(line: bytes) -> str:
+    return line.decode('utf-8', errors='ignore').strip()
+
+
+def _rotated_rest(filepath: Path, head_matches: Callable[[bytes], bool], offset: int,
+                  compressed: bool = True) -> Optional[List[str]]:
+    """
+    Lines past offset in a rotated copy of a log file
+    
+    Args:
+        filepath: Path of the live log
+        head_matches: Recognizes the copy by its first LogTail.HEAD_BYTES bytes
+        offset: Where reading of the original stopped
+        compressed: Also look in compressed archives
+    
+    Returns:
+        The lines, or None if no rotated sibling matches
+    """
+    for path in reversed(expand_sources(str(filepath))):
+        if path == str(filepath) or (is_compressed(path) and not compressed):
+            continue
+        try:
+            with open_source(path) as copy:
+                if not head_matches(copy.read(LogTail.HEAD_BYTES)):
+                    continue
+                copy.seek(offset)
+                return [_decode(line) for line in copy]
+        except (OSError, EOFError, RuntimeError):
+            continue
+    return None
+
+
 # Utility function for simple use cases
 def tail_file(filepath: str, num_lines: int = 10) -> list[str]:
     """
@@ -169,6 +961,6 @@ def tail_file(filepath: str, num_lines: int = 10) -> list[str]:
     if not path.exists():
         return []
     
-    with open(path, 'r', encoding='utf-8', errors='ignore') as f:
-        lines = f.readlines()
-        return [line.strip() for line in lines[-num_lines:]]
+    # Read backward from the end; only the last N lines are read
+    block, spans = read_tail(str(path), num_lines)
+    return [block.decode(start, end) for start, end in spans]
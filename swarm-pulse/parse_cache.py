@@ -0,0 +1,177 @@
+"""
+Persistent Cache of Parsed Log Events
+
+Saves the columnar events parsed from a log file to disk (one .npz of raw
+columns per file), so that a restarted dashboard loads them instantly and
+only parses what was appended since. An entry is keyed by the file's device and
+inode and stores the file size, mtime and hashes of its first bytes and of
+the bytes just before the parsed offset. It is reused only while the file
+still looks like the one that was parsed: same identity, not shrunk below
+the offset, and unchanged fingerprints (or unchanged size and mtime).
+
+Entries of deleted or rotated-away files are never looked up again, so
+each save evicts the least recently used entries once the directory grows
+beyond max_bytes.
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Tuple
+
+import numpy as np
+
+from event_store import EventStore
+
+
+@dataclass
+class CachedParse:
+    store: EventStore
+    offset: int
+    pending_gradient: Optional[float]
+    file_id: Tuple[int, int]
+    head: bytes
+
+
+class ParseCache:
+    """Directory of parsed-event snapshots, one per log file"""
+
+    # Bytes hashed at the start of the file and before the parsed offset
+    FINGERPRINT_BYTES = 256
+
+    # Bump when the layout of cache entries changes
+    FORMAT_VERSION = 2
+
+    # Default size of the entries kept in one directory
+    MAX_BYTES = 1 << 30
+
+    def __init__(self, directory: str, max_bytes: int = MAX_BYTES):
+        """
+        Initialize cache
+
+        Args:
+            directory: Where cache entries are kept (created on first save)
+            max_bytes: Total size of entries kept in the directory; the least
+                recently used ones are evicted beyond it
+        """
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+
+    def child(self, name: str) -> 'ParseCache':
+        """Return a cache kept in a subdirectory, for entries of another kind"""
+        return ParseCache(self.directory / name, self.max_bytes)
+
+    def load(self, filepath: str) -> Optional[CachedParse]:
+        """
+        Return the cached parse of filepath, or None if there is no usable entry
+
+        Args:
+            filepath: Path to log file
+        """
+        try:
+            stat = os.stat(filepath)
+            path = self._entry_path(stat)
+            with np.load(path, allow_pickle=False) as entry:
+                meta = json.loads(str(entry['meta']))
+                if meta.get('version') != self.FORMAT_VERSION:
+                    return None
+                if not self._matches(filepath, stat, meta):
+                    return None
+                store = EventStore.from_arrays(entry)
+            with open(filepath, 'rb') as f:
+                head = f.read(self.FINGERPRINT_BYTES)
+        except (OSError, ValueError, KeyError):
+            # Missing, unreadable or corrupt entries are simply re-parsed
+            return None
+        self._touch(path)
+
+        return CachedParse(
+            store=store,
+            offset=meta['offset'],
+            pending_gradient=meta['pending_gradient'],
+            file_id=(stat.st_dev, stat.st_ino),
+            head=head
+        )
+
+    def save(self, filepath: str, store: EventStore, offset: int,
+             pending_gradient: Optional[float]) -> None:
+        """
+        Write the parse of filepath up to offset
+
+        Args:
+            filepath: Path to log file
+            store: Events parsed from bytes [0, offset)
+            offset: Byte offset where parsing stopped
+            pending_gradient: Gradient norm not yet paired with a policy update
+        """
+        stat = os.stat(filepath)
+        head, tail = self._fingerprints(filepath, offset)
+        meta = {
+            'version': self.FORMAT_VERSION,
+            'source': str(filepath),
+            'size': stat.st_size,
+            'mtime_ns': stat.st_mtime_ns,
+            'offset': offset,
+            'head': head,
+            'tail': tail,
+            'pending_gradient': pending_gradient,
+        }
+
+        self.directory.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(stat)
+        temp_path = path.with_suffix('.tmp')
+        # Write then rename, so a crash never leaves a half-written entry
+        with open(temp_path, 'wb') as f:
+            np.savez(f, meta=np.array(json.dumps(meta)), **store.to_arrays())
+        os.replace(temp_path, path)
+        self._evict(keep=path)
+
+    def _touch(self, path: Path) -> None:
+        """Mark an entry as used, so eviction keeps it longer"""
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+
+    def _evict(self, keep: Path) -> None:
+        """Remove the least recently used entries beyond max_bytes"""
+        entries = []
+        for path in self.directory.glob('*.npz'):
+            try:
+                stat = path.stat()
+            except OSError:
+                # Evicted by another process
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = 0
+        for _, size, path in sorted(entries, reverse=True):
+            total += size
+            if total > self.max_bytes and path != keep:
+                try:
+                    path.unlink()
+                except OSError:
+                    pass
+
+    def _entry_path(self, stat: os.stat_result) -> Path:
+        return self.directory / f"{stat.st_dev:x}-{stat.st_ino:x}.npz"
+
+    def _matches(self, filepath: str, stat: os.stat_result, meta: dict) -> bool:
+        """Check that the file still starts with the bytes that were parsed"""
+        if stat.st_size < meta['offset']:
+            return False
+        if stat.st_size == meta['size'] and stat.st_mtime_ns == meta['mtime_ns']:
+            return True
+        # Appended to, or rewritten: compare the parsed bytes' fingerprints
+        return self._fingerprints(filepath, meta['offset']) == (meta['head'], meta['tail'])
+
+    def _fingerprints(self, filepath: str, offset: int) -> Tuple[str, str]:
+        """Hash the first bytes of the file and the bytes just before offset"""
+        with open(filepath, 'rb') as f:
+            head = f.read(min(self.FINGERPRINT_BYTES, offset))
+            start = max(0, offset - self.FINGERPRINT_BYTES)
+            f.seek(start)
+            tail = f.read(offset - start)
+        return hashlib.sha1(head).hexdigest(), hashlib.sha1(tail).hexdigest()
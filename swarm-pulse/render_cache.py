@@ -0,0 +1,72 @@
+"""
+Versioned Memoization of Rendered Results
+
+Keeps chart figures, health metrics and stats computed from the event
+tables, so that a dashboard refresh without new events reuses them
+instead of rebuilding them. Every entry records the versions of the
+tables it was built from (see EventTable.version, which is unique per
+change across all stores); a lookup with other versions rebuilds the
+entry, so only results whose tables got new rows are recomputed. The
+cache holds a bounded number of entries and evicts the least recently
+used one first.
+"""
+
+import threading
+from collections import OrderedDict
+from typing import Callable, Hashable, Tuple, TypeVar
+
+
+T = TypeVar('T')
+
+
+class VersionedCache:
+    """Bounded LRU cache of values tied to the versions of their inputs"""
+
+    def __init__(self, max_entries: int = 64):
+        """
+        Initialize empty cache
+
+        Args:
+            max_entries: Most results kept; the least recently used go first
+        """
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._entries: 'OrderedDict[Hashable, Tuple[Hashable, object]]' = OrderedDict()
+        # Shared by every dashboard session of the process
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: Hashable, build: Callable[[], T]) -> T:
+        """
+        Return the value cached under key, rebuilding it if version changed
+
+        Args:
+            key: What is built, e.g. (source, window, "loss chart")
+            version: Versions of the inputs, e.g. a tuple of table versions
+            build: Computes the value; called without the lock held
+
+        Returns:
+            The cached or newly built value (shared: do not modify it)
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == version:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+
+        value = build()
+        with self._lock:
+            self._entries[key] = (version, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return value
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
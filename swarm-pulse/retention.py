@@ -0,0 +1,165 @@
+"""
+Tiered Aggregates for Long-Running Monitoring
+
+Long-running monitors keep recent events at full resolution and fold older
+values into per-minute buckets. When a tier is full its oldest bucket rolls
+up into the next coarser tier (minute -> hour -> day), so memory stays
+bounded while long-horizon trends and totals survive.
+
+swarm-pulse-cli/monitor.py keeps its long-term loss and reward series
+in TieredSeries, without NumPy or pandas installed.
+"""
+
+import math
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Tuple
+
+
+# (name, bucket width in seconds), finest first
+TIERS = (
+    ('minute', 60),
+    ('hour', 3600),
+    ('day', 86400),
+)
+
+# Buckets kept per tier before the oldest rolls up: one day of minutes,
+# 30 days of hours and ten years of days
+TIER_LIMITS = (1440, 720, 3650)
+
+
+@dataclass
+class Bucket:
+    """Summary of the values that fell into one time bucket"""
+    count: int = 0
+    sum: float = 0.0
+    min: float = math.inf
+    max: float = -math.inf
+    last: float = math.nan
+
+    @property
+    def mean(self) -> float:
+        return self.sum / self.count if self.count else math.nan
+
+    def add(self, value: float) -> None:
+        self.count += 1
+        self.sum += value
+        self.min = min(self.min, value)
+        self.max = max(self.max, value)
+        self.last = value
+
+    def merge(self, other: 'Bucket') -> None:
+        """Fold in another bucket holding later values"""
+        if not other.count:
+            return
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.last = other.last
+
+    def to_list(self) -> list:
+        return [self.count, self.sum, self.min, self.max, self.last]
+
+
+class TieredSeries:
+    """Minute/hour/day aggregates of one numeric series"""
+
+    def __init__(self, limits: Sequence[int] = TIER_LIMITS):
+        """
+        Initialize empty series
+
+        Args:
+            limits: Maximum number of buckets per tier, finest first
+        """
+        self.limits = tuple(limits)
+        self.tiers: List[Dict[int, Bucket]] = [{} for _ in TIERS]
+
+    def add(self, timestamp: int, value: float) -> None:
+        """
+        Add one value
+
+        Args:
+            timestamp: Epoch seconds of the value
+            value: The value (NaN is ignored)
+        """
+        if value != value:
+            return
+        bucket = Bucket()
+        bucket.add(value)
+        self.add_bucket(timestamp, bucket)
+
+    def add_bucket(self, timestamp: int, bucket: Bucket) -> None:
+        """
+        Add values already summarized into a bucket
+
+        Args:
+            timestamp: Epoch seconds inside the bucket's minute
+            bucket: Summary of values from that minute
+        """
+        self._merge(0, timestamp, bucket)
+
+    def _merge(self, level: int, timestamp: int, bucket: Bucket) -> None:
+        """Merge bucket into a tier, rolling the oldest bucket up when full"""
+        _, width = TIERS[level]
+        start = timestamp - timestamp % width
+        tier = self.tiers[level]
+        if start in tier:
+            tier[start].merge(bucket)
+        else:
+            tier[start] = Bucket(*bucket.to_list())
+
+        while len(tier) > self.limits[level]:
+            oldest = min(tier)
+            expired = tier.pop(oldest)
+            if level + 1 < len(TIERS):
+                self._merge(level + 1, oldest, expired)
+
+    def buckets(self) -> List[Tuple[str, int, Bucket]]:
+        """Return (tier name, bucket start, bucket) for all tiers, oldest first"""
+        rows = [
+            (name, start, bucket)
+            for (name, _), tier in zip(TIERS, self.tiers)
+            for start, bucket in tier.items()
+        ]
+        return sorted(rows, key=lambda row: row[1])
+
+    def rollup(self, width: int) -> List[Tuple[int, Bucket]]:
+        """
+        Merge buckets into coarser (start, bucket) pairs, oldest first
+
+        Args:
+            width: Seconds per output bucket; buckets of coarser tiers
+                keep their own start
+        """
+        merged: Dict[int, Bucket] = {}
+        for _, start, bucket in self.buckets():
+            start -= start % width
+            if start not in merged:
+                merged[start] = Bucket()
+            merged[start].merge(bucket)
+        return list(merged.items())
+
+    def total(self) -> Bucket:
+        """Summary of every value ever added"""
+        total = Bucket()
+        for _, _, bucket in self.buckets():
+            total.merge(bucket)
+        return total
+
+    def to_state(self) -> dict:
+        """JSON-compatible form (see from_state)"""
+        return {
+            'limits': list(self.limits),
+            'tiers': [
+                [[start] + bucket.to_list() for start, bucket in tier.items()]
+                for tier in self.tiers
+            ],
+        }
+
+    @classmethod
+    def from_state(cls, state: dict) -> 'TieredSeries':
+        series = cls(state['limits'])
+        for tier, rows in zip(series.tiers, state['tiers']):
+            for start, *values in rows:
+                tier[start] = Bucket(*values)
+        return series
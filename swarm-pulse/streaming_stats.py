@@ -0,0 +1,466 @@
+"""
+Streaming Statistics of Node Metrics
+
+Trend figures that are updated event by event with bounded memory, so
+they never need a pass over the history:
+
+- EWMA: exponentially weighted moving average over the latest events
+- QuantileSketch: approximate quantiles in the style of KLL (levels of
+  sorted compactors, each item at level h standing for 2**h values).
+  Sketches can be merged, which is how windows are answered
+- RollingWindow: count, mean, min, max and quantiles over the last hour,
+  day, week, ... kept as a ring of time buckets, each a small sketch
+
+StreamingStats tracks loss, reward amount, rank percentile, diversity
+and rollout steps this way. Windows end at the newest event seen rather
+than the wall clock (like the dashboard's time ranges) and are as precise
+as their bucket width. retained_windows caps them at the retention
+horizon of the parser feeding the stats.
+
+Columns of events (a whole log on load) are added in bulk: they are
+sorted by time once, each bucket's sketch is built from a slice, and
+only the events that fall inside a window reach it. add() is for single
+events.
+"""
+
+import math
+import operator
+import random
+from bisect import bisect_left
+from collections import deque
+from itertools import compress
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+
+# Window label -> (seconds covered, seconds per bucket)
+WINDOWS = {
+    '1h': (3600, 60),
+    '24h': (86400, 900),
+    '7d': (7 * 86400, 3600),
+}
+
+# Compaction choices of sketches without a seed
+_RANDOM = random.Random()
+
+# Metrics tracked by StreamingStats
+METRICS = ('loss', 'reward', 'rank_percentile', 'diversity', 'steps')
+
+
+class EWMA:
+    """Exponentially weighted moving average, like pandas' ewm(span=...).mean()"""
+
+    def __init__(self, span: float = 20):
+        """
+        Args:
+            span: Number of events that make up most of the average
+        """
+        self.alpha = 2 / (span + 1)
+        self.value: Optional[float] = None
+
+    def add(self, value: float) -> None:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value += self.alpha * (value - self.value)
+
+    def extend(self, values: List[float]) -> None:
+        """Add many values in order"""
+        # Older values weigh less than 2**-60 and no longer change the average
+        if self.alpha < 1:
+            horizon = math.ceil(60 * math.log(2) / -math.log(1 - self.alpha))
+            values = values[-horizon:]
+        for value in values:
+            self.add(value)
+
+
+class QuantileSketch:
+    """Mergeable approximate quantiles in O(k log(n / k)) memory"""
+
+    def __init__(self, k: int = 200, seed: Optional[int] = None):
+        """
+        Initialize empty sketch
+
+        Args:
+            k: Size of the top compactor; the rank error is about 1.7 / k
+            seed: Seed for the random choices of compaction (for repeatable
+                results)
+        """
+        self.k = k
+        self.count = 0
+        self.sum = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+        # levels[h] holds items standing for 2**h values each
+        self.levels: List[List[float]] = [[]]
+        self._capacities = [self._capacity(0)]
+        # Seeding a generator costs more than a small sketch, so unseeded
+        # sketches share one
+        self._random = random.Random(seed) if seed is not None else _RANDOM
+        self._sorted: Optional[Tuple[List[float], List[int]]] = None
+
+    def __len__(self) -> int:
+        return self.count
+
+    @property
+    def mean(self) -> Optional[float]:
+        return self.sum / self.count if self.count else None
+
+    def add(self, value: float) -> None:
+        level = self.levels[0]
+        level.append(value)
+        self.count += 1
+        self.sum += value
+        if value < self.min:
+            self.min = value
+        if value > self.max:
+            self.max = value
+        self._sorted = None
+        if len(level) >= self._capacities[0]:
+            self._compress()
+
+    def extend(self, values: List[float]) -> None:
+        """Add many values at once (sorted and compacted a level at a time)"""
+        if not values:
+            return
+        self.levels[0].extend(values)
+        self.count += len(values)
+        self.sum += sum(values)
+        self.min = min(self.min, min(values))
+        self.max = max(self.max, max(values))
+        self._sorted = None
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch') -> None:
+        """Fold in the values summarized by another sketch"""
+        if not other.count:
+            return
+        while len(self.levels) < len(other.levels):
+            self._add_level()
+        for level, items in enumerate(other.levels):
+            self.levels[level].extend(items)
+        self.count += other.count
+        self.sum += other.sum
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self._sorted = None
+        self._compress()
+
+    def quantile(self, q: float) -> Optional[float]:
+        """
+        Return the approximate q-quantile
+
+        Args:
+            q: Between 0 and 1 (0.5 for the median)
+
+        Returns:
+            A value seen by the sketch, or None if it is empty
+        """
+        if not self.count:
+            return None
+        if q <= 0:
+            return self.min
+        if q >= 1:
+            return self.max
+        if self._sorted is None:
+            weighted = sorted(
+                (value, 1 << level)
+                for level, items in enumerate(self.levels)
+                for value in items
+            )
+            values, cumulative, total = [], [], 0
+            for value, weight in weighted:
+                total += weight
+                values.append(value)
+                cumulative.append(total)
+            self._sorted = (values, cumulative)
+        values, cumulative = self._sorted
+        position = bisect_left(cumulative, q * cumulative[-1])
+        return values[min(position, len(values) - 1)]
+
+    def _capacity(self, level: int) -> int:
+        """Items a level may hold; lower levels get geometrically less room"""
+        depth = len(self.levels) - level - 1
+        return max(2, math.ceil(self.k * (2 / 3) ** depth))
+
+    def _compress(self) -> None:
+        """Halve full levels, promoting every other sorted item one level up"""
+        level = 0
+        while level < len(self.levels):
+            items = self.levels[level]
+            if len(items) >= self._capacities[level]:
+                if level + 1 == len(self.levels):
+                    self._add_level()
+                items.sort()
+                # An odd one out stays behind
+                kept = [items.pop()] if len(items) % 2 else []
+                offset = self._random.getrandbits(1)
+                self.levels[level + 1].extend(items[offset::2])
+                self.levels[level] = kept
+            level += 1
+
+    def _add_level(self) -> None:
+        self.levels.append([])
+        self._capacities = [self._capacity(level) for level in range(len(self.levels))]
+
+
+class RollingWindow:
+    """Summary of the values of the last window seconds"""
+
+    # Sketch size per bucket (buckets are merged to answer quantiles)
+    BUCKET_SKETCH_K = 64
+
+    def __init__(self, seconds: int, bucket_seconds: int):
+        """
+        Initialize empty window
+
+        Args:
+            seconds: Length of the window
+            bucket_seconds: Granularity at which values expire
+        """
+        self.seconds = seconds
+        self.bucket_seconds = bucket_seconds
+        # (bucket start, sketch), oldest first
+        self.buckets: deque = deque()
+        self.latest: Optional[int] = None
+
+    def add(self, timestamp: int, value: float) -> None:
+        start = timestamp - timestamp % self.bucket_seconds
+        if self.latest is None or timestamp > self.latest:
+            self.latest = timestamp
+        if not self.buckets or start > self.buckets[-1][0]:
+            self.buckets.append((start, QuantileSketch(self.BUCKET_SKETCH_K)))
+            self._expire()
+            sketch = self.buckets[-1][1]
+        else:
+            # Out of order: the newest bucket not after it (or drop it if it
+            # is already outside the window)
+            sketch = next((s for b, s in reversed(self.buckets) if b <= start), None)
+            if sketch is None:
+                return
+        sketch.add(value)
+
+    def extend(self, timestamps: List[int], values: List[float]) -> None:
+        """
+        Add many values at once
+
+        Args:
+            timestamps: Ascending epoch seconds
+            values: Value at each timestamp
+        """
+        if not timestamps:
+            return
+        if self.latest is None or timestamps[-1] > self.latest:
+            self.latest = timestamps[-1]
+        # Events in buckets that have expired already are never looked at
+        cutoff = self.latest - self.seconds
+        position = bisect_left(timestamps, cutoff - cutoff % self.bucket_seconds)
+        while position < len(timestamps):
+            timestamp = timestamps[position]
+            start = timestamp - timestamp % self.bucket_seconds
+            end = bisect_left(timestamps, start + self.bucket_seconds, position)
+            if not self.buckets or start > self.buckets[-1][0]:
+                self.buckets.append((start, QuantileSketch(self.BUCKET_SKETCH_K)))
+                sketch = self.buckets[-1][1]
+            else:
+                sketch = next((s for b, s in reversed(self.buckets) if b <= start), None)
+            if sketch is not None:
+                sketch.extend(values[position:end])
+            position = end
+        self._expire()
+
+    def sketch(self) -> QuantileSketch:
+        """Quantile sketch (with count, sum, min and max) of the values in the window"""
+        self._expire()
+        merged = QuantileSketch(self.BUCKET_SKETCH_K * 4, seed=0)
+        for _, sketch in self.buckets:
+            merged.merge(sketch)
+        return merged
+
+    def _expire(self) -> None:
+        if self.latest is None:
+            return
+        cutoff = self.latest - self.seconds
+        while self.buckets and self.buckets[0][0] + self.bucket_seconds <= cutoff:
+            self.buckets.popleft()
+
+
+class MetricStats:
+    """EWMA, all-time quantiles and rolling windows of one metric"""
+
+    def __init__(self, windows: Dict[str, Tuple[int, int]] = WINDOWS, span: float = 20):
+        self.ewma = EWMA(span)
+        self.sketch = QuantileSketch(seed=0)
+        self.windows = {
+            label: RollingWindow(seconds, bucket_seconds)
+            for label, (seconds, bucket_seconds) in windows.items()
+        }
+
+    def add(self, timestamp: int, value: float) -> None:
+        self.ewma.add(value)
+        self.sketch.add(value)
+        for window in self.windows.values():
+            window.add(timestamp, value)
+
+    def extend(self, timestamps: List[int], values: List[float]) -> None:
+        """Add many values at once (in the order they were logged)"""
+        if not values:
+            return
+        self.ewma.extend(values)
+        self.sketch.extend(values)
+        # Log order is time order, except for the odd line written late
+        if timestamps != sorted(timestamps):
+            timestamps, values = _columns(sorted(zip(timestamps, values)))
+        for window in self.windows.values():
+            window.extend(timestamps, values)
+
+    def summary(self, quantiles: Iterable[float] = (0.5, 0.95)) -> Dict[str, Any]:
+        """
+        Return the metric's statistics
+
+        Returns:
+            {'count', 'ewma', 'p50', 'p95', ..., 'windows': {label:
+            {'count', 'mean', 'min', 'max', 'p50', 'p95', ...}}}, with
+            None where there are no values
+        """
+        quantiles = tuple(quantiles)
+        result = {'count': self.sketch.count, 'ewma': self.ewma.value}
+        result.update(_quantiles(self.sketch, quantiles))
+        result['windows'] = {}
+        for label, window in self.windows.items():
+            sketch = window.sketch()
+            stats = {
+                'count': sketch.count,
+                'mean': sketch.mean,
+                'min': sketch.min if sketch.count else None,
+                'max': sketch.max if sketch.count else None,
+            }
+            stats.update(_quantiles(sketch, quantiles))
+            result['windows'][label] = stats
+        return result
+
+
+class StreamingStats:
+    """Rolling statistics of a node's metrics, fed event by event"""
+
+    def __init__(self, windows: Dict[str, Tuple[int, int]] = WINDOWS, span: float = 20):
+        """
+        Initialize empty statistics
+
+        Args:
+            windows: Label -> (seconds, bucket seconds) of rolling windows
+            span: Events covered by each metric's EWMA
+        """
+        self.metrics = {name: MetricStats(windows, span) for name in METRICS}
+
+    def add(self, metric: str, timestamp: int, value: float) -> None:
+        self.metrics[metric].add(timestamp, value)
+
+    def add_policy_update(self, timestamp: int, loss: float) -> None:
+        self.metrics['loss'].add(timestamp, loss)
+
+    def add_reward(self, timestamp: int, amount: float, rank: Optional[int] = None,
+                   total_solvers: Optional[int] = None) -> None:
+        self.metrics['reward'].add(timestamp, amount)
+        if rank is not None and total_solvers:
+            self.metrics['rank_percentile'].add(timestamp, (1 - (rank - 1) / total_solvers) * 100)
+
+    def add_rollout(self, timestamp: int, diversity_score: Optional[float] = None,
+                    steps: Optional[int] = None) -> None:
+        """Add one rollout (missing scores or steps, as None, NaN or negative, are skipped)"""
+        if diversity_score is not None and not math.isnan(diversity_score):
+            self.metrics['diversity'].add(timestamp, diversity_score)
+        if steps is not None and steps >= 0:
+            self.metrics['steps'].add(timestamp, steps)
+
+    def add_policy_updates(self, timestamps: Iterable[int], losses: Iterable[float]) -> None:
+        """Add policy updates given as columns"""
+        self.metrics['loss'].extend(_values(timestamps), _values(losses))
+
+    def add_rewards(self, timestamps: Iterable[int], amounts: Iterable[float],
+                    ranks: Iterable[int], total_solvers: Iterable[int]) -> None:
+        """Add rewards given as columns"""
+        timestamps = _values(timestamps)
+        self.metrics['reward'].extend(timestamps, _values(amounts))
+        ranks, total_solvers = _values(ranks), _values(total_solvers)
+        # Rewards without a ranking have no percentile
+        ranked = list(map(bool, total_solvers))
+        timestamps, ranks, total_solvers = _select(ranked, timestamps, ranks, total_solvers)
+        percentiles = [(1 - (rank - 1) / solvers) * 100 for rank, solvers in zip(ranks, total_solvers)]
+        self.metrics['rank_percentile'].extend(timestamps, percentiles)
+
+    def add_rollouts(self, timestamps: Iterable[int], diversity_scores: Iterable[float],
+                     steps: Iterable[int]) -> None:
+        """Add rollouts given as columns (missing scores as NaN, missing steps as negative)"""
+        timestamps = _values(timestamps)
+        diversity_scores, steps = _values(diversity_scores), _values(steps)
+        scored = list(map(operator.not_, map(math.isnan, diversity_scores)))
+        self.metrics['diversity'].extend(*_select(scored, timestamps, diversity_scores))
+        counted = list(map((0).__le__, steps))
+        self.metrics['steps'].extend(*_select(counted, timestamps, steps))
+
+    def quantile(self, metric: str, q: float, window: Optional[str] = None) -> Optional[float]:
+        """
+        Return the approximate q-quantile of a metric
+
+        Args:
+            metric: One of METRICS
+            q: Between 0 and 1
+            window: Label of a rolling window (default: all events)
+        """
+        stats = self.metrics[metric]
+        sketch = stats.sketch if window is None else stats.windows[window].sketch()
+        return sketch.quantile(q)
+
+    def summary(self) -> Dict[str, Dict[str, Any]]:
+        """Return MetricStats.summary() per metric"""
+        return {name: stats.summary() for name, stats in self.metrics.items()}
+
+
+def retained_windows(retention_hours: float,
+                     windows: Dict[str, Tuple[int, int]] = WINDOWS) -> Dict[str, Tuple[int, int]]:
+    """
+    Cap windows at the retention horizon of a log parser
+
+    Events older than the horizon are compacted into aggregates before the
+    stats are fed (see LogParser retention_hours), so a longer window
+    would only ever cover the horizon. Such windows are replaced by one
+    window spanning the horizon, labelled with it (e.g. '48h').
+
+    Args:
+        retention_hours: Retention of the parser feeding the stats (0: none)
+        windows: Label -> (seconds, bucket seconds)
+
+    Returns:
+        The windows that fit, plus the horizon window if any were dropped
+    """
+    if not retention_hours:
+        return dict(windows)
+    horizon = int(retention_hours * 3600)
+    kept = {label: window for label, window in windows.items() if window[0] <= horizon}
+    if len(kept) < len(windows) and horizon > max((seconds for seconds, _ in kept.values()), default=0):
+        # As fine as the longest window kept (or the shortest dropped one)
+        bucket_seconds = max(kept.values())[1] if kept else min(windows.values())[1]
+        kept[f'{retention_hours:g}h'] = (horizon, bucket_seconds)
+    return kept
+
+
+def _quantiles(sketch: QuantileSketch, quantiles: Tuple[float, ...]) -> Dict[str, Optional[float]]:
+    return {f"p{q * 100:g}": sketch.quantile(q) for q in quantiles}
+
+
+def _values(column: Iterable) -> List:
+    """Python numbers of a column (NumPy arrays are converted in one go)"""
+    return column.tolist() if hasattr(column, 'tolist') else list(column)
+
+
+def _select(keep: List[bool], *columns: List) -> Tuple[List, ...]:
+    """Rows of columns where keep is true"""
+    if all(keep):
+        return columns
+    return tuple(list(compress(column, keep)) for column in columns)
+
+
+def _columns(rows: Iterable[Tuple[int, float]]) -> Tuple[List[int], List[float]]:
+    """Split (timestamp, value) rows into a timestamp and a value list"""
+    rows = list(rows)
+    return ([row[0] for row in rows], [row[1] for row in rows])
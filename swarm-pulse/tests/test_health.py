@@ -0,0 +1,32 @@
+"""
+Tests for HealthAggregator fed from a compacted EventStore
+
+Averages must cover every event since the start of the log, not only the
+rows the retention window still holds.
+"""
+
+import pytest
+
+from event_store import EventStore
+from health import HealthAggregator
+
+
+def test_rank_percentile_survives_compaction():
+    store = EventStore()
+    ranks = [1, 5, 10, 2, 8, 3]
+    for number, rank in enumerate(ranks):
+        store['rewards'].append(number * 3600, 1.0, rank, 10, -1)
+    # Compacts the first four rewards into history
+    store.compact(4 * 3600)
+    assert len(store['rewards']) == 2
+
+    health = HealthAggregator()
+    for column, series in store.history.items():
+        total = series.total()
+        health.add_history(column, total.count, total.sum)
+    kept = store['rewards']
+    health.add_rewards(kept.column('amount'), kept.column('rank'), kept.column('total_solvers'))
+
+    expected = sum((1 - (rank - 1) / 10) * 100 for rank in ranks) / len(ranks)
+    assert health.avg_rank_percentile == pytest.approx(expected)
+    assert health.reward_total == len(ranks)
@@ -0,0 +1,66 @@
+"""
+Tests for IngestService
+
+The background thread must outlive a failing refresh: the error is
+reported on the snapshot, and once the cause goes away the lines that
+failed are read exactly once.
+"""
+
+import threading
+import time
+
+from ingest_service import IngestService
+from log_parser import LogParser
+
+
+def policy_update(epoch: int) -> str:
+    return f'[2025-11-22 14:0{epoch}:00] INFO: Policy update received (epoch={epoch}, loss=0.04)\n'
+
+
+def wait_for(condition, timeout: float = 5.0) -> bool:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if condition():
+            return True
+        time.sleep(0.02)
+    return False
+
+
+def test_parse_error_does_not_stop_refreshes(tmp_path, monkeypatch):
+    path = tmp_path / 'node.log'
+    path.write_text(policy_update(1))
+
+    broken = threading.Event()
+    parse_line = LogParser.parse_line
+
+    def failing_parse_line(self, line):
+        if broken.is_set() and 'epoch=3' in line:
+            raise ValueError('unexpected line')
+        parse_line(self, line)
+
+    monkeypatch.setattr(LogParser, 'parse_line', failing_parse_line)
+
+    service = IngestService(str(path), interval=0.05, use_inotify=False)
+    service.start()
+    try:
+        broken.set()
+        with open(path, 'a') as f:
+            f.write(policy_update(2) + policy_update(3))
+
+        assert wait_for(lambda: service.snapshot().error is not None)
+        assert 'unexpected line' in service.snapshot().error
+        assert service.is_running
+        # Nothing from the failed refresh was published
+        assert service.snapshot().frames['policy_updates']['epoch'].tolist() == [1]
+
+        broken.clear()
+        assert wait_for(lambda: service.snapshot().error is None)
+        with open(path, 'a') as f:
+            f.write(policy_update(4))
+        assert wait_for(
+            lambda: len(service.snapshot().frames['policy_updates']) == 4
+        )
+        assert service.snapshot().frames['policy_updates']['epoch'].tolist() == [1, 2, 3, 4]
+        assert service.is_running
+    finally:
+        service.stop()
@@ -0,0 +1,56 @@
+"""
+Tests for the block reader
+
+iter_text switches between decoding whole windows and decoding only the
+keyword lines; either way no keyword line may be lost, split or reordered.
+"""
+
+import pytest
+
+from log_reader import LineBuffer, file_blocks
+
+
+KEYWORDS = (b'Reward received', b'Policy update')
+
+
+def make_log(every: int, count: int = 3000) -> bytes:
+    """Log where every every-th line holds a keyword"""
+    lines = []
+    for number in range(count):
+        if number % every == 0:
+            keyword = KEYWORDS[number // every % 2].decode()
+            lines.append(f'[2025-11-22 14:00:00] INFO: {keyword} line={number}')
+        else:
+            lines.append(f'[2025-11-22 14:00:00] DEBUG: heartbeat ok line={number}')
+    return ('\n'.join(lines) + '\n').encode()
+
+
+@pytest.mark.parametrize('every', [1, 2, 10, 500])
+def test_iter_text_yields_every_keyword_line(monkeypatch, every):
+    # Small windows, so a buffer spans many of them
+    monkeypatch.setattr(LineBuffer, 'SCAN_BYTES', 4096)
+    monkeypatch.setattr(LineBuffer, 'SAMPLE_BYTES', 1024)
+    data = make_log(every)
+    block = LineBuffer(data)
+
+    lines = [line for line in block.iter_text(keywords=KEYWORDS)
+             if any(keyword.decode() in line for keyword in KEYWORDS)]
+
+    expected = [line.decode() for line in data.splitlines()
+                if any(keyword in line for keyword in KEYWORDS)]
+    assert lines == expected
+    assert block.position == len(data)
+
+
+def test_file_blocks_end_on_line_boundaries(tmp_path):
+    path = tmp_path / 'node.log'
+    data = make_log(3)
+    path.write_bytes(data + b'[2025-11-22 14:00:00] INFO: Reward rec')
+
+    blocks = list(file_blocks(str(path), size=1000, complete_only=True))
+
+    assert b''.join(block.buffer for block in blocks) == data
+    assert all(block.buffer.endswith(b'\n') for block in blocks)
+    assert [block.base for block in blocks] == [
+        sum(len(block.buffer) for block in blocks[:i]) for i in range(len(blocks))
+    ]
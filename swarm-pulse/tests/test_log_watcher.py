@@ -0,0 +1,154 @@
+"""
+Rotation tests for LogWatcher
+
+A writer thread appends numbered lines while the log is rotated by
+rename + create, copytruncate and delete + recreate. Each scheme runs
+with inotify and with polling, and the watcher must deliver every line
+exactly once and in order.
+"""
+
+import os
+import shutil
+import threading
+import time
+
+import pytest
+
+from log_watcher import AsyncLogWatcher, LogWatcher
+
+
+ROUNDS = 3
+LINES_PER_ROUND = 200
+# Lines the application still writes to its old descriptor after a
+# rename or delete, before it reopens the path
+LATE_LINES = 20
+
+
+def write_lines(f, start: int, count: int) -> int:
+    for number in range(start, start + count):
+        f.write(f'line {number}\n')
+        f.flush()
+        if number % 50 == 0:
+            time.sleep(0.01)
+    return start + count
+
+
+def write_rotating_log(path: str, mode: str) -> int:
+    """Write numbered lines, rotating the log after each round; return the count"""
+    written = 0
+    f = open(path, 'a')
+    try:
+        for round_number in range(1, ROUNDS + 1):
+            written = write_lines(f, written, LINES_PER_ROUND)
+            time.sleep(0.2)
+            if mode == 'rename':
+                os.rename(path, f'{path}.{round_number}')
+                written = write_lines(f, written, LATE_LINES)
+                f.close()
+                f = open(path, 'a')
+            elif mode == 'delete':
+                os.unlink(path)
+                written = write_lines(f, written, LATE_LINES)
+                f.close()
+                f = open(path, 'a')
+            elif mode == 'copytruncate':
+                # Lines written since the watcher last read are only left
+                # in the copy
+                written = write_lines(f, written, LATE_LINES)
+                shutil.copyfile(path, f'{path}.{round_number}')
+                os.truncate(path, 0)
+                f.seek(0)
+            time.sleep(0.2)
+        written = write_lines(f, written, 10)
+    finally:
+        f.close()
+    return written
+
+
+@pytest.mark.parametrize('use_inotify', [True, False], ids=['inotify', 'polling'])
+@pytest.mark.parametrize('mode', ['rename', 'copytruncate', 'delete'])
+def test_rotation_keeps_every_line_once_in_order(tmp_path, mode, use_inotify):
+    path = str(tmp_path / 'node.log')
+    open(path, 'w').close()
+    watcher = LogWatcher(path, poll_interval=0.05, use_inotify=use_inotify)
+    received = []
+
+    def consume():
+        for line in watcher.watch_from_beginning():
+            received.append(line)
+
+    reader = threading.Thread(target=consume, daemon=True)
+    reader.start()
+    # Let the watcher open the file before it is first rotated
+    time.sleep(0.2)
+    written = write_rotating_log(path, mode)
+
+    deadline = time.monotonic() + 10
+    while len(received) < written and time.monotonic() < deadline:
+        time.sleep(0.05)
+    watcher.stop()
+    reader.join(timeout=5)
+
+    numbers = [int(line.split()[1]) for line in received]
+    assert numbers == list(range(written))
+
+
+def test_checkpoint_resumes_after_batch_left_unfinished(tmp_path):
+    path = tmp_path / 'node.log'
+    path.write_text(''.join(f'line {number}\n' for number in range(10)))
+    checkpoint = str(tmp_path / 'watcher.json')
+
+    watcher = LogWatcher(str(path), poll_interval=0.05, checkpoint_path=checkpoint)
+    lines = watcher.watch_from_beginning()
+    first = [next(lines) for _ in range(3)]
+    # Stop consuming partway through the batch holding all ten lines
+    lines.close()
+    assert first == ['line 0', 'line 1', 'line 2']
+
+    with open(path, 'a') as f:
+        f.write('line 10\n')
+    restarted = LogWatcher(str(path), poll_interval=0.05, checkpoint_path=checkpoint)
+    resumed = []
+    for line in restarted.watch():
+        resumed.append(line)
+        if line == 'line 10':
+            restarted.stop()
+
+    # The unfinished batch is delivered again, followed by the new line
+    assert resumed == [f'line {number}' for number in range(11)]
+
+
+def test_stop_does_not_overfill_a_blocking_queue(tmp_path):
+    path = tmp_path / 'node.log'
+    path.write_text(''.join(f'line {number}\n' for number in range(20)))
+    release = threading.Event()
+    handled = []
+
+    def slow_callback(line):
+        release.wait()
+        handled.append(line)
+
+    watcher = AsyncLogWatcher(str(path), slow_callback, poll_interval=0.05,
+                              from_beginning=True, use_inotify=False,
+                              queue_size=2, overflow='block')
+    watcher.start()
+    try:
+        # One line in the callback, two queued, the reader waiting for room
+        deadline = time.monotonic() + 5
+        while watcher.queued < 2 and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert watcher.queued == 2
+
+        stopper = threading.Thread(target=watcher.stop)
+        stopper.start()
+        # The reader gives up waiting once stopped
+        deadline = time.monotonic() + 5
+        while watcher.is_running() and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert not watcher.is_running()
+        assert watcher.queued <= 2
+    finally:
+        release.set()
+    stopper.join()
+
+    assert handled == [f'line {number}' for number in range(3)]
@@ -0,0 +1,37 @@
+"""
+Tests for ParseCache eviction
+
+Entries are keyed by inode, so those of deleted or rotated-away files are
+never loaded again; saving must keep the directory within max_bytes by
+dropping the least recently used entries.
+"""
+
+import os
+
+from event_store import EventStore
+from parse_cache import ParseCache
+
+
+def save_logs(cache: ParseCache, tmp_path, names):
+    for name in names:
+        path = tmp_path / name
+        path.write_text(f'[2025-11-22 14:00:00] INFO: {name}\n')
+        cache.save(str(path), EventStore(), path.stat().st_size, None)
+
+
+def test_save_evicts_least_recently_used_entries(tmp_path):
+    cache = ParseCache(str(tmp_path / 'cache'))
+    save_logs(cache, tmp_path, ['a.log'])
+    entry_bytes = sum(path.stat().st_size for path in cache.directory.glob('*.npz'))
+    cache.max_bytes = 2 * entry_bytes
+
+    save_logs(cache, tmp_path, ['b.log'])
+    # Make a.log the oldest entry, then use it so b.log is evicted instead
+    os.utime(cache._entry_path(os.stat(tmp_path / 'a.log')), ns=(0, 0))
+    assert cache.load(str(tmp_path / 'a.log')) is not None
+    save_logs(cache, tmp_path, ['c.log'])
+
+    assert len(list(cache.directory.glob('*.npz'))) == 2
+    assert cache.load(str(tmp_path / 'a.log')) is not None
+    assert cache.load(str(tmp_path / 'b.log')) is None
+    assert cache.load(str(tmp_path / 'c.log')) is not None
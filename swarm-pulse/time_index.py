@@ -0,0 +1,191 @@
+"""
+Sparse Timestamp Index for Log Files
+
+Maps log timestamps to byte offsets so a time window can be read without
+scanning the file. One entry is sampled per STRIDE bytes while a file is
+parsed; between entries (and for files without an index) offsets are found
+by binary search over the file, reading small blocks at each probe and
+relying on lines being written in timestamp order. Both can be restricted to lines containing given keywords
+(the event lines), so that unordered noise lines are ignored.
+"""
+
+import os
+import re
+from bisect import bisect_left
+from datetime import datetime
+from typing import List, Optional, Sequence, Tuple
+
+from event_store import to_epoch_seconds
+from log_reader import FileBlock, LineBuffer, line_start_after
+
+
+# Log line timestamp, e.g. [2025-11-22 14:15:00]
+TIMESTAMP_PATTERN = re.compile(rb'\[(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2})\]')
+
+
+class TimeIndex:
+    """Sorted (timestamp, byte offset) samples of one log file"""
+
+    # Bytes between index entries
+    STRIDE = 1024 * 1024
+
+    # Binary search stops once the candidate range is this small
+    SCAN_BYTES = 64 * 1024
+
+    def __init__(self, keywords: Optional[Sequence[bytes]] = None):
+        """
+        Initialize empty index
+
+        Args:
+            keywords: Only sample lines containing one of these
+        """
+        self.keywords = keywords
+        self.timestamps: List[int] = []
+        self.offsets: List[int] = []
+        # Where the next sample will be taken
+        self.next_sample = 0
+
+    def __len__(self) -> int:
+        return len(self.offsets)
+
+    def extend(self, log: LineBuffer, end: int) -> None:
+        """
+        Sample the byte range from the last indexed position up to end
+
+        Args:
+            log: A block of the file starting at log.base (the range
+                before the block has been sampled already)
+            end: Offset up to which the file has been read
+        """
+        base = log.base
+        position = max(self.next_sample, base) - base
+        end -= base
+        while position < end:
+            found = first_timestamp(log, position, end, self.keywords)
+            if found is None:
+                break
+            seconds, offset = found
+            # Keep entries monotonic; out-of-order lines are left to the search
+            if not self.timestamps or seconds >= self.timestamps[-1]:
+                self.timestamps.append(seconds)
+                self.offsets.append(base + offset)
+            position = offset + self.STRIDE
+        self.next_sample = base + position
+
+    def merge(self, other: 'TimeIndex') -> None:
+        """
+        Append the samples of a later part of the same file
+
+        Args:
+            other: Index built over a byte range after this one's
+        """
+        for seconds, offset in zip(other.timestamps, other.offsets):
+            if offset >= self.next_sample and (not self.timestamps or seconds >= self.timestamps[-1]):
+                self.timestamps.append(seconds)
+                self.offsets.append(offset)
+        self.next_sample = max(self.next_sample, other.next_sample)
+
+    def seek(self, filepath: str, seconds: int) -> Tuple[int, int]:
+        """
+        Find byte offsets that bracket the first line at or after a time
+
+        Args:
+            filepath: Path to the indexed file
+            seconds: Epoch seconds to look for
+
+        Returns:
+            (before, after): every line before `before` is older than
+            seconds and every line from `after` on is at least as new, so
+            [before, end) is a safe start and [start, after) a safe end
+        """
+        # Narrow to the indexed stride containing seconds
+        i = bisect_left(self.timestamps, seconds)
+        low = self.offsets[i - 1] if i > 0 else 0
+        high = self.offsets[i] if i < len(self.offsets) else None
+        return bisect_file(filepath, seconds, low, high, self.keywords)
+
+
+def first_timestamp(log: LineBuffer, position: int, end: int,
+                    keywords: Optional[Sequence[bytes]] = None) -> Optional[Tuple[int, int]]:
+    """
+    Find the first line starting at or after position that has a timestamp
+
+    Args:
+        log: Block of the file (offsets are relative to it)
+        position: Offset to start looking from
+        end: Offset to stop at
+        keywords: Only consider lines containing one of these
+
+    Returns:
+        (epoch seconds, line start offset), or None if there is none before end
+    """
+    if position > 0:
+        position = log.buffer.find(b'\n', position - 1, end) + 1
+        if position == 0:
+            return None
+    for line_start, line_end in log.iter_lines(position, end, keywords):
+        match = TIMESTAMP_PATTERN.search(log.buffer, line_start, line_end)
+        if match is not None:
+            return timestamp_seconds(match.group(1)), line_start
+    return None
+
+
+def read_timestamp(filepath: str, position: int, end: int,
+                   keywords: Optional[Sequence[bytes]] = None) -> Optional[Tuple[int, int]]:
+    """
+    first_timestamp for a file, read in blocks growing fourfold from position
+
+    Returns:
+        (epoch seconds, line start file offset), or None
+    """
+    read = TimeIndex.SCAN_BYTES
+    while True:
+        block = FileBlock(filepath, max(0, position - 1), min(end, position + read))
+        reached = block.base + len(block) >= min(end, block.size)
+        # Only whole lines count until the block reaches end
+        stop = len(block) if reached else block.buffer.rfind(b'\n') + 1
+        found = first_timestamp(block, position - block.base, stop, keywords)
+        if found is not None:
+            return found[0], block.base + found[1]
+        if reached:
+            return None
+        read *= 4
+
+
+def bisect_file(filepath: str, seconds: int, low: int = 0, high: Optional[int] = None,
+                keywords: Optional[Sequence[bytes]] = None) -> Tuple[int, int]:
+    """
+    Binary search a timestamp-ordered file for the first line at or after seconds
+
+    Args:
+        filepath: Path to file
+        seconds: Epoch seconds to look for
+        low: Line start known to precede the target (or 0)
+        high: Line start known to follow it (default: end of file)
+        keywords: Only consider lines containing one of these; other lines
+            are assumed to hold no events
+
+    Returns:
+        (before, after) as for TimeIndex.seek
+    """
+    with open(filepath, 'rb') as f:
+        high = os.fstat(f.fileno()).st_size if high is None else high
+        while high - low > TimeIndex.SCAN_BYTES:
+            middle = (low + high) // 2
+            # First line starting in [middle, high)
+            line = line_start_after(f, middle)
+            if line >= high:
+                break
+            found = read_timestamp(filepath, line, high, keywords)
+            if found is not None and found[0] < seconds:
+                low = found[1]
+            else:
+                # Lines skipped over by read_timestamp hold no events, so
+                # the bound can move back to the first line after middle
+                high = line
+    return low, high
+
+
+def timestamp_seconds(text: bytes) -> int:
+    """Convert a matched TIMESTAMP_PATTERN group to epoch seconds"""
+    return to_epoch_seconds(datetime.fromisoformat(text.decode('ascii')))
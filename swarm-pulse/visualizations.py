@@ -2,6 +2,11 @@
 Visualization Components for Swarm Pulse
 
 Creates interactive charts using Plotly to visualize CodeZero metrics.
+
+Series longer than max_points are downsampled before plotting (see
+downsample) and drawn with WebGL, so figures stay small and fast however
+long the node has been running. The points are picked from whatever
+window of data is passed in, so a narrower time range shows more detail.
 """
 
 import plotly.graph_objects as go
@@ -9,20 +14,27 @@ import plotly.express as px
 from plotly.subplots import make_subplots
 import pandas as pd
 from datetime import datetime
-from typing import List, Dict, Any
+from typing import Dict, Any, Optional
+
+from downsample import lttb, min_max
+from health import HealthAggregator
+
 
+# Points per series sent to the browser: about two per pixel of a wide chart
+MAX_CHART_POINTS = 2000
 
-def create_difficulty_chart(difficulty_changes: List[Dict]) -> go.Figure:
+
+def create_difficulty_chart(difficulty_changes: pd.DataFrame) -> go.Figure:
     """
     Create difficulty adjustment timeline chart
     
     Args:
-        difficulty_changes: List of difficulty change events
+        difficulty_changes: Difficulty change events
     
     Returns:
         Plotly figure
     """
-    if not difficulty_changes:
+    if difficulty_changes.empty:
         fig = go.Figure()
         fig.add_annotation(
             text="No difficulty changes recorded yet",
@@ -33,7 +45,7 @@ def create_difficulty_chart(difficulty_changes: List[Dict]) -> go.Figure:
         fig.update_layout(height=300)
         return fig
     
-    df = pd.DataFrame(difficulty_changes)
+    df = difficulty_changes
     
     # Create step chart
     fig = go.Figure()
@@ -62,17 +74,19 @@ def create_difficulty_chart(difficulty_changes: List[Dict]) -> go.Figure:
     return fig
 
 
-def create_loss_chart(policy_updates: List[Dict]) -> go.Figure:
+def create_loss_chart(policy_updates: pd.DataFrame,
+                      max_points: int = MAX_CHART_POINTS) -> go.Figure:
     """
     Create loss over time chart with trend line
     
     Args:
-        policy_updates: List of policy update events
+        policy_updates: Policy update events
+        max_points: Downsample the loss line (LTTB) beyond this many points
     
     Returns:
         Plotly figure
     """
-    if not policy_updates:
+    if policy_updates.empty:
         fig = go.Figure()
         fig.add_annotation(
             text="No policy updates recorded yet",
@@ -83,15 +97,26 @@ def create_loss_chart(policy_updates: List[Dict]) -> go.Figure:
         fig.update_layout(height=300)
         return fig
     
-    df = pd.DataFrame(policy_updates)
+    df = policy_updates
+    total = len(df)
+    max_loss = df['loss'].max()
+    
+    # Moving average over every update, then thinned with the loss line
+    loss_ma = df['loss'].rolling(window=5, min_periods=1).mean()
+    kept = lttb(df['timestamp'].to_numpy(), df['loss'].to_numpy(), max_points)
+    downsampled = len(kept) < total
+    if downsampled:
+        df = df.iloc[kept]
+        loss_ma = loss_ma.iloc[kept]
+    scatter = go.Scattergl if downsampled else go.Scatter
     
     fig = go.Figure()
     
     # Add loss line
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=df['epoch'],
         y=df['loss'],
-        mode='lines+markers',
+        mode='lines' if downsampled else 'lines+markers',
         name='Loss',
         line=dict(color='#FF6B6B', width=2),
         marker=dict(size=6),
@@ -99,11 +124,10 @@ def create_loss_chart(policy_updates: List[Dict]) -> go.Figure:
     ))
     
     # Add moving average if enough data
-    if len(df) >= 5:
-        df['loss_ma'] = df['loss'].rolling(window=5, min_periods=1).mean()
-        fig.add_trace(go.Scatter(
+    if total >= 5:
+        fig.add_trace(scatter(
             x=df['epoch'],
-            y=df['loss_ma'],
+            y=loss_ma,
             mode='lines',
             name='Moving Avg (5)',
             line=dict(color='#FFD93D', width=2, dash='dash'),
@@ -111,13 +135,12 @@ def create_loss_chart(policy_updates: List[Dict]) -> go.Figure:
         ))
     
     # Add colored zones
-    max_loss = df['loss'].max()
     fig.add_hrect(y0=0, y1=0.01, fillcolor="green", opacity=0.1, line_width=0)
     fig.add_hrect(y0=0.01, y1=0.05, fillcolor="yellow", opacity=0.1, line_width=0)
     fig.add_hrect(y0=0.05, y1=max_loss * 1.1, fillcolor="red", opacity=0.1, line_width=0)
     
     fig.update_layout(
-        title="Learning Progress (Loss Over Time)",
+        title=_title("Learning Progress (Loss Over Time)", len(df), total),
         xaxis_title="Epoch",
         yaxis_title="Loss",
         hovermode='x unified',
@@ -128,17 +151,20 @@ def create_loss_chart(policy_updates: List[Dict]) -> go.Figure:
     return fig
 
 
-def create_reward_chart(rewards: List[Dict]) -> go.Figure:
+def create_reward_chart(rewards: pd.DataFrame,
+                        max_points: int = MAX_CHART_POINTS) -> go.Figure:
     """
     Create reward distribution chart
     
     Args:
-        rewards: List of reward events
+        rewards: Reward events
+        max_points: Beyond this many rewards, only the smallest and
+            largest of each time bucket are drawn
     
     Returns:
         Plotly figure
     """
-    if not rewards:
+    if rewards.empty:
         fig = go.Figure()
         fig.add_annotation(
             text="No rewards recorded yet",
@@ -149,8 +175,15 @@ def create_reward_chart(rewards: List[Dict]) -> go.Figure:
         fig.update_layout(height=300)
         return fig
     
-    df = pd.DataFrame(rewards)
-    df['rank_percentile'] = (1 - (df['rank'] - 1) / df['total_solvers']) * 100
+    total = len(rewards)
+    kept = min_max(rewards['amount'].to_numpy(), max_points)
+    downsampled = len(kept) < total
+    if downsampled:
+        rewards = rewards.iloc[kept]
+    
+    df = rewards.assign(
+        rank_percentile=(1 - (rewards['rank'] - 1) / rewards['total_solvers']) * 100
+    )
     
     # Create subplot with secondary y-axis
     fig = make_subplots(specs=[[{"secondary_y": True}]])
@@ -168,12 +201,13 @@ def create_reward_chart(rewards: List[Dict]) -> go.Figure:
     )
     
     # Add rank percentile line
+    scatter = go.Scattergl if downsampled else go.Scatter
     fig.add_trace(
-        go.Scatter(
+        scatter(
             x=df['timestamp'],
             y=df['rank_percentile'],
             name='Rank Percentile',
-            mode='lines+markers',
+            mode='lines' if downsampled else 'lines+markers',
             line=dict(color='#FF6B6B', width=2),
             marker=dict(size=8),
             hovertemplate='<b>Rank: #%{customdata[0]}/%{customdata[1]}</b><br>Percentile: %{y:.1f}%<extra></extra>',
@@ -187,7 +221,7 @@ def create_reward_chart(rewards: List[Dict]) -> go.Figure:
     fig.update_yaxes(title_text="Rank Percentile (%)", secondary_y=True, range=[0, 100])
     
     fig.update_layout(
-        title="Reward Analysis",
+        title=_title("Reward Analysis", len(df), total),
         hovermode='x unified',
         height=350,
         template='plotly_dark'
@@ -196,17 +230,19 @@ def create_reward_chart(rewards: List[Dict]) -> go.Figure:
     return fig
 
 
-def create_diversity_chart(rollouts: List[Dict]) -> go.Figure:
+def create_diversity_chart(rollouts: pd.DataFrame,
+                           max_points: int = MAX_CHART_POINTS) -> go.Figure:
     """
     Create diversity score chart
     
     Args:
-        rollouts: List of rollout events
+        rollouts: Rollout events
+        max_points: Downsample the scores (LTTB) beyond this many points
     
     Returns:
         Plotly figure
     """
-    if not rollouts:
+    if rollouts.empty:
         fig = go.Figure()
         fig.add_annotation(
             text="No rollouts recorded yet",
@@ -217,12 +253,19 @@ def create_diversity_chart(rollouts: List[Dict]) -> go.Figure:
         fig.update_layout(height=300)
         return fig
     
-    df = pd.DataFrame(rollouts)
+    df = rollouts
+    total = len(df)
+    downsampled = total > max_points
+    if downsampled:
+        # Rollouts without a score are gaps in the line; leave them out
+        df = df[df['diversity_score'].notna()]
+        df = df.iloc[lttb(df['timestamp'].to_numpy(), df['diversity_score'].to_numpy(), max_points)]
+    scatter = go.Scattergl if downsampled else go.Scatter
     
     fig = go.Figure()
     
     # Add diversity score area
-    fig.add_trace(go.Scatter(
+    fig.add_trace(scatter(
         x=df['timestamp'],
         y=df['diversity_score'],
         mode='lines',
@@ -243,7 +286,7 @@ def create_diversity_chart(rollouts: List[Dict]) -> go.Figure:
     )
     
     fig.update_layout(
-        title="Solution Diversity Score",
+        title=_title("Solution Diversity Score", len(df), total),
         xaxis_title="Time",
         yaxis_title="Diversity Score",
         yaxis=dict(range=[0, 1]),
@@ -255,69 +298,139 @@ def create_diversity_chart(rollouts: List[Dict]) -> go.Figure:
     return fig
 
 
-def calculate_health_metrics(data: Dict[str, List[Dict]]) -> Dict[str, Any]:
+def create_history_chart(history: Optional[pd.DataFrame], title: str,
+                         y_label: str, stat: str = 'mean') -> go.Figure:
+    """
+    Create long-horizon chart from minute/hour/day aggregates
+    
+    Args:
+        history: Aggregates of one column (see LogParser.get_history)
+        title: Chart title
+        y_label: Y axis label
+        stat: 'mean' (line with min/max band) or 'sum' (bars)
+    
+    Returns:
+        Plotly figure
+    """
+    if history is None or history.empty:
+        fig = go.Figure()
+        fig.add_annotation(
+            text="No events older than the retention window yet",
+            xref="paper", yref="paper",
+            x=0.5, y=0.5, showarrow=False,
+            font=dict(size=14, color="gray")
+        )
+        fig.update_layout(height=300)
+        return fig
+    
+    df = history
+    
+    fig = go.Figure()
+    
+    if stat == 'sum':
+        fig.add_trace(go.Bar(
+            x=df['timestamp'],
+            y=df['sum'],
+            name='Total',
+            marker=dict(color='#6BCF7F'),
+            customdata=df[['tier', 'count']].values,
+            hovertemplate='<b>%{x}</b> (per %{customdata[0]})<br>Total: %{y:.4f}<br>Events: %{customdata[1]}<extra></extra>'
+        ))
+    else:
+        # Min/max band behind the mean
+        fig.add_trace(go.Scatter(
+            x=df['timestamp'],
+            y=df['max'],
+            mode='lines',
+            line=dict(width=0),
+            showlegend=False,
+            hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=df['timestamp'],
+            y=df['min'],
+            mode='lines',
+            name='Min / Max',
+            line=dict(width=0),
+            fill='tonexty',
+            fillcolor='rgba(0, 217, 255, 0.15)',
+            hoverinfo='skip'
+        ))
+        fig.add_trace(go.Scatter(
+            x=df['timestamp'],
+            y=df['mean'],
+            mode='lines',
+            name='Mean',
+            line=dict(color='#00D9FF', width=2),
+            customdata=df[['tier', 'count']].values,
+            hovertemplate='<b>%{x}</b> (per %{customdata[0]})<br>Mean: %{y:.4f}<br>Events: %{customdata[1]}<extra></extra>'
+        ))
+    
+    fig.update_layout(
+        title=title,
+        xaxis_title="Time",
+        yaxis_title=y_label,
+        hovermode='x unified',
+        height=350,
+        template='plotly_dark'
+    )
+    
+    return fig
+
+
+def calculate_health_metrics(data: Dict[str, pd.DataFrame],
+                             history: Optional[Dict[str, pd.DataFrame]] = None) -> Dict[str, Any]:
     """
     Calculate overall health metrics
     
+    Builds a health.HealthAggregator from the frames; the dashboard gets
+    the same metrics from its ingester without re-reading the history.
+    
     Args:
-        data: Parsed log data
+        data: Parsed log data, one DataFrame per event type
+        history: Aggregates of events older than the retention window
+            (see LogParser.get_history); included in totals and rates
     
     Returns:
         Dictionary of health metrics
     """
-    metrics = {
-        'avg_loss': None,
-        'total_rewards': 0.0,
-        'avg_rank_percentile': None,
-        'avg_diversity': None,
-        'updates_per_hour': 0.0,
-        'health_status': 'unknown'
-    }
-    
-    # Calculate average loss (last 10 epochs)
-    if data['policy_updates']:
-        recent_updates = data['policy_updates'][-10:]
-        losses = [u['loss'] for u in recent_updates]
-        metrics['avg_loss'] = sum(losses) / len(losses)
-    
-    # Calculate total rewards
-    if data['rewards']:
-        metrics['total_rewards'] = sum(r['amount'] for r in data['rewards'])
-        
-        # Calculate average rank percentile
-        percentiles = [(1 - (r['rank'] - 1) / r['total_solvers']) * 100 
-                      for r in data['rewards']]
-        metrics['avg_rank_percentile'] = sum(percentiles) / len(percentiles)
-    
-    # Calculate average diversity
-    if data['rollouts']:
-        diversities = [r['diversity_score'] for r in data['rollouts'] 
-                      if r['diversity_score'] is not None]
-        if diversities:
-            metrics['avg_diversity'] = sum(diversities) / len(diversities)
-    
-    # Calculate updates per hour
-    if data['policy_updates'] and len(data['policy_updates']) >= 2:
-        first_time = pd.to_datetime(data['policy_updates'][0]['timestamp'])
-        last_time = pd.to_datetime(data['policy_updates'][-1]['timestamp'])
-        hours = (last_time - first_time).total_seconds() / 3600
-        if hours > 0:
-            metrics['updates_per_hour'] = len(data['policy_updates']) / hours
-    
-    # Determine health status
-    issues = 0
-    if metrics['avg_loss'] and metrics['avg_loss'] > 0.1:
-        issues += 1
-    if metrics['avg_rank_percentile'] and metrics['avg_rank_percentile'] < 40:
-        issues += 1
-    if metrics['avg_diversity'] and metrics['avg_diversity'] < 0.5:
-        issues += 1
-    
-    if issues == 0:
-        metrics['health_status'] = 'healthy'
-    elif issues == 1:
-        metrics['health_status'] = 'warning'
-    else:
-        metrics['health_status'] = 'critical'
+    aggregator = HealthAggregator()
+    
+    # Compacted events count towards totals and rates
+    for column, frame in (history or {}).items():
+        if not frame.empty:
+            aggregator.add_history(
+                column,
+                int(frame['count'].sum()),
+                float(frame['sum'].sum()),
+                _epoch_seconds(frame['timestamp'])[0]
+            )
+    
+    policy_updates = data['policy_updates']
+    rewards = data['rewards']
+    rollouts = data['rollouts']
+    aggregator.add_policy_updates(
+        _epoch_seconds(policy_updates['timestamp']),
+        policy_updates['epoch'].to_numpy(),
+        policy_updates['loss'].to_numpy()
+    )
+    aggregator.add_rewards(
+        rewards['amount'].to_numpy(),
+        rewards['rank'].to_numpy(),
+        rewards['total_solvers'].to_numpy()
+    )
+    aggregator.add_rollouts(rollouts['diversity_score'].to_numpy())
     
-    return metrics
+    return aggregator.metrics()
+
+
+def _epoch_seconds(timestamps: pd.Series):
+    """Epoch seconds of a datetime column"""
+    return timestamps.to_numpy().astype('datetime64[s]').astype('int64')
+
+
+def _title(title: str, shown: int, total: int) -> str:
+    """Chart title, noting when only some of the points are drawn"""
+    if shown < total:
+        return f"{title} ({shown:,} of {total:,} points)"
+    return title